@@ -0,0 +1,178 @@
+"""
+Движок тревог: склейка срабатываний за тик в «пачки», подавление повторов
+и ограничение частоты тревог по зоне и в целом.
+
+Сцена за тик вызывает submit() для каждого БВС, вошедшего в зону, затем
+flush() — и получает не больше одной тревоги на зону. Скриншот снимается
+один раз на весь flush(). Объекты, подавленные ограничением частоты, сцена
+оставляет в игре: они повторяют попытку каждый тик, пока ограничение не
+пропустит тревогу.
+"""
+import time
+from collections import deque
+
+SEVERITY_INFO = 0
+SEVERITY_WARNING = 1
+SEVERITY_CRITICAL = 2
+
+SEVERITY_NAMES = {
+    SEVERITY_INFO: "инфо",
+    SEVERITY_WARNING: "внимание",
+    SEVERITY_CRITICAL: "критично",
+}
+
+# Повтор тревоги по тому же объекту в той же зоне не чаще, сек
+ALARM_DEDUPE_WINDOW = 10.0
+# Не больше N тревог за T секунд по одной зоне / по всем зонам
+ALARM_ZONE_RATE = (3, 10.0)
+ALARM_GLOBAL_RATE = (10, 10.0)
+# Сколько объектов в одной пачке считается роем
+ALARM_SWARM_SIZE = 3
+# Ближе этого расстояния до радара тревога критическая, м
+ALARM_CRITICAL_DIST = 1000.0
+# Сколько решений хранить в журнале
+ALARM_LOG_SIZE = 1000
+
+DECISION_ACCEPTED = "A"
+DECISION_DEDUPED = "D"
+DECISION_RATE_LIMITED = "R"
+
+
+class _RateLimiter:
+    """Скользящее окно: не больше limit событий за period секунд."""
+
+    def __init__(self, limit, period):
+        self.limit = int(limit)
+        self.period = float(period)
+        self._stamps = deque()
+
+    def allow(self, now) -> bool:
+        while self._stamps and now - self._stamps[0] > self.period:
+            self._stamps.popleft()
+        return len(self._stamps) < self.limit
+
+    def hit(self, now):
+        self._stamps.append(now)
+
+
+class Alarm:
+    """Итоговая тревога по одной зоне за один flush()."""
+
+    def __init__(self, zone_id, severity, uids, positions, suppressed=0):
+        self.zone_id = zone_id
+        self.severity = severity
+        self.uids = uids
+        self.positions = positions
+        self.suppressed = suppressed
+
+    @property
+    def count(self) -> int:
+        return len(self.uids)
+
+    def message(self) -> str:
+        if self.count == 1:
+            x, y = self.positions[0]
+            text = f"БВС в зоне обнаружения! ({x:.0f}, {y:.0f})"
+        else:
+            text = f"БВС в зоне обнаружения: {self.count} объектов (зона {self.zone_id})"
+        if self.suppressed:
+            text += f", ещё подавлено: {self.suppressed}"
+        if self.severity == SEVERITY_CRITICAL:
+            text = "[КРИТИЧНО] " + text
+        return text
+
+
+class AlarmEngine:
+    def __init__(self, dedupe_window=ALARM_DEDUPE_WINDOW, zone_rate=ALARM_ZONE_RATE,
+                 global_rate=ALARM_GLOBAL_RATE, swarm_size=ALARM_SWARM_SIZE,
+                 critical_dist=ALARM_CRITICAL_DIST, clock=time.monotonic):
+        self.dedupe_window = float(dedupe_window)
+        self.zone_rate = zone_rate
+        self.swarm_size = int(swarm_size)
+        self.critical_dist = float(critical_dist)
+        self._clock = clock
+        self._global = _RateLimiter(*global_rate)
+        self._zones = {}
+        self._last_seen = {}        # (zone_id, uid) -> время последней тревоги
+        self._pending = {}          # zone_id -> [(uid, x, y, dist), ...]
+        self._suppressed = {}       # zone_id -> uid, подавленные с прошлой тревоги
+        # Компактный журнал решений: (t, zone_id, решение, кол-во, важность)
+        self.log = deque(maxlen=ALARM_LOG_SIZE)
+
+    def submit(self, zone_id, uid, x, y, dist):
+        self._pending.setdefault(zone_id, []).append((uid, x, y, dist))
+
+    def flush(self):
+        """Решения по накопленным за тик срабатываниям; возвращает список Alarm."""
+        if not self._pending:
+            return []
+        now = self._clock()
+        alarms = []
+        for zone_id, hits in self._pending.items():
+            fresh = []
+            for uid, x, y, dist in hits:
+                last = self._last_seen.get((zone_id, uid))
+                if last is not None and now - last < self.dedupe_window:
+                    continue
+                fresh.append((uid, x, y, dist))
+            if len(fresh) < len(hits):
+                self.log.append((now, zone_id, DECISION_DEDUPED, len(hits) - len(fresh), None))
+            if not fresh:
+                continue
+
+            limiter = self._zones.get(zone_id)
+            if limiter is None:
+                limiter = self._zones[zone_id] = _RateLimiter(*self.zone_rate)
+            if not (limiter.allow(now) and self._global.allow(now)):
+                # Подавленные ждут и пробуют каждый тик; в журнал — только новые
+                waiting = self._suppressed.setdefault(zone_id, set())
+                new = {h[0] for h in fresh} - waiting
+                if new:
+                    waiting.update(new)
+                    self.log.append((now, zone_id, DECISION_RATE_LIMITED, len(new), None))
+                continue
+            limiter.hit(now)
+            self._global.hit(now)
+            for h in fresh:
+                self._last_seen[(zone_id, h[0])] = now
+
+            severity = self._severity(fresh)
+            uids = [h[0] for h in fresh]
+            # Подавленные раньше, но попавшие в эту тревогу, не считаются подавленными
+            suppressed = len(self._suppressed.pop(zone_id, set()).difference(uids))
+            alarm = Alarm(zone_id, severity, uids, [(h[1], h[2]) for h in fresh], suppressed)
+            alarms.append(alarm)
+            self.log.append((now, zone_id, DECISION_ACCEPTED, alarm.count, severity))
+        self._pending.clear()
+        self._expire(now)
+        return alarms
+
+    def _severity(self, hits) -> int:
+        if len(hits) >= self.swarm_size or min(h[3] for h in hits) <= self.critical_dist:
+            return SEVERITY_CRITICAL
+        if len(hits) > 1:
+            return SEVERITY_WARNING
+        return SEVERITY_INFO
+
+    def _expire(self, now):
+        if len(self._last_seen) < 256:
+            return
+        self._last_seen = {k: t for k, t in self._last_seen.items() if now - t < self.dedupe_window}
+
+    def reset(self):
+        self._zones.clear()
+        self._last_seen.clear()
+        self._pending.clear()
+        self._suppressed.clear()
+        self._global._stamps.clear()
+        self.log.clear()
+
+    def summary(self) -> str:
+        """Итог решений журнала одной строкой (для события в конце сеанса)."""
+        counts = {DECISION_ACCEPTED: 0, DECISION_DEDUPED: 0, DECISION_RATE_LIMITED: 0}
+        alarms = 0
+        for _, _, decision, count, _ in self.log:
+            counts[decision] += count
+            alarms += decision == DECISION_ACCEPTED
+        return (f"Тревоги за сеанс: {alarms} (объектов {counts[DECISION_ACCEPTED]}), "
+                f"подавлено частотой: {counts[DECISION_RATE_LIMITED]}, повторов: {counts[DECISION_DEDUPED]}")
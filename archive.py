@@ -0,0 +1,111 @@
+"""
+Архивирование журнала событий по месяцам.
+
+События старше EVENTS_HOT_DAYS переносятся из rls_trainer.db в отдельные
+файлы archive/events_ГГГГ_ММ.db (та же таблица events, id сохраняются).
+Перенос идёт небольшими пачками в потоке БД: одна пачка — одна транзакция
+(вставка в архив и удаление из основной базы атомарны), между пачками
+поток БД свободен для интерфейса.
+
+Архивы подключаются (ATTACH) только запросами, которым нужна история
+(DB.get_events(..., include_archive=True), DB.get_events_between);
+временное представление events_all объединяет основную таблицу и
+подключённые месяцы. Список архивов — таблица event_archives.
+"""
+import os
+
+from datetime import datetime, timedelta
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+EVENTS_ARCHIVE_DIR = "archive"
+# События старше стольких дней уходят в архив
+EVENTS_HOT_DAYS = 90
+# Событий в одной пачке (одна транзакция потока БД)
+EVENTS_ARCHIVE_BATCH = 500
+# Одновременно подключённых архивов для чтения (в SQLite по умолчанию не больше 10 ATTACH;
+# одно место остаётся для записи архива)
+EVENTS_ARCHIVE_MAX_ATTACHED = 8
+# Пауза между пачками и интервал проверки, когда переносить нечего, мс
+ARCHIVE_STEP_PAUSE_MS = 200
+ARCHIVE_CHECK_INTERVAL_MS = 60 * 60 * 1000
+# Первый проход — не сразу после запуска
+ARCHIVE_START_DELAY_MS = 30 * 1000
+
+
+def month_of(created_at: str) -> str:
+    """'2026-01-15T10:00:00' -> '2026-01'."""
+    return created_at[:7]
+
+
+def archive_alias(month: str) -> str:
+    return "arch_" + month.replace("-", "_")
+
+
+def archive_path(month: str, directory=EVENTS_ARCHIVE_DIR) -> str:
+    return os.path.join(directory, f"events_{month.replace('-', '_')}.db")
+
+
+def months_between(since: str, until: str):
+    """Месяцы 'ГГГГ-ММ', пересекающиеся с [since, until]."""
+    y, m = int(since[:4]), int(since[5:7])
+    y1, m1 = int(until[:4]), int(until[5:7])
+    out = []
+    while (y, m) <= (y1, m1):
+        out.append(f"{y:04d}-{m:02d}")
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
+
+
+class EventArchiver(QObject):
+    """
+    Фоновый перенос старых событий: пачки ставятся в очередь потока БД
+    по одной, следующая — после завершения предыдущей.
+    """
+    archived = pyqtSignal(int)  # сколько событий перенесено за проход
+
+    def __init__(self, db, hot_days=EVENTS_HOT_DAYS, directory=EVENTS_ARCHIVE_DIR,
+                 batch=EVENTS_ARCHIVE_BATCH, interval_ms=ARCHIVE_CHECK_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.hot_days = hot_days
+        self.directory = directory
+        self.batch = int(batch)
+        self.interval_ms = int(interval_ms)
+        self._moved = 0
+        self._busy = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.run_step)
+
+    def start(self, delay_ms=ARCHIVE_START_DELAY_MS):
+        self._timer.start(int(delay_ms))
+
+    def stop(self):
+        self._timer.stop()
+
+    def cutoff(self) -> str:
+        return (datetime.now() - timedelta(days=self.hot_days)).isoformat(timespec="seconds")
+
+    def run_step(self):
+        if self._busy or not self.hot_days:
+            return
+        self._busy = True
+        self.db.call_async("archive_events_step", self.cutoff(), self.directory, self.batch,
+                           on_done=self._on_step, on_error=self._on_error)
+
+    def _on_step(self, moved):
+        self._busy = False
+        self._moved += moved
+        if moved:
+            self._timer.start(ARCHIVE_STEP_PAUSE_MS)
+            return
+        if self._moved:
+            print(f"[archive] Moved {self._moved} events to {self.directory}")
+            self.archived.emit(self._moved)
+            self._moved = 0
+        self._timer.start(self.interval_ms)
+
+    def _on_error(self, error):
+        self._busy = False
+        print(f"[archive] Archiving failed: {error}")
+        self._timer.start(self.interval_ms)
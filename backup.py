@@ -0,0 +1,296 @@
+"""
+Резервное копирование базы во время работы.
+
+Копия снимается SQLite Online Backup API в отдельном потоке через своё
+соединение только для чтения: по BACKUP_STEP_PAGES страниц за шаг с паузой
+между шагами, поэтому поток БД и интерфейс не ждут копирования. Если базу
+меняют во время копирования, SQLite начинает копию заново: шаг при этом
+растёт, а после BACKUP_MAX_RESTARTS перезапусков база копируется одним шагом.
+
+Снимок проверяется (PRAGMA integrity_check), сжимается gzip и сверяется по
+SHA-256 при обратном чтении. Хранятся BACKUP_KEEP последних копий
+backups/rls_trainer_ГГГГММДД_ЧЧММСС.db.gz. Архивы событий (archive/)
+копируются так же в backups/archive/, только изменившиеся с прошлой копии.
+
+    python backup.py                       # копия сейчас
+    python backup.py --verify backups/rls_trainer_20260101_120000.db.gz
+"""
+import os
+import sys
+import gzip
+import shutil
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from archive import EVENTS_ARCHIVE_DIR
+
+BACKUP_DIR = "backups"
+BACKUP_EXT = ".db.gz"
+# Сколько последних копий основной базы хранить
+BACKUP_KEEP = 7
+# Страниц за шаг копирования и пауза между шагами, с
+BACKUP_STEP_PAGES = 64
+BACKUP_STEP_PAUSE = 0.01
+# Сколько раз копия может начаться заново из-за записи в базу (каждый раз шаг
+# вчетверо больше); затем база копируется одним шагом
+BACKUP_MAX_RESTARTS = 5
+# Предел шагов одной попытки: столько раз число шагов без помех плюс шаги BUSY
+BACKUP_MAX_STEPS_FACTOR = 2
+BACKUP_MAX_BUSY_STEPS = 50
+# Периодичность копирования и задержка первой копии после запуска, мс
+BACKUP_INTERVAL_MS = 6 * 60 * 60 * 1000
+BACKUP_START_DELAY_MS = 5 * 60 * 1000
+_CHUNK = 1024 * 1024
+
+
+class BackupCancelled(Exception):
+    pass
+
+
+class BackupError(Exception):
+    pass
+
+
+class _Restarted(Exception):
+    pass
+
+
+def _snapshot(src_path, dst_path, progress=None, cancel_event=None):
+    """Онлайн-копия src_path в dst_path шагами; progress(скопировано, всего) в страницах."""
+    attempt = {}
+
+    def step(status, remaining, total):
+        if cancel_event is not None and cancel_event.is_set():
+            raise BackupCancelled()
+        done = total - remaining
+        if attempt["pages"] > 0:
+            # Базу изменили — SQLite начал копию заново: успешный шаг не продвинул
+            # копию (при записи перед каждым шагом остаток не растёт, а стоит) или
+            # изменился размер; шагов (с BUSY) больше предела — тоже перезапуск
+            attempt["steps"] += 1
+            if attempt["limit"] is None:
+                attempt["limit"] = BACKUP_MAX_STEPS_FACTOR * -(-total // attempt["pages"]) + BACKUP_MAX_BUSY_STEPS
+            if (attempt["total"] not in (None, total)
+                    or (status == sqlite3.SQLITE_OK and done <= attempt["done"])
+                    or attempt["steps"] > attempt["limit"]):
+                raise _Restarted()
+            attempt["total"] = total
+            if status == sqlite3.SQLITE_OK:
+                attempt["done"] = done
+        if progress is not None:
+            progress(done, total)
+        # Между шагами блокировка чтения снята; пауза даёт потоку БД записать
+        time.sleep(BACKUP_STEP_PAUSE)
+
+    src = sqlite3.connect(f"file:{os.path.abspath(src_path)}?mode=ro", uri=True)
+    dst = sqlite3.connect(dst_path)
+    try:
+        pages = BACKUP_STEP_PAGES
+        for n in range(BACKUP_MAX_RESTARTS + 1):
+            # Последняя попытка — одним шагом: запись подождёт одно копирование,
+            # перезапуск внутри шага невозможен
+            attempt.update(pages=pages if n < BACKUP_MAX_RESTARTS else -1,
+                           steps=0, limit=None, total=None, done=-1)
+            try:
+                src.backup(dst, pages=attempt["pages"], progress=step, sleep=BACKUP_STEP_PAUSE)
+                break
+            except _Restarted:
+                print(f"[backup] {os.path.basename(src_path)} changed during copy, restarting")
+                pages *= 4
+        row = dst.execute("PRAGMA integrity_check").fetchone()
+        if row[0] != "ok":
+            raise BackupError(f"проверка копии: {row[0]}")
+    finally:
+        dst.close()
+        src.close()
+
+
+def _compress(src_path, gz_path) -> str:
+    """Сжимает файл (через временный) и возвращает SHA-256 исходных данных."""
+    digest = hashlib.sha256()
+    tmp_path = gz_path + ".tmp"
+    with open(src_path, "rb") as src, gzip.open(tmp_path, "wb", compresslevel=6) as dst:
+        for chunk in iter(lambda: src.read(_CHUNK), b""):
+            digest.update(chunk)
+            dst.write(chunk)
+    if _gunzip_sha256(tmp_path) != digest.hexdigest():
+        os.remove(tmp_path)
+        raise BackupError(f"сжатая копия {gz_path} не совпадает со снимком")
+    os.replace(tmp_path, gz_path)
+    return digest.hexdigest()
+
+
+def _gunzip_sha256(gz_path) -> str:
+    # Чтение до конца проверяет и CRC gzip
+    digest = hashlib.sha256()
+    with gzip.open(gz_path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _backup_file(src_path, gz_path, progress=None, cancel_event=None):
+    directory = os.path.dirname(gz_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, snap_path = tempfile.mkstemp(suffix=".db", dir=directory)
+    os.close(fd)
+    try:
+        _snapshot(src_path, snap_path, progress, cancel_event)
+        _compress(snap_path, gz_path)
+    finally:
+        try:
+            os.remove(snap_path)
+        except OSError:
+            pass
+
+
+def verify_backup(gz_path):
+    """Распаковывает копию во временный файл и проверяет целостность: (ok, сообщение)."""
+    fd, tmp_path = tempfile.mkstemp(suffix=".db")
+    try:
+        with os.fdopen(fd, "wb") as dst, gzip.open(gz_path, "rb") as src:
+            shutil.copyfileobj(src, dst, _CHUNK)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        finally:
+            conn.close()
+        return result == "ok", result
+    except (OSError, EOFError, sqlite3.DatabaseError) as e:
+        return False, str(e)
+    finally:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def list_backups(db_path, directory=BACKUP_DIR):
+    """Копии основной базы от старых к новым."""
+    prefix = os.path.splitext(os.path.basename(db_path))[0] + "_"
+    try:
+        names = sorted(n for n in os.listdir(directory) if n.startswith(prefix) and n.endswith(BACKUP_EXT))
+    except FileNotFoundError:
+        return []
+    return [os.path.join(directory, n) for n in names]
+
+
+def rotate_backups(db_path, directory=BACKUP_DIR, keep=BACKUP_KEEP):
+    removed = []
+    for path in list_backups(db_path, directory)[:-keep] if keep else []:
+        try:
+            os.remove(path)
+            removed.append(path)
+        except OSError:
+            pass
+    return removed
+
+
+def backup_database(db_path, directory=BACKUP_DIR, keep=BACKUP_KEEP, archive_dir=EVENTS_ARCHIVE_DIR,
+                    progress=None, cancel_event=None) -> str:
+    """Копия основной базы и изменившихся архивов; возвращает путь копии базы."""
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    name = os.path.splitext(os.path.basename(db_path))[0]
+    path = os.path.join(directory, f"{name}_{stamp}{BACKUP_EXT}")
+    _backup_file(db_path, path, progress, cancel_event)
+    rotate_backups(db_path, directory, keep)
+    # Архивы: одна копия на месяц, обновляется, если архив менялся после неё
+    try:
+        archives = sorted(n for n in os.listdir(archive_dir) if n.endswith(".db"))
+    except FileNotFoundError:
+        archives = []
+    for archive in archives:
+        src = os.path.join(archive_dir, archive)
+        dst = os.path.join(directory, "archive", archive + ".gz")
+        if os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src):
+            continue
+        _backup_file(src, dst, cancel_event=cancel_event)
+    return path
+
+
+class BackupManager(QObject):
+    """Копирование по расписанию и по запросу в фоновом потоке (не больше одного сразу)."""
+    progress = pyqtSignal(int, int)  # страниц скопировано, всего
+    finished = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, db_path, directory=BACKUP_DIR, keep=BACKUP_KEEP,
+                 interval_ms=BACKUP_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.directory = directory
+        self.keep = keep
+        self.interval_ms = int(interval_ms)
+        self._cancel = threading.Event()
+        self._thread = None
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.backup_now)
+
+    def start(self, delay_ms=BACKUP_START_DELAY_MS):
+        if self.interval_ms:
+            QTimer.singleShot(int(delay_ms), self.backup_now)
+            self._timer.start(self.interval_ms)
+
+    def backup_now(self) -> bool:
+        if self.is_running():
+            return False
+        self._cancel.clear()
+        self._thread = threading.Thread(target=self._run, name="db-backup", daemon=True)
+        self._thread.start()
+        return True
+
+    def cancel(self):
+        self._timer.stop()
+        self._cancel.set()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def latest(self):
+        backups = list_backups(self.db_path, self.directory)
+        return backups[-1] if backups else None
+
+    def _run(self):
+        try:
+            path = backup_database(self.db_path, self.directory, self.keep,
+                                   progress=self.progress.emit, cancel_event=self._cancel)
+        except BackupCancelled:
+            print("[backup] Cancelled")
+        except Exception as e:
+            print(f"[backup] Failed: {e}")
+            self.failed.emit(str(e))
+        else:
+            print(f"[backup] Saved {path}")
+            self.finished.emit(path)
+
+
+def main(argv=None):
+    import argparse
+    from db import DB_NAME
+
+    parser = argparse.ArgumentParser(description="Резервная копия базы (можно при работающем приложении)")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--dir", default=BACKUP_DIR)
+    parser.add_argument("--keep", type=int, default=BACKUP_KEEP)
+    parser.add_argument("--verify", metavar="COPY", help="проверить копию .db.gz")
+    args = parser.parse_args(argv)
+    if args.verify:
+        ok, message = verify_backup(args.verify)
+        print(f"[backup] {args.verify}: {message}")
+        return 0 if ok else 1
+    print(f"[backup] Saved {backup_database(args.db, args.dir, args.keep)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
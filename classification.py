@@ -0,0 +1,236 @@
+"""
+Классификация целей по пачкам векторов признаков.
+
+FeatureCache держит признаки всех объектов в массивах NumPy (слот на uid)
+и обновляет их раз в тик. Классификатор получает матрицу признаков
+N x len(FEATURES) и возвращает метки и уверенность для всех строк сразу.
+«Тяжёлые» модели (heavy = True) ClassifierRunner запускает в рабочем
+потоке, не задерживая кадр: результат применяется на одном из следующих тиков.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+FEATURES = ("speed", "course", "lifetime", "turn_rate", "accel")
+F_SPEED, F_COURSE, F_LIFETIME, F_TURN_RATE, F_ACCEL = range(len(FEATURES))
+
+LABEL_BVS = "bvs"
+LABEL_BIRD = "bird"
+
+# Сглаживание производных признаков (скорость поворота, ускорение)
+FEATURE_EMA_ALPHA = 0.3
+
+
+class FeatureCache:
+    def __init__(self, capacity=64):
+        self._slots = {}
+        self._alloc_arrays(capacity)
+        self._free = list(range(capacity - 1, -1, -1))
+
+    def _alloc_arrays(self, capacity):
+        self.capacity = capacity
+        self.uids = np.full(capacity, -1, dtype=np.int64)
+        self.data = np.zeros((capacity, len(FEATURES)), dtype=np.float64)
+        self.spawn = np.zeros(capacity, dtype=np.float64)
+        self._fresh = np.ones(capacity, dtype=bool)
+
+    def _grow(self):
+        old = (self.uids, self.data, self.spawn, self._fresh)
+        n = self.capacity
+        self._alloc_arrays(n * 2)
+        self.uids[:n], self.data[:n], self.spawn[:n], self._fresh[:n] = old
+        self._free.extend(range(self.capacity - 1, n - 1, -1))
+
+    def _slot_for(self, uid, spawn_time) -> int:
+        slot = self._slots.get(uid)
+        if slot is not None:
+            return slot
+        if not self._free:
+            self._grow()
+        slot = self._free.pop()
+        self._slots[uid] = slot
+        self.uids[slot] = uid
+        self.spawn[slot] = spawn_time
+        self.data[slot] = 0.0
+        self._fresh[slot] = True
+        return slot
+
+    def remove(self, uid):
+        slot = self._slots.pop(uid, None)
+        if slot is not None:
+            self.uids[slot] = -1
+            self._free.append(slot)
+
+    def clear(self):
+        self._slots.clear()
+        self._free = list(range(self.capacity - 1, -1, -1))
+        self.uids[:] = -1
+
+    def update(self, objects, dt, now=None):
+        """Пересчитывает признаки всех переданных объектов за один проход."""
+        n = len(objects)
+        if n == 0:
+            return
+        now = time.time() if now is None else now
+        idx = np.empty(n, dtype=np.int64)
+        vel = np.empty((n, 2), dtype=np.float64)
+        for i, obj in enumerate(objects):
+            idx[i] = self._slot_for(obj.uid, obj.spawn_time)
+            v = obj.velocity
+            vel[i, 0] = v.x()
+            vel[i, 1] = v.y()
+        self._update_rows(idx, vel, dt, now)
+
+    def update_arrays(self, uids, vel, spawn, dt, now):
+        """То же по массивам (например, по оценкам треков): uids N, vel N x 2, spawn N."""
+        if len(uids) == 0:
+            return
+        idx = np.fromiter((self._slot_for(u, s) for u, s in zip(uids.tolist(), spawn.tolist())),
+                          dtype=np.int64, count=len(uids))
+        self._update_rows(idx, np.asarray(vel, dtype=np.float64), dt, now)
+
+    def _update_rows(self, idx, vel, dt, now):
+        speed = np.hypot(vel[:, 0], vel[:, 1])
+        course = np.degrees(np.arctan2(vel[:, 1], vel[:, 0])) % 360.0
+        rows = self.data[idx]
+        fresh = self._fresh[idx]
+        if dt > 0:
+            dcourse = (course - rows[:, F_COURSE] + 180.0) % 360.0 - 180.0
+            turn = np.where(fresh, 0.0, dcourse / dt)
+            accel = np.where(fresh, 0.0, (speed - rows[:, F_SPEED]) / dt)
+            a = FEATURE_EMA_ALPHA
+            rows[:, F_TURN_RATE] = np.where(fresh, 0.0, (1 - a) * rows[:, F_TURN_RATE] + a * turn)
+            rows[:, F_ACCEL] = np.where(fresh, 0.0, (1 - a) * rows[:, F_ACCEL] + a * accel)
+        rows[:, F_SPEED] = speed
+        rows[:, F_COURSE] = course
+        rows[:, F_LIFETIME] = now - self.spawn[idx]
+        self.data[idx] = rows
+        self._fresh[idx] = False
+
+    def row(self, uid):
+        slot = self._slots.get(uid)
+        return None if slot is None else self.data[slot].copy()
+
+    def active(self):
+        """(uids, X) для всех объектов в кэше; X — копия, её можно отдавать в поток."""
+        mask = self.uids >= 0
+        return self.uids[mask].copy(), self.data[mask].copy()
+
+
+class Classifier:
+    """Интерфейс: predict(X) -> (labels, confidence) для матрицы признаков."""
+    heavy = False
+
+    def predict(self, X):
+        raise NotImplementedError
+
+
+class ThresholdClassifier(Classifier):
+    """Пороговое правило (как прежний graphics.classifier), векторизованное."""
+
+    def __init__(self, min_speed=15.0, max_lifetime=60.0):
+        self.min_speed = min_speed
+        self.max_lifetime = max_lifetime
+
+    def predict(self, X):
+        is_bvs = (X[:, F_SPEED] > self.min_speed) & (X[:, F_LIFETIME] < self.max_lifetime)
+        labels = np.where(is_bvs, LABEL_BVS, LABEL_BIRD).astype(object)
+        conf = np.where(is_bvs, 0.8, 0.85)
+        return labels, conf
+
+
+class LogisticClassifier(Classifier):
+    """
+    Логистическая регрессия на NumPy: p(БВС) = sigmoid(((X - mean) / std) @ w + b).
+    Параметры можно обучить где угодно и загрузить из .npz (w, b, mean, std).
+    """
+    heavy = True
+
+    def __init__(self, weights, bias=0.0, mean=None, std=None):
+        self.w = np.asarray(weights, dtype=np.float64)
+        self.b = float(bias)
+        self.mean = np.zeros_like(self.w) if mean is None else np.asarray(mean, dtype=np.float64)
+        self.std = np.ones_like(self.w) if std is None else np.asarray(std, dtype=np.float64)
+
+    @classmethod
+    def load(cls, path):
+        d = np.load(path)
+        return cls(d["w"], float(d["b"]), d["mean"], d["std"])
+
+    def predict(self, X):
+        z = ((X - self.mean) / np.where(self.std == 0, 1.0, self.std)) @ self.w + self.b
+        p = 1.0 / (1.0 + np.exp(-z))
+        labels = np.where(p >= 0.5, LABEL_BVS, LABEL_BIRD).astype(object)
+        return labels, np.maximum(p, 1.0 - p)
+
+
+class EstimatorClassifier(Classifier):
+    """
+    Обёртка над моделью с интерфейсом scikit-learn (predict_proba, classes_).
+    scikit-learn не требуется — подойдёт любой объект с этими атрибутами.
+    """
+    heavy = True
+
+    def __init__(self, estimator):
+        self.estimator = estimator
+
+    def predict(self, X):
+        proba = self.estimator.predict_proba(X)
+        best = np.argmax(proba, axis=1)
+        labels = np.asarray(self.estimator.classes_, dtype=object)[best]
+        return labels, proba[np.arange(len(best)), best]
+
+
+class ClassifierRunner:
+    """
+    Запускает классификатор по всему кэшу признаков. Лёгкие модели — сразу,
+    тяжёлые — в рабочем потоке (не больше одной задачи одновременно).
+    """
+
+    def __init__(self, model: Classifier = None):
+        self.model = model or ThresholdClassifier()
+        self._executor = None
+        self._future = None
+
+    def set_model(self, model: Classifier):
+        self.model = model
+        self._future = None
+
+    def classify(self, X):
+        """Синхронная классификация (например, для одного объекта)."""
+        return self.model.predict(np.atleast_2d(X))
+
+    def step(self, cache: FeatureCache):
+        """
+        Возвращает готовые результаты [(uid, label, confidence), ...]
+        или пустой список, если тяжёлая модель ещё считает.
+        """
+        uids, X = cache.active()
+        if not self.model.heavy:
+            if len(uids) == 0:
+                return []
+            labels, conf = self.model.predict(X)
+            return list(zip(uids.tolist(), labels, conf.tolist()))
+
+        results = []
+        if self._future is not None and self._future.done():
+            try:
+                results = self._future.result()
+            except Exception as e:
+                print(f"[classification] Model failed: {e}")
+            self._future = None
+        if self._future is None and len(uids):
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="classifier")
+            self._future = self._executor.submit(self._run, self.model, uids, X)
+        return results
+
+    @staticmethod
+    def _run(model, uids, X):
+        labels, conf = model.predict(X)
+        return list(zip(uids.tolist(), labels, conf.tolist()))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,133 @@
+"""
+Генератор помех и ложных отметок (NumPy, воспроизводимый по seed).
+
+Составляющие (число отметок — на полный оборот обзора, в пачке сектора —
+пропорционально его ширине):
+  - отражения от местности: плотность спадает с дальностью от каждой РЛС;
+  - метеообразования: гауссовы облака, медленно дрейфующие по ветру;
+  - шумовые (тепловые) ложные отметки: равномерно по зоне обзора;
+  - участки карты с повышенной плотностью (застройка, лес, вода) —
+    необязательный список "clutter" региона в assets/maps.json:
+
+        "clutter": [{"rect": [x, y, w, h], "density": 800}, ...]
+
+Отрисовка — один PointCloudItem на все отметки (см. pointcloud.py).
+"""
+import numpy as np
+from PyQt5.QtCore import QRectF
+from PyQt5.QtGui import QColor
+
+from pointcloud import PointCloudItem
+from lod import LAYER_CLUTTER
+
+# Отметок на полный оборот
+CLUTTER_GROUND_PER_SCAN = 3000
+CLUTTER_NOISE_PER_SCAN = 800
+CLUTTER_WEATHER_PER_SCAN = 1500
+# Масштаб экспоненциального спада отражений от местности, м
+CLUTTER_GROUND_SCALE = 1500.0
+# Метеообразования: число облаков, размер (СКО), скорость дрейфа
+CLUTTER_WEATHER_CELLS = 3
+CLUTTER_WEATHER_SIGMA = (400.0, 1200.0)
+CLUTTER_WEATHER_DRIFT = 5.0
+# Без луча кадр помех обновляется не чаще, сек
+CLUTTER_REFRESH_SEC = 0.2
+# Ёмкость буфера отметок слоя
+CLUTTER_MAX_POINTS = 20000
+# None — случайный seed (остаётся в ClutterGenerator.seed для воспроизведения)
+CLUTTER_SEED = None
+
+
+class ClutterGenerator:
+    def __init__(self, radars, zones=(), seed=CLUTTER_SEED):
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy % (2 ** 32))
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.radars = radars
+        self.zones = [(np.asarray(z["rect"], dtype=np.float64), float(z.get("density", 0)))
+                      for z in zones or () if "rect" in z]
+        self._init_weather()
+
+    def _init_weather(self):
+        site = self.radars.primary
+        n = CLUTTER_WEATHER_CELLS
+        r = site.coverage_range * np.sqrt(self.rng.uniform(0.1, 0.9, n))
+        a = self.rng.uniform(0, 2 * np.pi, n)
+        self.weather_xy = np.c_[site.center.x() + r * np.cos(a), site.center.y() + r * np.sin(a)]
+        self.weather_sigma = self.rng.uniform(*CLUTTER_WEATHER_SIGMA, n)
+        wind = self.rng.uniform(0, 2 * np.pi)
+        self.weather_vel = CLUTTER_WEATHER_DRIFT * np.array([np.cos(wind), np.sin(wind)])
+
+    def _count(self, per_scan, fraction):
+        return int(self.rng.poisson(per_scan * fraction))
+
+    def _polar(self, n, center, r, az0, width):
+        az = np.radians(az0 + self.rng.uniform(0.0, width, n))
+        return np.c_[center[0] + r * np.cos(az), center[1] + r * np.sin(az)]
+
+    def generate(self, dt, sector=None):
+        """
+        Отметки за шаг dt. sector = (начало, ширина) в градусах относительно
+        основной РЛС — только пройденный лучом сектор; None — полный кадр.
+        """
+        self.weather_xy += self.weather_vel * dt
+        start, width = sector if sector is not None else (0.0, 360.0)
+        if width <= 0:
+            return np.empty((0, 2))
+        frac = width / 360.0
+        parts = []
+        primary = self.radars.centers[0]
+
+        # Местность: у основной РЛС — сразу в секторе, у остальных — с отбором по сектору
+        for i, (center, cov) in enumerate(zip(self.radars.centers, self.radars.coverage)):
+            if i == 0:
+                n = self._count(CLUTTER_GROUND_PER_SCAN, frac)
+                r = np.minimum(self.rng.exponential(CLUTTER_GROUND_SCALE, n), cov)
+                parts.append(self._polar(n, center, r, start, width))
+            else:
+                n = self._count(CLUTTER_GROUND_PER_SCAN, 1.0)
+                r = np.minimum(self.rng.exponential(CLUTTER_GROUND_SCALE, n), cov)
+                parts.append(self._in_sector(self._polar(n, center, r, 0.0, 360.0), primary, start, width))
+
+        # Шум — равномерно по площади круга обзора основной РЛС
+        n = self._count(CLUTTER_NOISE_PER_SCAN, frac)
+        r = self.radars.coverage[0] * np.sqrt(self.rng.uniform(0.0, 1.0, n))
+        parts.append(self._polar(n, primary, r, start, width))
+
+        # Метеообразования
+        n = self._count(CLUTTER_WEATHER_PER_SCAN, 1.0)
+        cell = self.rng.integers(0, len(self.weather_xy), n)
+        pts = self.weather_xy[cell] + self.rng.normal(size=(n, 2)) * self.weather_sigma[cell, None]
+        parts.append(self._in_sector(pts, primary, start, width))
+
+        # Участки карты
+        for (x, y, w, h), density in self.zones:
+            n = self._count(density, 1.0)
+            pts = np.c_[x + self.rng.uniform(0, w, n), y + self.rng.uniform(0, h, n)]
+            parts.append(self._in_sector(pts, primary, start, width))
+
+        return np.concatenate(parts) if parts else np.empty((0, 2))
+
+    @staticmethod
+    def _in_sector(xy, center, start, width):
+        if width >= 360.0 or len(xy) == 0:
+            return xy
+        az = np.degrees(np.arctan2(xy[:, 1] - center[1], xy[:, 0] - center[0]))
+        return xy[(az - start) % 360.0 < width]
+
+
+class ClutterLayer(PointCloudItem):
+    layer = LAYER_CLUTTER
+
+    def __init__(self, rect: QRectF, capacity=CLUTTER_MAX_POINTS):
+        super().__init__(rect, capacity, QColor(230, 200, 90, 150), size_px=2.0)
+        self.setZValue(3)
+
+
+def coverage_rect(radars) -> QRectF:
+    """Общий прямоугольник кругов обзора всех РЛС."""
+    c, r = radars.centers, radars.coverage
+    x0, y0 = (c - r[:, None]).min(axis=0)
+    x1, y1 = (c + r[:, None]).max(axis=0)
+    return QRectF(x0, y0, x1 - x0, y1 - y0)
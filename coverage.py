@@ -0,0 +1,326 @@
+"""
+Зона видимости РЛС с учётом рельефа (прямая видимость).
+
+Для каждой РЛС заранее считается растр: минимальная высота цели над
+землёй (м), на которой она видна из данной клетки. Проверка обнаружения
+в тике — поиск по индексу клетки, O(1) на объект и на РЛС, без трассировки
+лучей.
+
+Расчёт растра: рельеф выбирается вдоль радиальных лучей (азимут x дальность),
+для каждого луча — нарастающий максимум угла закрытия с учётом кривизны
+Земли (эквивалентный радиус 4/3), затем полярная таблица переносится на
+декартову сетку. Всё — операции NumPy над массивами.
+
+Карта высот региона задаётся в assets/maps.json необязательным полем:
+
+    "heightmap": {"path": "assets/spb.height.png", "scale": 0.5, "offset": 0}
+
+(изображение в оттенках серого: высота = значение * scale + offset, м;
+либо .npy с высотами в метрах). Без карты высот рельеф плоский — остаются
+дальность РЛС и кривизна Земли.
+
+Растры кэшируются на диске (COVERAGE_CACHE_DIR) по ключу из карты высот,
+положения, высоты антенны и дальности РЛС. Заранее для всех РЛС региона:
+    python coverage.py spb
+"""
+import os
+import sys
+import hashlib
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PyQt5.QtCore import QRectF
+from PyQt5.QtGui import QImage
+
+COVERAGE_VERSION = 1
+COVERAGE_CACHE_DIR = "assets/coverage"
+COVERAGE_EXT = ".coverage.npz"
+# Размер клетки растра, м
+COVERAGE_CELL = 50.0
+# Растров в памяти (в т.ч. прежних положений РЛС — возврат без пересчёта)
+COVERAGE_MEMORY_SIZE = 8
+# Эквивалентный радиус Земли с учётом рефракции, м
+EARTH_RADIUS_EFF = 6371000.0 * 4.0 / 3.0
+# Непрозрачность цели, не видимой ни одной РЛС (режим без луча)
+COVERAGE_MASKED_OPACITY = 0.25
+
+
+class HeightMap:
+    """Высоты рельефа (м) на прямоугольнике сцены."""
+
+    def __init__(self, heights, extent: QRectF, source=""):
+        self.heights = np.ascontiguousarray(heights, dtype=np.float32)
+        self.extent = QRectF(extent)
+        # Идентификатор данных для ключа кэша (путь и время изменения файла)
+        self.source = source
+
+    @classmethod
+    def from_region(cls, region):
+        """Карта высот региона или None (плоский рельеф)."""
+        spec = getattr(region, "heightmap", None)
+        if not spec:
+            return None
+        if isinstance(spec, str):
+            spec = {"path": spec}
+        path = spec.get("path")
+        try:
+            if path.endswith(".npy"):
+                heights = np.load(path).astype(np.float32)
+            else:
+                heights = _image_heights(path)
+            heights = heights * float(spec.get("scale", 1.0)) + float(spec.get("offset", 0.0))
+            source = f"{path}:{os.path.getmtime(path):.0f}:{spec.get('scale', 1.0)}:{spec.get('offset', 0.0)}"
+            return cls(heights, region.extent, source)
+        except Exception as e:
+            print(f"[coverage] Failed to load height map {path}: {e}")
+            return None
+
+    def sample(self, x, y):
+        """Высоты в точках (ближайший пиксель); вне карты — 0."""
+        rows, cols = self.heights.shape
+        e = self.extent
+        c = np.floor((np.asarray(x) - e.left()) / e.width() * cols).astype(np.int64)
+        r = np.floor((np.asarray(y) - e.top()) / e.height() * rows).astype(np.int64)
+        inside = (c >= 0) & (c < cols) & (r >= 0) & (r < rows)
+        out = np.zeros(np.shape(c), dtype=np.float32)
+        out[inside] = self.heights[r[inside], c[inside]]
+        return out
+
+
+def _image_heights(path):
+    img = QImage(path)
+    if img.isNull():
+        raise ValueError(f"Не удалось прочитать изображение: {path}")
+    fmt16 = getattr(QImage, "Format_Grayscale16", None)
+    fmt, dtype = (fmt16, np.uint16) if fmt16 is not None else (QImage.Format_Grayscale8, np.uint8)
+    img = img.convertToFormat(fmt)
+    ptr = img.constBits()
+    ptr.setsize(img.byteCount())
+    rows = np.frombuffer(ptr, dtype=dtype).reshape(img.height(), img.bytesPerLine() // np.dtype(dtype).itemsize)
+    heights = rows[:, :img.width()].astype(np.float32)
+    # 16-битная шкала приводится к 0..255, чтобы scale не зависел от глубины файла
+    return heights / 257.0 if dtype is np.uint16 else heights
+
+
+class CoverageRaster:
+    """Минимальная обнаруживаемая высота над землёй по клеткам; inf — не видно."""
+
+    def __init__(self, x0, y0, cell, min_alt):
+        self.x0, self.y0, self.cell = float(x0), float(y0), float(cell)
+        self.min_alt = np.asarray(min_alt, dtype=np.float32)
+
+    def lookup(self, xy):
+        """Порог высоты для точек N x 2 (вне растра — inf)."""
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        rows, cols = self.min_alt.shape
+        c = np.floor((xy[:, 0] - self.x0) / self.cell).astype(np.int64)
+        r = np.floor((xy[:, 1] - self.y0) / self.cell).astype(np.int64)
+        inside = (c >= 0) & (c < cols) & (r >= 0) & (r < rows)
+        out = np.full(len(xy), np.inf, dtype=np.float32)
+        out[inside] = self.min_alt[r[inside], c[inside]]
+        return out
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, origin=np.array([self.x0, self.y0, self.cell]), min_alt=self.min_alt)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            x0, y0, cell = data["origin"].tolist()
+            return cls(x0, y0, cell, data["min_alt"])
+
+
+def compute_coverage(heightmap, center, antenna_height, coverage_range, cell=COVERAGE_CELL):
+    """
+    Растр видимости одной РЛС. center — (x, y); heightmap — HeightMap или None.
+    Полярная таблица: шаг по дальности — полклетки, по азимуту — не крупнее
+    клетки на краю зоны.
+    """
+    cx, cy = float(center[0]), float(center[1])
+    R = float(coverage_range)
+    step = cell / 2.0
+    n_r = max(2, int(np.ceil(R / step)))
+    n_az = int(min(8192, max(360, np.ceil(2 * np.pi * R / cell))))
+    r = (np.arange(n_r) + 1.0) * step
+    az = np.arange(n_az) * (2 * np.pi / n_az)
+
+    def terrain(x, y):
+        return heightmap.sample(x, y) if heightmap is not None else np.zeros(np.shape(x), dtype=np.float32)
+
+    ground0 = float(terrain(np.array([cx]), np.array([cy]))[0])
+    h_ant = ground0 + float(antenna_height)
+    drop = r * r / (2.0 * EARTH_RADIUS_EFF)
+
+    # Угол закрытия (тангенс) вдоль лучей; закрывает рельеф ближе текущей точки
+    px = cx + np.cos(az)[:, None] * r[None, :]
+    py = cy + np.sin(az)[:, None] * r[None, :]
+    h = terrain(px, py)
+    slope = (h - drop[None, :] - h_ant) / r[None, :]
+    mask = np.maximum.accumulate(slope, axis=1)
+    mask = np.concatenate([np.full((n_az, 1), -np.inf), mask[:, :-1]], axis=1)
+    # Высота луча над уровнем моря в точке и её превышение над рельефом
+    ray = h_ant + r[None, :] * mask + drop[None, :]
+    polar = np.maximum(ray - h, 0.0).astype(np.float32)
+
+    # Перенос на декартову сетку: ближайший азимут и дальность
+    n = int(np.ceil(2 * R / cell))
+    x0, y0 = cx - n * cell / 2.0, cy - n * cell / 2.0
+    gx = x0 + (np.arange(n) + 0.5) * cell
+    gy = y0 + (np.arange(n) + 0.5) * cell
+    dx = gx[None, :] - cx
+    dy = gy[:, None] - cy
+    dist = np.hypot(dx, dy)
+    ri = np.clip(np.round(dist / step).astype(np.int64) - 1, 0, n_r - 1)
+    ai = np.round(np.arctan2(dy, dx) % (2 * np.pi) / (2 * np.pi / n_az)).astype(np.int64) % n_az
+    min_alt = polar[ai, ri]
+    min_alt[dist > R] = np.inf
+    return CoverageRaster(x0, y0, cell, min_alt)
+
+
+def coverage_key(region_id, heightmap, site, cell=COVERAGE_CELL) -> str:
+    parts = (COVERAGE_VERSION, region_id, heightmap.source if heightmap is not None else "flat",
+             round(site.center.x(), 1), round(site.center.y(), 1), site.height, site.coverage_range, cell)
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def coverage_path(region_id, site, key) -> str:
+    return os.path.join(COVERAGE_CACHE_DIR, f"{region_id}_{site.id}_{key[:16]}{COVERAGE_EXT}")
+
+
+def _load_or_compute(path, heightmap, center, height, coverage_range):
+    # Выполняется в фоновом потоке
+    if os.path.exists(path):
+        try:
+            return CoverageRaster.load(path)
+        except Exception as e:
+            print(f"[coverage] Bad cache file {path}: {e}")
+    raster = compute_coverage(heightmap, center, height, coverage_range)
+    try:
+        raster.save(path)
+    except Exception as e:
+        print(f"[coverage] Failed to save {path}: {e}")
+    return raster
+
+
+class CoverageMap:
+    """
+    Растры видимости всех РЛС сцены. Пересчёт — в фоне и только для РЛС,
+    у которых изменился ключ (перенос, дальность); до готовности растра
+    РЛС видит всё в круге своей дальности. Методы вызываются из GUI-потока.
+    """
+
+    def __init__(self, region_id, heightmap=None):
+        self.region_id = region_id
+        self.heightmap = heightmap
+        self._rasters = OrderedDict()   # key -> CoverageRaster
+        self._pending = {}              # site id -> (key, future)
+        self._site_keys = []
+        self._sites = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="coverage")
+
+    def set_radars(self, network):
+        self._sites = list(network.sites)
+        self._site_keys = [coverage_key(self.region_id, self.heightmap, s) for s in self._sites]
+        for site, key in zip(self._sites, self._site_keys):
+            if key in self._rasters:
+                self._rasters.move_to_end(key)
+                continue
+            pending = self._pending.get(site.id)
+            if pending is not None:
+                if pending[0] == key:
+                    continue
+                # Прежнее положение ещё не посчитано — больше не нужно
+                pending[1].cancel()
+            future = self._executor.submit(_load_or_compute, coverage_path(self.region_id, site, key),
+                                           self.heightmap, (site.center.x(), site.center.y()),
+                                           site.height, site.coverage_range)
+            self._pending[site.id] = (key, future)
+
+    def _collect(self):
+        for site_id, (key, future) in list(self._pending.items()):
+            if not future.done():
+                continue
+            del self._pending[site_id]
+            if future.cancelled():
+                continue
+            try:
+                self._rasters[key] = future.result()
+            except Exception as e:
+                print(f"[coverage] Failed to compute coverage for {site_id}: {e}")
+                continue
+            while len(self._rasters) > COVERAGE_MEMORY_SIZE:
+                self._rasters.popitem(last=False)
+
+    def ready(self) -> bool:
+        self._collect()
+        return all(k in self._rasters for k in self._site_keys)
+
+    def wait(self):
+        """Дождаться всех растров (офлайн-расчёт, проверки)."""
+        for _, future in list(self._pending.values()):
+            try:
+                future.result()
+            except Exception:
+                pass
+        self._collect()
+
+    def raster(self, index):
+        self._collect()
+        return self._rasters.get(self._site_keys[index])
+
+    def min_altitude(self, xy):
+        """Порог высоты N x M по всем РЛС; без готового растра — 0 в круге дальности."""
+        self._collect()
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        out = np.empty((len(xy), len(self._sites)), dtype=np.float32)
+        for j, (site, key) in enumerate(zip(self._sites, self._site_keys)):
+            raster = self._rasters.get(key)
+            if raster is not None:
+                out[:, j] = raster.lookup(xy)
+            else:
+                d = np.hypot(xy[:, 0] - site.center.x(), xy[:, 1] - site.center.y())
+                out[:, j] = np.where(d <= site.coverage_range, 0.0, np.inf)
+        return out
+
+    def detectable(self, xy, altitude):
+        """Видна ли цель хотя бы одной РЛС: xy N x 2, altitude N (м над землёй)."""
+        if not self._sites or len(xy) == 0:
+            return np.zeros(len(xy), dtype=bool)
+        return (np.asarray(altitude, dtype=np.float32)[:, None] >= self.min_altitude(xy)).any(axis=1)
+
+    def shutdown(self):
+        for _, future in self._pending.values():
+            future.cancel()
+        self._executor.shutdown(wait=False)
+        self._pending.clear()
+
+
+def main(argv=None):
+    from maps import MapCatalog
+    from radars import RadarNetwork
+
+    parser = argparse.ArgumentParser(description="Расчёт растров видимости РЛС региона")
+    parser.add_argument("region", help="id региона из assets/maps.json")
+    args = parser.parse_args(argv)
+    region = MapCatalog.load().get(args.region)
+    if region is None:
+        print(f"[coverage] Unknown region: {args.region}")
+        return 1
+    cov = CoverageMap(region.id, HeightMap.from_region(region))
+    network = RadarNetwork.from_region(region)
+    cov.set_radars(network)
+    cov.wait()
+    for site in network.sites:
+        print(f"[coverage] {site.id}: {coverage_path(region.id, site, coverage_key(region.id, cov.heightmap, site))}")
+    cov.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
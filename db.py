@@ -1,18 +1,244 @@
+import os
+import re
 import sqlite3
 import hashlib
+import queue
+import functools
+import threading
 from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from archive import (EVENTS_ARCHIVE_DIR, EVENTS_ARCHIVE_BATCH, EVENTS_ARCHIVE_MAX_ATTACHED,
+                     month_of, archive_alias, archive_path, months_between)
 
 DB_NAME = "rls_trainer.db"
+# Сколько операций из очереди выполнять в одной транзакции
+DB_BATCH_SIZE = 64
+# Столбцы журнала событий (основная таблица, архивы и представление events_all)
+EVENT_COLUMNS = "id, user_id, created_at, type, message, screenshot_path"
+# Токенизатор полнотекстового индекса: регистр не различается (в т.ч. в кириллице)
+EVENTS_FTS_TOKENIZE = "unicode61 remove_diacritics 2"
+# Поиск считает найденные события не дальше этого числа
+EVENTS_SEARCH_COUNT_LIMIT = 1000
+
+
+def fts_query(text: str) -> str:
+    """Строка поиска -> запрос FTS5: все слова, каждое по префиксу."""
+    return " ".join(f'"{w}"*' for w in re.findall(r"\w+", text or ""))
+
+
+class DBWorker(threading.Thread):
+    """
+    Поток, владеющий соединением SQLite. Операции ставятся в очередь и
+    выполняются по порядку; подряд идущие операции группируются в одну
+    транзакцию (один commit на пачку), после чего разрешаются их Future.
+    Каждая операция — под своей точкой сохранения: ошибка откатывает только
+    её записи. Методы с _own_transaction выполняются вне общей транзакции.
+    """
+
+    def __init__(self, path):
+        super().__init__(name="db-worker", daemon=True)
+        self.path = path
+        self.conn = None
+        self.in_batch = False
+        self._queue = queue.Queue()
+        self._ready = threading.Event()
+        self._error = None
+
+    def start(self):
+        super().start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        self._queue.put((fn, args, kwargs, future))
+        return future
+
+    def stop(self):
+        self._queue.put(None)
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+    def run(self):
+        try:
+            self.conn = sqlite3.connect(self.path)
+            self.conn.row_factory = sqlite3.Row
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            while len(batch) < DB_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stop = True
+                batch = batch[:batch.index(None)]
+            self._run_batch(batch)
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+    def _run_batch(self, batch):
+        # Операции со своими транзакциями (ATTACH/DETACH) выполняются отдельно,
+        # остальные — в общей транзакции до и после них
+        group = []
+        for op in batch:
+            if getattr(op[0], "own_transaction", False):
+                self._run_group(group)
+                group = []
+                self._run_own(op)
+            else:
+                group.append(op)
+        self._run_group(group)
+
+    def _run_group(self, group):
+        outcomes = []
+        c = self.conn.cursor()
+        self.in_batch = True
+        for fn, args, kwargs, future in group:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                # Точка сохранения на операцию: ошибка откатывает только её записи
+                if not self.conn.in_transaction:
+                    c.execute("BEGIN")
+                c.execute("SAVEPOINT op")
+            except BaseException as e:
+                outcomes.append((future, None, e))
+                continue
+            try:
+                result = fn(*args, **kwargs)
+                # Операция могла зафиксировать транзакцию сама (commit вне _commit)
+                if self.conn.in_transaction:
+                    c.execute("RELEASE op")
+                outcomes.append((future, result, None))
+            except BaseException as e:
+                try:
+                    c.execute("ROLLBACK TO op")
+                    c.execute("RELEASE op")
+                except sqlite3.Error:
+                    pass
+                outcomes.append((future, None, e))
+        self.in_batch = False
+        try:
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            outcomes = [(f, None, err or e) for f, _, err in outcomes]
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _run_own(self, op):
+        fn, args, kwargs, future = op
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = fn(*args, **kwargs)
+            self.conn.commit()
+        except BaseException as e:
+            try:
+                self.conn.rollback()
+            except sqlite3.Error:
+                pass
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+
+class _ResultRelay(QObject):
+    """Доставляет результат из потока БД в GUI-поток (queued connection)."""
+    done = pyqtSignal(object, object)
+
+    def __init__(self):
+        super().__init__()
+        self.done.connect(self._deliver)
+
+    def _deliver(self, callback, value):
+        callback(value)
+
+
+def _own_transaction(method):
+    """
+    Метод сам управляет транзакцией (ATTACH/DETACH возможны только вне её):
+    поток БД выполняет его вне общей транзакции пачки, отдельно.
+    """
+    method.own_transaction = True
+    return method
+
+
+def _on_db_thread(method):
+    """Выполняет метод DB в потоке БД и ждёт результат (синхронный фасад)."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if threading.current_thread() is self._worker:
+            return method(self, *args, **kwargs)
+        return self._worker.submit(method, self, *args, **kwargs).result()
+    return wrapper
 
 
 class DB:
     def __init__(self, path=DB_NAME):
-        self.conn = sqlite3.connect(path)
-        self.conn.row_factory = sqlite3.Row
-        self._init_schema()
+        self.path = path
+        self._worker = DBWorker(path)
+        self._worker.start()
+        self.conn = self._worker.conn
+        self._relay = _ResultRelay()
+        # Подключённые для чтения архивы событий: месяц -> псевдоним (порядок — LRU)
+        self._attached = OrderedDict()
+        # Есть ли в сборке SQLite модуль FTS5 (иначе поиск — через LIKE)
+        self.fts_enabled = False
+        self._worker.submit(self._init_schema).result()
+
+    def submit(self, name, *args, **kwargs) -> Future:
+        """Ставит метод DB в очередь и сразу возвращает Future."""
+        method = getattr(type(self), name)
+        return self._worker.submit(getattr(method, "__wrapped__", method), self, *args, **kwargs)
+
+    def call_async(self, name, *args, on_done=None, on_error=None, **kwargs) -> Future:
+        """
+        Как submit, но результат (или исключение) передаётся в on_done/on_error
+        в GUI-потоке. Без on_error ошибка только печатается.
+        """
+        future = self.submit(name, *args, **kwargs)
+
+        def _finished(f):
+            error = f.exception()
+            if error is not None:
+                if on_error is not None:
+                    self._relay.done.emit(on_error, error)
+                else:
+                    print(f"[db] {name} failed: {error}")
+            elif on_done is not None:
+                self._relay.done.emit(on_done, f.result())
+        future.add_done_callback(_finished)
+        return future
+
+    def _commit(self):
+        # Внутри пачки фиксирует сам поток БД
+        if not self._worker.in_batch:
+            self.conn.commit()
 
+    @_own_transaction
     def _init_schema(self):
         c = self.conn.cursor()
+        # Новая база — с инкрементальной очисткой, чтобы файл сжимался после архивации
+        # (для существующей базы не действует: освобождённые страницы просто переиспользуются)
+        c.execute("PRAGMA auto_vacuum=INCREMENTAL")
         c.execute("""
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -41,6 +267,28 @@ class DB:
             screenshot_path TEXT,
             FOREIGN KEY(user_id) REFERENCES users(id)
         )""")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_events_user ON events(user_id, id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_events_created ON events(created_at)")
+        self.fts_enabled = self._ensure_events_fts("main")
+        c.execute("""CREATE INDEX IF NOT EXISTS idx_events_screenshot ON events(screenshot_path)
+                     WHERE screenshot_path IS NOT NULL""")
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS identifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            training_id INTEGER,
+            user_id INTEGER,
+            uid INTEGER,
+            object_type TEXT,
+            latency_sec REAL,
+            distance_m REAL,
+            ring_band INTEGER,
+            correct INTEGER,
+            identified_at TEXT,
+            FOREIGN KEY(training_id) REFERENCES trainings(id),
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )""")
+        c.execute("""CREATE INDEX IF NOT EXISTS idx_ident_user_latency
+                     ON identifications(user_id, correct, latency_sec)""")
         c.execute("""
         CREATE TABLE IF NOT EXISTS settings (
             id INTEGER PRIMARY KEY CHECK (id=1),
@@ -51,37 +299,93 @@ class DB:
             show_heading INTEGER,
             sound_volume REAL
         )""")
-        self.conn.commit()
+        # Зоны по карте и сценарию; геометрия (рамка, рёбра, треугольники) — см. zones.py
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS zones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            map_id TEXT NOT NULL,
+            scenario TEXT NOT NULL DEFAULT '',
+            zone_type TEXT NOT NULL,
+            min_x REAL, min_y REAL, max_x REAL, max_y REAL,
+            points BLOB NOT NULL,
+            edges BLOB NOT NULL,
+            triangles BLOB,
+            updated_at TEXT
+        )""")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_zones_map ON zones(map_id, scenario)")
+        # Помесячные архивы событий (см. archive.py)
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS event_archives (
+            month TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            min_id INTEGER,
+            max_id INTEGER
+        )""")
+        self._commit()
         if not self.get_user_by_username("admin"):
             self.create_user("admin", "admin", "admin")
         if not self.get_settings():
             self.save_settings(home_x=0.0, home_y=0.0, home_scale=1.0,
                                show_trajectory=1, show_heading=1, sound_volume=0.5)
 
+    def _ensure_events_fts(self, schema) -> bool:
+        """
+        Полнотекстовый индекс events_fts над events.message в схеме (основная база
+        или архив) — внешнее содержимое, ведётся триггерами. При создании индекса
+        уже имеющиеся строки индексируются один раз.
+        """
+        c = self.conn.cursor()
+        try:
+            c.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE name='events_fts'")
+            if c.fetchone() is None:
+                c.execute(f"""CREATE VIRTUAL TABLE {schema}.events_fts USING fts5(
+                                 message, content='events', content_rowid='id',
+                                 tokenize='{EVENTS_FTS_TOKENIZE}')""")
+                c.execute(f"INSERT INTO {schema}.events_fts(events_fts) VALUES('rebuild')")
+            c.execute(f"""CREATE TRIGGER IF NOT EXISTS {schema}.events_fts_ai AFTER INSERT ON events BEGIN
+                             INSERT INTO events_fts(rowid, message) VALUES (new.id, new.message);
+                         END""")
+            c.execute(f"""CREATE TRIGGER IF NOT EXISTS {schema}.events_fts_ad AFTER DELETE ON events BEGIN
+                             INSERT INTO events_fts(events_fts, rowid, message) VALUES ('delete', old.id, old.message);
+                         END""")
+            c.execute(f"""CREATE TRIGGER IF NOT EXISTS {schema}.events_fts_au AFTER UPDATE OF message ON events BEGIN
+                             INSERT INTO events_fts(events_fts, rowid, message) VALUES ('delete', old.id, old.message);
+                             INSERT INTO events_fts(rowid, message) VALUES (new.id, new.message);
+                         END""")
+        except sqlite3.OperationalError as e:
+            print(f"[db] Full-text search is unavailable: {e}")
+            return False
+        return True
+
     def close(self):
+        # Очередь дорабатывается до конца, затем поток закрывает соединение
         try:
-            self.conn.close()
+            self._worker.stop()
         except Exception:
             pass
 
     def hash_pwd(self, pwd):
         return hashlib.sha256(pwd.encode("utf-8")).hexdigest()
 
+    @_on_db_thread
     def create_user(self, username, password, role="operator"):
         try:
             c = self.conn.cursor()
             c.execute("INSERT INTO users(username,password_hash,role) VALUES(?,?,?)",
                       (username, self.hash_pwd(password), role))
-            self.conn.commit()
+            self._commit()
             return True
         except sqlite3.IntegrityError:
             return False
 
+    @_on_db_thread
     def get_user_by_username(self, username):
         c = self.conn.cursor()
         c.execute("SELECT * FROM users WHERE username=?", (username,))
         return c.fetchone()
 
+    @_on_db_thread
     def validate_login(self, username, password):
         u = self.get_user_by_username(username)
         if not u:
@@ -90,22 +394,26 @@ class DB:
             return u
         return None
 
+    @_on_db_thread
     def change_password(self, user_id, new_password):
         c = self.conn.cursor()
         c.execute("UPDATE users SET password_hash=? WHERE id=?",
                   (self.hash_pwd(new_password), user_id))
-        self.conn.commit()
+        self._commit()
 
+    @_on_db_thread
     def list_users(self):
         c = self.conn.cursor()
         c.execute("SELECT id, username, role FROM users ORDER BY username")
         return c.fetchall()
 
+    @_on_db_thread
     def set_user_role(self, user_id, role):
         c = self.conn.cursor()
         c.execute("UPDATE users SET role=? WHERE id=?", (role, user_id))
-        self.conn.commit()
+        self._commit()
 
+    @_on_db_thread
     def add_training(self, user_id, started_at, duration_sec, correct, wrong):
         total = correct + wrong
         accuracy = (correct / total) if total > 0 else 0.0
@@ -113,26 +421,391 @@ class DB:
         c.execute("""INSERT INTO trainings(user_id,started_at,duration_sec,correct,wrong,accuracy)
                      VALUES(?,?,?,?,?,?)""",
                   (user_id, started_at, duration_sec, correct, wrong, accuracy))
-        self.conn.commit()
+        self._commit()
+        return c.lastrowid
+
+    @_on_db_thread
+    def add_identifications(self, training_id, user_id, rows):
+        """
+        Пакетная запись опознаваний за сеанс одной транзакцией.
+        rows: (uid, object_type, latency_sec, distance_m, ring_band, correct, identified_at)
+        """
+        if not rows:
+            return
+        self.conn.executemany("""INSERT INTO identifications(training_id, user_id, uid, object_type,
+                                 latency_sec, distance_m, ring_band, correct, identified_at)
+                                 VALUES(?,?,?,?,?,?,?,?,?)""",
+                              [(training_id, user_id) + tuple(r) for r in rows])
+        self._commit()
+
+    @_on_db_thread
+    def save_training_session(self, user_id, started_at, duration_sec, correct, wrong, identifications):
+        """Итоги сеанса и его опознавания — в одной транзакции."""
+        training_id = self.add_training(user_id, started_at, duration_sec, correct, wrong)
+        self.add_identifications(training_id, user_id, identifications)
+        return training_id
+
+    @_on_db_thread
+    def get_latency_percentiles(self, user_id, percentiles=(50, 90, 95), correct_only=True):
+        """
+        Перцентили времени реакции оператора, сек: {50: ..., 90: ...}.
+        Значения берутся по индексу (user_id, correct, latency_sec) через OFFSET,
+        без чтения всей выборки.
+        """
+        cond = "user_id=? AND correct=1" if correct_only else "user_id=?"
+        c = self.conn.cursor()
+        c.execute(f"SELECT COUNT(*) FROM identifications WHERE {cond}", (user_id,))
+        n = c.fetchone()[0]
+        result = {}
+        if n == 0:
+            return result
+        for p in percentiles:
+            k = min(n - 1, max(0, int(round(p / 100.0 * (n - 1)))))
+            c.execute(f"""SELECT latency_sec FROM identifications WHERE {cond}
+                          ORDER BY latency_sec LIMIT 1 OFFSET ?""", (user_id, k))
+            result[p] = c.fetchone()[0]
+        return result
 
+    @_on_db_thread
     def get_trainings(self, user_id):
         c = self.conn.cursor()
         c.execute("""SELECT started_at, duration_sec, correct, wrong, accuracy
                      FROM trainings WHERE user_id=? ORDER BY id DESC""", (user_id,))
         return c.fetchall()
 
+    @_on_db_thread
     def add_event(self, user_id, type_, message, screenshot_path):
         c = self.conn.cursor()
         c.execute("""INSERT INTO events(user_id, created_at, type, message, screenshot_path)
                      VALUES(?,?,?,?,?)""",
                   (user_id, datetime.now().isoformat(timespec='seconds'), type_, message, screenshot_path))
+        self._commit()
+        return c.lastrowid
+
+    @_on_db_thread
+    @_own_transaction
+    def get_events(self, user_id, before_id=None, limit=100, type_=None, include_archive=False):
+        """
+        Страница событий пользователя от новых к старым (для центра уведомлений).
+        С include_archive недостающие строки дочитываются из архивов по месяцам.
+        """
+        rows = self._query_events("events", user_id, before_id, limit, type_)
+        if not include_archive or len(rows) >= limit:
+            return rows
+        c = self.conn.cursor()
+        upper = rows[-1]["id"] if rows else before_id
+        sql = "SELECT month FROM event_archives"
+        args = []
+        if upper is not None:
+            sql += " WHERE min_id<?"
+            args.append(upper)
+        c.execute(sql + " ORDER BY max_id DESC", args)
+        months = [r["month"] for r in c.fetchall()]
+        # Подключаем по несколько месяцев, пока страница не заполнится
+        for i in range(0, len(months), EVENTS_ARCHIVE_MAX_ATTACHED):
+            view = self._attach_archives(months[i:i + EVENTS_ARCHIVE_MAX_ATTACHED], include_main=False)
+            if view is None:
+                continue
+            rows += self._query_events(view, user_id, upper, limit - len(rows), type_)
+            if len(rows) >= limit:
+                break
+            upper = rows[-1]["id"] if rows else upper
+        return rows
+
+    @_on_db_thread
+    @_own_transaction
+    def get_events_between(self, user_id, since, until, type_=None, limit=None):
+        """События пользователя за период [since, until] (ISO) по основной базе и архивам."""
+        c = self.conn.cursor()
+        months = set(months_between(since, until))
+        c.execute("SELECT month FROM event_archives ORDER BY month DESC")
+        months = [r["month"] for r in c.fetchall() if r["month"] in months]
+        sql = f"SELECT {EVENT_COLUMNS} FROM {{}} WHERE user_id=? AND created_at>=? AND created_at<=?"
+        args = [user_id, since, until]
+        if type_:
+            sql += " AND type=?"
+            args.append(type_)
+        sql += " ORDER BY id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        rows = []
+        # Месяцы подключаются окнами; основная таблица — только в первом
+        for i in range(0, max(1, len(months)), EVENTS_ARCHIVE_MAX_ATTACHED):
+            view = self._attach_archives(months[i:i + EVENTS_ARCHIVE_MAX_ATTACHED], include_main=(i == 0))
+            if view is None:
+                continue
+            c.execute(sql.format(view), args)
+            rows += c.fetchall()
+            if limit and len(rows) >= limit:
+                break
+        rows.sort(key=lambda r: r["id"], reverse=True)
+        return rows[:limit] if limit else rows
+
+    @_on_db_thread
+    @_own_transaction
+    def search_events(self, text="", user_id=None, type_=None, since=None, until=None, limit=50, offset=0):
+        """
+        Поиск по журналу событий (основная база и архивы) для разбора.
+        text — слова через пробел (должны встретиться все, по префиксу); фильтры
+        по пользователю, типу и периоду [since, until] (ISO). Возвращает
+        (страница строк-словарей с полем username, найдено). Найденные считаются
+        не дальше EVENTS_SEARCH_COUNT_LIMIT: больше — значит «больше предела».
+        Порядок — от новых к старым: основная база, затем архивы по месяцам.
+        """
+        query = fts_query(text) if self.fts_enabled else ""
+        where, args = [], []
+        if not self.fts_enabled:
+            for word in re.findall(r"\w+", text or ""):
+                where.append("e.message LIKE ?")
+                args.append(f"%{word}%")
+        for cond, value in (("e.user_id=?", user_id), ("e.type=?", type_),
+                            ("e.created_at>=?", since), ("e.created_at<=?", until)):
+            if value is not None and value != "":
+                where.append(cond)
+                args.append(value)
+
+        c = self.conn.cursor()
+        c.execute("SELECT month FROM event_archives ORDER BY max_id DESC")
+        months = [r["month"] for r in c.fetchall()]
+        # Месяцы 'ГГГГ-ММ' сравниваются как строки
+        if since:
+            months = [m for m in months if m >= month_of(since)]
+        if until:
+            months = [m for m in months if m <= month_of(until)]
+
+        rows, total = [], 0
+        skip, need = int(offset), int(limit)
+        for source in ["main"] + months:
+            if need <= 0 and total > EVENTS_SEARCH_COUNT_LIMIT:
+                break
+            if source == "main":
+                schema = "main"
+            else:
+                self._attach_archives([source], include_main=False)
+                schema = self._attached.get(source)
+                if schema is None or (query and not self._ensure_events_fts(schema)):
+                    continue
+            sql, sql_args, order = self._search_source(schema, query, where, args, since, until)
+            if sql is None:
+                continue
+            # Счёт с ограничением: до начала страницы он точный, дальше — до предела
+            cap = max(EVENTS_SEARCH_COUNT_LIMIT + 1 - total, skip + need)
+            c.execute(f"SELECT count(*) FROM (SELECT 1 {sql} LIMIT ?)", sql_args + [cap])
+            n = c.fetchone()[0]
+            total += n
+            if need <= 0:
+                continue
+            if skip >= n:
+                skip -= n
+                continue
+            c.execute(f"SELECT {', '.join('e.' + col for col in EVENT_COLUMNS.split(', '))} {sql} "
+                      f"ORDER BY {order} DESC LIMIT ? OFFSET ?", sql_args + [need, skip])
+            page = c.fetchall()
+            rows += page
+            need -= len(page)
+            skip = 0
+        c.execute("SELECT id, username FROM users")
+        names = {r["id"]: r["username"] for r in c.fetchall()}
+        return [dict(r, username=names.get(r["user_id"], "-")) for r in rows], total
+
+    def _search_source(self, schema, query, where, args, since, until):
+        """
+        FROM/WHERE поиска в одной схеме. С текстом выборку ведёт полнотекстовый
+        индекс (CROSS JOIN: от новых rowid к старым, с остановкой по LIMIT), период
+        сужается до диапазона id по индексу created_at. Возвращает (SQL, параметры,
+        столбец порядка); SQL None — совпадений нет.
+        """
+        if not query:
+            return f"FROM {schema}.events e WHERE {' AND '.join(where) or '1'}", list(args), "e.id"
+        head, head_args = ["f.events_fts MATCH ?"], [query]
+        if since or until:
+            period = [cond for cond, value in (("created_at>=?", since), ("created_at<=?", until)) if value]
+            c = self.conn.cursor()
+            c.execute(f"SELECT min(id), max(id) FROM {schema}.events WHERE {' AND '.join(period)}",
+                      [v for v in (since, until) if v])
+            lo, hi = c.fetchone()
+            if lo is None:
+                return None, None, None
+            head.append("f.rowid BETWEEN ? AND ?")
+            head_args += [lo, hi]
+        return (f"FROM {schema}.events_fts f CROSS JOIN {schema}.events e ON e.id=f.rowid "
+                f"WHERE {' AND '.join(head + where)}"), head_args + list(args), "f.rowid"
+
+    def _query_events(self, source, user_id, before_id, limit, type_):
+        sql = f"SELECT {EVENT_COLUMNS} FROM {source} WHERE user_id=?"
+        args = [user_id]
+        if before_id is not None:
+            sql += " AND id<?"
+            args.append(before_id)
+        if type_:
+            sql += " AND type=?"
+            args.append(type_)
+        sql += " ORDER BY id DESC LIMIT ?"
+        args.append(int(limit))
+        c = self.conn.cursor()
+        c.execute(sql, args)
+        return c.fetchall()
+
+    def _attach_archives(self, months, include_main=True):
+        """
+        Подключает архивы месяцев (не больше EVENTS_ARCHIVE_MAX_ATTACHED, давно
+        не нужные отключаются) и возвращает источник: временное представление
+        events_all над основной таблицей (include_main) и этими архивами;
+        events, если архивов нет, и None, если нет ни архивов, ни основной таблицы.
+        """
+        c = self.conn.cursor()
+        months = list(months[:EVENTS_ARCHIVE_MAX_ATTACHED])
+        missing = [m for m in months if m not in self._attached]
+        if missing:
+            marks = ",".join("?" * len(missing))
+            c.execute(f"SELECT month, path FROM event_archives WHERE month IN ({marks})", missing)
+            paths = {r["month"]: r["path"] for r in c.fetchall() if os.path.exists(r["path"])}
+            missing = [m for m in missing if m in paths]
+            months = [m for m in months if m in self._attached or m in paths]
+        if not months:
+            return "events" if include_main else None
+        if missing:
+            # ATTACH/DETACH невозможны внутри транзакции
+            self.conn.commit()
+            c.execute("DROP VIEW IF EXISTS temp.events_all")
+            while self._attached and len(self._attached) + len(missing) > EVENTS_ARCHIVE_MAX_ATTACHED:
+                old = next(m for m in self._attached if m not in months)
+                c.execute(f"DETACH DATABASE {self._attached.pop(old)}")
+            for m in missing:
+                alias = archive_alias(m)
+                c.execute("ATTACH DATABASE ? AS " + alias, (paths[m],))
+                self._attached[m] = alias
+        for m in months:
+            self._attached.move_to_end(m)
+        parts = [f"SELECT {EVENT_COLUMNS} FROM main.events"] if include_main else []
+        parts += [f"SELECT {EVENT_COLUMNS} FROM {self._attached[m]}.events" for m in sorted(months)]
+        c.execute("DROP VIEW IF EXISTS temp.events_all")
+        c.execute("CREATE TEMP VIEW events_all AS " + " UNION ALL ".join(parts))
+        return "events_all"
+
+    def _detach_archives(self):
+        if not self._attached:
+            return
+        self.conn.commit()
+        c = self.conn.cursor()
+        c.execute("DROP VIEW IF EXISTS temp.events_all")
+        for alias in self._attached.values():
+            c.execute(f"DETACH DATABASE {alias}")
+        self._attached.clear()
+
+    @_on_db_thread
+    @_own_transaction
+    def archive_events_step(self, before, directory=EVENTS_ARCHIVE_DIR, batch=EVENTS_ARCHIVE_BATCH):
+        """
+        Переносит до batch самых старых событий с created_at < before (одного
+        месяца) в архив этого месяца. Возвращает число перенесённых строк.
+        """
+        c = self.conn.cursor()
+        c.execute("SELECT id, created_at FROM events WHERE created_at<? ORDER BY created_at, id LIMIT ?",
+                  (before, int(batch)))
+        rows = c.fetchall()
+        if not rows:
+            return 0
+        month = month_of(rows[0]["created_at"])
+        ids = [r["id"] for r in rows if month_of(r["created_at"]) == month]
+        path = archive_path(month, directory)
+        os.makedirs(directory, exist_ok=True)
+        # Пишущее подключение отдельно от читающих; ATTACH — вне транзакции
+        self._detach_archives()
         self.conn.commit()
+        c.execute("ATTACH DATABASE ? AS arch_write", (path,))
+        try:
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS arch_write.events (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER,
+                created_at TEXT,
+                type TEXT,
+                message TEXT,
+                screenshot_path TEXT
+            )""")
+            c.execute("CREATE INDEX IF NOT EXISTS arch_write.idx_events_user ON events(user_id, id)")
+            c.execute("CREATE INDEX IF NOT EXISTS arch_write.idx_events_created ON events(created_at)")
+            if self.fts_enabled:
+                self._ensure_events_fts("arch_write")
+            marks = ",".join("?" * len(ids))
+            c.execute(f"""INSERT OR IGNORE INTO arch_write.events({EVENT_COLUMNS})
+                          SELECT {EVENT_COLUMNS} FROM main.events WHERE id IN ({marks})""", ids)
+            c.execute(f"DELETE FROM main.events WHERE id IN ({marks})", ids)
+            c.execute("""INSERT INTO event_archives(month, path, row_count, min_id, max_id) VALUES(?,?,?,?,?)
+                         ON CONFLICT(month) DO UPDATE SET row_count=row_count+excluded.row_count,
+                             min_id=min(min_id, excluded.min_id), max_id=max(max_id, excluded.max_id)""",
+                      (month, path, len(ids), min(ids), max(ids)))
+            # Вставка в архив и удаление из основной базы — одна транзакция
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            c.execute("DETACH DATABASE arch_write")
+        c.execute("PRAGMA incremental_vacuum(256)").fetchall()
+        return len(ids)
 
+    @_on_db_thread
+    def clear_screenshot_paths(self, paths):
+        """
+        Обнуляет ссылки на удалённые скриншоты в журнале событий (основная база;
+        в архивах ссылки остаются, наличие файла проверяется при показе).
+        """
+        c = self.conn.cursor()
+        c.executemany("UPDATE events SET screenshot_path=NULL WHERE screenshot_path=?",
+                      [(p,) for p in paths])
+        self._commit()
+
+    @_on_db_thread
+    def save_zone(self, map_id, scenario, zone_type, geometry: dict, zone_id=None):
+        """
+        Сохраняет зону (geometry — ZoneGeometry.to_row()); с zone_id — обновляет.
+        Возвращает id зоны.
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        values = (map_id, scenario or "", zone_type, geometry["min_x"], geometry["min_y"],
+                  geometry["max_x"], geometry["max_y"], geometry["points"], geometry["edges"],
+                  geometry["triangles"], now)
+        c = self.conn.cursor()
+        if zone_id is not None:
+            c.execute("""UPDATE zones SET map_id=?, scenario=?, zone_type=?, min_x=?, min_y=?, max_x=?, max_y=?,
+                         points=?, edges=?, triangles=?, updated_at=? WHERE id=?""", values + (zone_id,))
+        if zone_id is None or c.rowcount == 0:
+            c.execute("""INSERT INTO zones(map_id, scenario, zone_type, min_x, min_y, max_x, max_y,
+                         points, edges, triangles, updated_at) VALUES(?,?,?,?,?,?,?,?,?,?,?)""", values)
+            zone_id = c.lastrowid
+        self._commit()
+        return zone_id
+
+    @_on_db_thread
+    def delete_zone(self, zone_id):
+        self.conn.execute("DELETE FROM zones WHERE id=?", (zone_id,))
+        self._commit()
+
+    @_on_db_thread
+    def get_zones(self, map_id, scenario=""):
+        c = self.conn.cursor()
+        c.execute("""SELECT id, zone_type, min_x, min_y, max_x, max_y, points, edges, triangles
+                     FROM zones WHERE map_id=? AND scenario=? ORDER BY id""", (map_id, scenario or ""))
+        return c.fetchall()
+
+    @_on_db_thread
+    def list_zone_scenarios(self, map_id):
+        """Сценарии зон карты (кроме набора по умолчанию)."""
+        c = self.conn.cursor()
+        c.execute("""SELECT DISTINCT scenario FROM zones WHERE map_id=? AND scenario<>''
+                     ORDER BY scenario""", (map_id,))
+        return [r[0] for r in c.fetchall()]
+
+    @_on_db_thread
     def get_settings(self):
         c = self.conn.cursor()
         c.execute("SELECT * FROM settings WHERE id=1")
         return c.fetchone()
 
+    @_on_db_thread
     def save_settings(self, home_x=None, home_y=None, home_scale=None,
                       show_trajectory=None, show_heading=None, sound_volume=None):
         current = self.get_settings()
@@ -147,11 +820,11 @@ class DB:
             c.execute("""UPDATE settings SET home_x=?, home_y=?, home_scale=?, 
                          show_trajectory=?, show_heading=?, sound_volume=? WHERE id=1""",
                       (home_x, home_y, home_scale, show_trajectory, show_heading, sound_volume))
-            self.conn.commit()
+            self._commit()
         else:
             c = self.conn.cursor()
             c.execute("""INSERT INTO settings(id,home_x,home_y,home_scale,show_trajectory,show_heading,sound_volume)
                          VALUES(1,?,?,?,?,?,?)""",
                       (home_x or 0.0, home_y or 0.0, home_scale or 1.0,
                        int(show_trajectory or 1), int(show_heading or 1), float(sound_volume or 0.5)))
-            self.conn.commit()
+            self._commit()
@@ -1,9 +1,13 @@
+import os
 from PyQt5.QtWidgets import (
     QDialog, QFormLayout, QLineEdit, QDialogButtonBox, QVBoxLayout,
-    QMessageBox, QSpinBox, QDoubleSpinBox, QCheckBox, QPushButton
+    QMessageBox, QSpinBox, QDoubleSpinBox, QCheckBox, QPushButton,
+    QComboBox, QHBoxLayout, QFileDialog
 )
 from PyQt5.QtCore import Qt, QPoint
 from db import DB
+from recording import RECORDINGS_DIR
+from video_export import EXPORT_DEFAULT_SIZE, EXPORT_DEFAULT_FPS, FORMAT_AVI, FORMAT_JPEG_SEQUENCE
 
 
 from PyQt5.QtWidgets import (
@@ -107,9 +111,10 @@ class LoginDialog(QDialog):
 
 
 class TrainingSettings(QDialog):
-    def __init__(self, db: DB, parent=None, max_objects_limit=20):
+    def __init__(self, db: DB, parent=None, max_objects_limit=20, settings=None):
         super().__init__(parent)
         self.db = db
+        self.settings = settings
         self.setWindowTitle("Настройки тренировки")
 
         self.time_limit = QSpinBox()
@@ -125,15 +130,25 @@ class TrainingSettings(QDialog):
         self.bvs_ratio.setSingleStep(0.05)
         self.bvs_ratio.setValue(0.5)
 
-        # Безопасный просмотр настройки из БД
+        # Безопасный просмотр настройки (из кэша, если он передан, иначе из БД)
         try:
-            s = self.db.get_settings()
+            s = (self.settings or self.db).get_settings()
             show_traj_default = bool(s["show_trajectory"])
             show_heading_default = bool(s["show_heading"])
         except Exception:
             show_traj_default = True
             show_heading_default = True
 
+        self.sweep_rpm = QSpinBox()
+        self.sweep_rpm.setRange(0, 60)
+        self.sweep_rpm.setValue(0)
+        self.sweep_rpm.setSpecialValueText("выкл.")
+
+        self.clutter = QCheckBox("Помехи и ложные отметки")
+        self.clutter.setChecked(False)
+        self.tracking = QCheckBox("Сопровождение целей (фильтр Калмана)")
+        self.tracking.setChecked(False)
+
         self.show_traj = QCheckBox("Показывать траекторию объектов")
         self.show_traj.setChecked(show_traj_default)
         self.show_heading = QCheckBox("Показывать направление движения")
@@ -143,6 +158,9 @@ class TrainingSettings(QDialog):
         form.addRow("Ограничение по времени (сек):", self.time_limit)
         form.addRow("Максимум объектов на карте:", self.max_objects)
         form.addRow("Доля БВС:", self.bvs_ratio)
+        form.addRow("Обзор луча РЛС (об/мин):", self.sweep_rpm)
+        form.addRow(self.clutter)
+        form.addRow(self.tracking)
         form.addRow(self.show_traj)
         form.addRow(self.show_heading)
 
@@ -170,12 +188,124 @@ class TrainingSettings(QDialog):
                 "time_limit": self.time_limit.value(),
                 "max_objects": self.max_objects.value(),
                 "bvs_ratio": float(self.bvs_ratio.value()),
+                "sweep_rpm": self.sweep_rpm.value(),
+                "clutter": self.clutter.isChecked(),
+                "tracking": self.tracking.isChecked(),
                 "show_traj": self.show_traj.isChecked(),
                 "show_heading": self.show_heading.isChecked()
             }
         return None
 
 
+class VideoExportDialog(QDialog):
+    """Параметры экспорта записи сеанса в видео (см. video_export.py)."""
+
+    def __init__(self, parent=None, recording_path=None):
+        super().__init__(parent)
+        self.setWindowTitle("Экспорт сеанса в видео")
+
+        self.format = QComboBox()
+        self.format.addItem("Видео MJPEG (.avi)", FORMAT_AVI)
+        self.format.addItem("Последовательность JPEG", FORMAT_JPEG_SEQUENCE)
+        self.format.currentIndexChanged.connect(self._on_format_changed)
+
+        self.recording = QLineEdit(recording_path or "")
+        btn_recording = QPushButton("...")
+        btn_recording.clicked.connect(self._choose_recording)
+        row_recording = QHBoxLayout()
+        row_recording.addWidget(self.recording)
+        row_recording.addWidget(btn_recording)
+
+        self.output = QLineEdit(self._default_output(recording_path) if recording_path else "")
+        btn_output = QPushButton("...")
+        btn_output.clicked.connect(self._choose_output)
+        row_output = QHBoxLayout()
+        row_output.addWidget(self.output)
+        row_output.addWidget(btn_output)
+
+        self.width_px = QSpinBox()
+        self.width_px.setRange(160, 7680)
+        self.width_px.setValue(EXPORT_DEFAULT_SIZE[0])
+        self.height_px = QSpinBox()
+        self.height_px.setRange(120, 4320)
+        self.height_px.setValue(EXPORT_DEFAULT_SIZE[1])
+        row_size = QHBoxLayout()
+        row_size.addWidget(self.width_px)
+        row_size.addWidget(QLabel("x"))
+        row_size.addWidget(self.height_px)
+
+        self.fps = QSpinBox()
+        self.fps.setRange(1, 60)
+        self.fps.setValue(EXPORT_DEFAULT_FPS)
+
+        self.speed = QDoubleSpinBox()
+        self.speed.setRange(0.25, 16.0)
+        self.speed.setSingleStep(0.25)
+        self.speed.setValue(1.0)
+
+        form = QFormLayout()
+        form.addRow("Запись сеанса:", row_recording)
+        form.addRow("Сохранить в:", row_output)
+        form.addRow("Формат:", self.format)
+        form.addRow("Размер кадра (пикс.):", row_size)
+        form.addRow("Кадров в секунду:", self.fps)
+        form.addRow("Ускорение:", self.speed)
+
+        self.btns = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        self.btns.accepted.connect(self._on_accept)
+        self.btns.rejected.connect(self.reject)
+
+        layout = QVBoxLayout()
+        layout.addLayout(form)
+        layout.addWidget(self.btns)
+        self.setLayout(layout)
+        self.resize(520, 260)
+
+    def _default_output(self, recording_path):
+        base = os.path.splitext(recording_path)[0]
+        return base + ".avi" if self.format.currentData() == FORMAT_AVI else base + "_frames"
+
+    def _choose_recording(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Запись сеанса", RECORDINGS_DIR,
+                                                    "Записи сеансов (*.npz)")
+        if path:
+            self.recording.setText(path)
+            self.output.setText(self._default_output(path))
+
+    def _choose_output(self):
+        if self.format.currentData() == FORMAT_AVI:
+            path, _ = QFileDialog.getSaveFileName(self, "Сохранить видео", self.output.text(), "AVI (*.avi)")
+        else:
+            path = QFileDialog.getExistingDirectory(self, "Каталог для кадров", self.output.text())
+        if path:
+            self.output.setText(path)
+
+    def _on_format_changed(self, _index):
+        if self.recording.text():
+            self.output.setText(self._default_output(self.recording.text()))
+
+    def _on_accept(self):
+        if not os.path.exists(self.recording.text()):
+            QMessageBox.warning(self, "Ошибка", "Файл записи сеанса не найден")
+            return
+        if not self.output.text():
+            QMessageBox.warning(self, "Ошибка", "Укажите, куда сохранить видео")
+            return
+        self.accept()
+
+    def get(self):
+        if self.exec_() == QDialog.Accepted:
+            return {
+                "recording": self.recording.text(),
+                "output": self.output.text(),
+                "fmt": self.format.currentData(),
+                "size": (self.width_px.value(), self.height_px.value()),
+                "fps": self.fps.value(),
+                "speed": float(self.speed.value()),
+            }
+        return None
+
+
 class ActionPopup(QDialog):
     """
     Неблокирующее всплывающее окно выбора действия над объектом.
@@ -4,18 +4,32 @@ import time
 import random
 from datetime import datetime
 
+import numpy as np
 from PyQt5.QtCore import Qt, QPointF, QRectF, QLineF, pyqtSignal
 from PyQt5.QtGui import (
-    QBrush, QPen, QColor, QTransform, QPolygonF, QPainterPath, QPixmap, QPainter
+    QBrush, QPen, QColor, QTransform, QPolygonF, QPainterPath, QPainter
 )
 from PyQt5.QtWidgets import (
     QGraphicsView, QGraphicsScene, QGraphicsEllipseItem, QGraphicsPathItem,
     QGraphicsPolygonItem, QGraphicsLineItem, QGraphicsPathItem as _QGraphicsPathItem,
-    QGraphicsPixmapItem, QGraphicsItem
+    QGraphicsItem
 )
 
-# Папки/пути
-SCREENSHOTS_DIR = "screenshots"
+from maps import MapRegion, MapCatalog, shared_map_cache
+from alarms import AlarmEngine
+from storage import SCREENSHOTS_DIR
+from classification import FeatureCache, ClassifierRunner
+from kinematics import TrackStatsStore, STATS_FIELDS
+from radars import RadarNetwork, RadarSite
+from sweep import SweepModel, SweepLayer, SWEEP_DEFAULT_RPM
+from clutter import ClutterGenerator, ClutterLayer, CLUTTER_REFRESH_SEC, CLUTTER_SEED, coverage_rect
+from tracker import KalmanTracker, TrackLayer, TRACK_COAST_SEC, TRACK_PLOT_SIGMA, TRACK_CLUTTER_PASS
+from coverage import CoverageMap, HeightMap, COVERAGE_MASKED_OPACITY
+from zones import ZoneGeometry
+from lod import (LOD_FULL, LOD_CLUSTER, LOD_HYSTERESIS, LOD_CLUSTER_SCALE, CLUSTER_CELL_PX,
+                 TRAIL_TOLERANCE_PX, ClusterItem, grid_clusters, lod_for_scale, simplify_polyline,
+                 view_scale, view_lod, view_shows, LAYER_TARGETS, LAYER_TRAJECTORIES, LAYER_HEADINGS,
+                 LAYER_ZONES)
 
 # Мир и отрисовка
 WORLD_WIDTH = 20000
@@ -28,27 +42,40 @@ DEFAULT_MAP_PATH = "assets/spb.map.png"
 MAX_TRAJ_POINTS = 400
 DEFAULT_MAX_OBJECTS = 20
 
+# Отсечение по видимой области: запас вокруг окна вида, пикселей экрана
+CULL_MARGIN_PX = 100
+
+# Перерисовка вида: при числе изменившихся за тик объектов не больше порога —
+# по точным областям, иначе одной общей ограничивающей областью
+REPAINT_MINIMAL_MAX_ITEMS = 24
+
+# Рисование зон: радиус привязки к вершинам и допуск упрощения контура, пикселей экрана
+ZONE_SNAP_PX = 10
+ZONE_SIMPLIFY_PX = 1.5
+
 # EDIT HERE: координаты центра радара на сцене (в единицах сцены/пикселях)
 DEFAULT_RADAR_CENTER = QPointF(2000, 0)
 
 
-def point_in_polygon(point: QPointF, polygon: QPolygonF) -> bool:
-    x, y = point.x(), point.y()
-    inside = False
-    n = polygon.count()
-    for i in range(n):
-        p1 = polygon[i]
-        p2 = polygon[(i + 1) % n]
-        if ((p1.y() > y) != (p2.y() > y)) and \
-           (x < (p2.x() - p1.x()) * (y - p1.y()) / (p2.y() - p1.y() + 1e-9) + p1.x()):
-            inside = not inside
-    return inside
+def default_map_region() -> MapRegion:
+    """Регион по умолчанию, если каталог assets/maps.json не задан."""
+    return MapRegion("default", "Карта по умолчанию", DEFAULT_MAP_PATH,
+                     QRectF(-WORLD_WIDTH/2, -WORLD_HEIGHT/2, WORLD_WIDTH, WORLD_HEIGHT),
+                     DEFAULT_RADAR_CENTER)
 
 
 class ZoneItem(QGraphicsPolygonItem):
-    def __init__(self, polygon: QPolygonF, zone_type="detect"):
+    _id_counter = 1
+
+    def __init__(self, polygon: QPolygonF, zone_type="detect", geometry: ZoneGeometry = None, db_id=None):
         super().__init__(polygon)
+        self.zone_id = ZoneItem._id_counter
+        ZoneItem._id_counter += 1
         self.zone_type = zone_type
+        # Предрасчитанная геометрия (рамка, рёбра, треугольники) и id строки в БД
+        self.geometry = geometry if geometry is not None else ZoneGeometry.from_polygon(polygon)
+        self.db_id = db_id
+        self.removed = False
         if zone_type == "detect":
             pen = QPen(QColor(0, 180, 0, 160), 2, Qt.DashLine)
             self.setBrush(QBrush(QColor(0, 255, 0, 40)))
@@ -64,8 +91,13 @@ class ZoneItem(QGraphicsPolygonItem):
         self.setFlags(QGraphicsItem.ItemIsSelectable | QGraphicsItem.ItemIsFocusable)
         self.setAcceptHoverEvents(True)
 
+    def paint(self, painter, option, widget=None):
+        if view_shows(widget, LAYER_ZONES):
+            super().paint(painter, option, widget)
+
     def hoverEnterEvent(self, event):
         self.setPen(self.hover_pen)
+        self.setToolTip(f"Зона {self.zone_id}: {self.geometry.area() / 1e6:.2f} км²")
         super().hoverEnterEvent(event)
 
     def hoverLeaveEvent(self, event):
@@ -85,6 +117,10 @@ class TrajectoryItem(QGraphicsPathItem):
         self.setPen(pen)
         self.setZValue(-1)
 
+    def paint(self, painter, option, widget=None):
+        if view_shows(widget, LAYER_TRAJECTORIES):
+            super().paint(painter, option, widget)
+
 
 class HeadingItem(QGraphicsLineItem):
     def __init__(self):
@@ -93,12 +129,25 @@ class HeadingItem(QGraphicsLineItem):
         self.setPen(pen)
         self.setZValue(1)
 
+    def paint(self, painter, option, widget=None):
+        # Линия направления — только в видах полной детализации
+        if view_lod(widget) == LOD_FULL and view_shows(widget, LAYER_HEADINGS):
+            super().paint(painter, option, widget)
+
+
+class EcmItem(QGraphicsEllipseItem):
+    """Отметка помех на объекте; рисуется там же, где и сам объект."""
+
+    def paint(self, painter, option, widget=None):
+        if view_lod(widget) != LOD_CLUSTER and view_shows(widget, LAYER_TARGETS):
+            super().paint(painter, option, widget)
+
 
 class MovingObjectItem(QGraphicsEllipseItem):
     _uid_counter = 1
 
     def __init__(self, type_, pos: QPointF, velocity: QPointF, speed_mps: float,
-                 show_traj=True, show_heading=True):
+                 show_traj=True, show_heading=True, altitude=100.0):
         r = 45  # Радиус объекта (можно изменить по желанию)
         super().__init__(-r, -r, 2*r, 2*r)  # Создание круга
 
@@ -106,9 +155,14 @@ class MovingObjectItem(QGraphicsEllipseItem):
         MovingObjectItem._uid_counter += 1
 
         self.setPos(pos)
+        # Положение в модели; pos() элемента может отставать, пока объект вне вида
+        self.sim_pos = QPointF(pos)
         self.type_ = type_  # Сохраняем тип объекта (для логики)
         self.velocity = velocity
         self.speed_mps = speed_mps
+        # Высота над землёй, м (видимость с учётом рельефа, см. coverage.py)
+        self.altitude = float(altitude)
+        self.detected = True
         self.spawn_time = time.time()
         self.traj_points = [pos]
         self.traj_item = TrajectoryItem()
@@ -123,7 +177,7 @@ class MovingObjectItem(QGraphicsEllipseItem):
 
         # [ECM] — элементы помех
         self.has_ecm = False
-        self.ecm_item = QGraphicsEllipseItem(-14, -14, 28, 28, self)
+        self.ecm_item = EcmItem(-14, -14, 28, 28, self)
         self.ecm_item.setZValue(4)
         self.ecm_item.setPen(QPen(QColor(0, 120, 255, 200), 2, Qt.SolidLine))
         self.ecm_item.setBrush(QBrush(QColor(0, 120, 255, 30)))
@@ -136,12 +190,31 @@ class MovingObjectItem(QGraphicsEllipseItem):
         self.setAcceptHoverEvents(True)
         self.setZValue(5)
 
-        # Индикатор последней зоны колец (-1 = вне)
+        # Индикатор последней зоны колец основной РЛС (-1 = вне) и колец всех РЛС
         self._ring_band_last = -1
+        self._ring_bands = np.empty(0, dtype=np.int64)
+        # Точка, по которую построен путь траектории (для прореженного режима)
+        self._traj_built_at = None
+        # Графика отстаёт от модели (объект был вне видимой области)
+        self._graphics_dirty = False
 
     def lifetime(self):
         return time.time() - self.spawn_time
 
+    def paint(self, painter, option, widget=None):
+        # Вид на уровне кластеров рисует кластеры вместо объектов
+        if view_lod(widget) != LOD_CLUSTER and view_shows(widget, LAYER_TARGETS):
+            super().paint(painter, option, widget)
+
+    def set_detected(self, detected: bool):
+        """Цель закрыта рельефом от всех РЛС — отметок нет, на экране она приглушена."""
+        if detected == self.detected:
+            return
+        self.detected = detected
+        opacity = 1.0 if detected else COVERAGE_MASKED_OPACITY
+        for item in (self, self.traj_item, self.heading_item):
+            item.setOpacity(opacity)
+
     def _update_visuals(self):
         # Логика изменения внешнего вида объекта
         if self.state == "suppressed":
@@ -159,11 +232,11 @@ class MovingObjectItem(QGraphicsEllipseItem):
     def update_motion(self, dt, map_scene):
         dx = self.velocity.x() * dt
         dy = self.velocity.y() * dt
-        new_pos = self.pos() + QPointF(dx, dy)
+        new_pos = self.sim_pos + QPointF(dx, dy)
 
         if self.type_ == "bird":  # Логика для типа "bird"
             center = map_scene.radar_center
-            away = (self.pos() - center)
+            away = (self.sim_pos - center)
             dist = math.hypot(away.x(), away.y()) + 1e-6
             away_norm = QPointF(away.x()/dist, away.y()/dist)
             angle = (random.random() - 0.5) * 0.3
@@ -179,29 +252,13 @@ class MovingObjectItem(QGraphicsEllipseItem):
                                         self.velocity.y()/vlen * self.speed_mps)
             dx = self.velocity.x() * dt
             dy = self.velocity.y() * dt
-            new_pos = self.pos() + QPointF(dx, dy)
-
-        self.setPos(new_pos)
+            new_pos = self.sim_pos + QPointF(dx, dy)
 
-        # Обновляем траекторию
+        self.sim_pos = new_pos
         if self.show_traj:
             self.traj_points.append(new_pos)
             if len(self.traj_points) > MAX_TRAJ_POINTS:
                 self.traj_points = self.traj_points[-MAX_TRAJ_POINTS:]
-            path = QPainterPath(self.traj_points[0])
-            for p in self.traj_points[1:]:
-                path.lineTo(p)
-            self.traj_item.setPath(path)
-
-        # Обновляем направление
-        if self.show_heading:
-            v = self.velocity
-            vlen = math.hypot(v.x(), v.y())
-            if vlen > 1e-9:
-                dir_norm = QPointF(v.x()/vlen, v.y()/vlen)
-                start = new_pos
-                end = new_pos + dir_norm * 30.0
-                self.heading_item.setLine(QLineF(start, end))
 
         # Удаляем объект по времени жизни
         if self.type_ == "bird" and getattr(map_scene, "bird_lifetime_limit", None) is not None:
@@ -209,16 +266,86 @@ class MovingObjectItem(QGraphicsEllipseItem):
                 map_scene.remove_object(self)
                 return
 
-        # Ограничение по дальности
+        # Ограничение по дальности: от основной РЛС — object_range_limit, объект
+        # удаляется, только если он и вне дальности всех остальных РЛС
         limit = getattr(map_scene, "object_range_limit", 9000.0)
         if limit is not None:
             cx, cy = map_scene.radar_center.x(), map_scene.radar_center.y()
             if math.hypot(new_pos.x() - cx, new_pos.y() - cy) > float(limit):
-                map_scene.remove_object(self)
-                return
-
+                radars = map_scene.radars
+                dist, _ = radars.measure((new_pos.x(), new_pos.y()))
+                if not (dist[0, 1:] <= radars.coverage[1:]).any():
+                    map_scene.remove_object(self)
+                    return
+
+        # Графика — только для объектов в видимой области (с запасом);
+        # в режиме обзора луча — только при проходе луча (см. MapScene.tick)
+        if map_scene.defers_graphics(self):
+            self._graphics_dirty = True
+        else:
+            self.sync_graphics(map_scene)
+            map_scene.graphics_updates += 1
+
+    def sync_graphics(self, map_scene):
+        """Переносит состояние модели в графику: позиция, траектория, направление."""
+        force = self._graphics_dirty
+        self._graphics_dirty = False
+        if self.pos() != self.sim_pos:
+            self.setPos(self.sim_pos)
+        if self.show_traj:
+            self._rebuild_traj(map_scene.trail_epsilon, force=force)
+        # На обзорных масштабах линия направления скрыта
+        if self.show_heading and map_scene.lod == LOD_FULL:
+            self._update_heading()
         self._update_visuals()
 
+    def scene_bounds(self) -> QRectF:
+        """Границы объекта по положению в модели вместе с текущей траекторией."""
+        r = self.rect().translated(self.sim_pos)
+        if self.show_traj and self._traj_built_at is not None:
+            r = r.united(self.traj_item.sceneBoundingRect())
+        return r
+
+    def _rebuild_traj(self, epsilon=0.0, force=False):
+        """
+        Путь траектории. При epsilon > 0 (обзорный масштаб) точки прореживаются
+        по Дугласу — Пекеру, а путь перестраивается, только когда объект сместился
+        больше чем на epsilon с прошлой перестройки — на экране это меньше пикселя.
+        """
+        pts = self.traj_points
+        if not pts:
+            return
+        last = pts[-1]
+        if epsilon > 0 and not force and self._traj_built_at is not None:
+            moved = last - self._traj_built_at
+            if abs(moved.x()) + abs(moved.y()) < epsilon:
+                return
+        self._traj_built_at = last
+        if epsilon > 0 and len(pts) > 2:
+            xy = np.fromiter((c for p in pts for c in (p.x(), p.y())), dtype=np.float64,
+                             count=2 * len(pts)).reshape(-1, 2)
+            pts = [pts[i] for i in simplify_polyline(xy, epsilon)]
+        path = QPainterPath(pts[0])
+        for p in pts[1:]:
+            path.lineTo(p)
+        self.traj_item.setPath(path)
+
+    def _update_heading(self):
+        v = self.velocity
+        vlen = math.hypot(v.x(), v.y())
+        if vlen > 1e-9:
+            start = self.pos()
+            end = start + QPointF(v.x()/vlen, v.y()/vlen) * 30.0
+            self.heading_item.setLine(QLineF(start, end))
+
+    def get_stats_text(self) -> str:
+        """Статистика трека одной строкой на поле (из TrackStatsStore сцены)."""
+        scene = self.scene()
+        if scene is None or not hasattr(scene, "track_stats"):
+            return ""
+        fields = scene.track_stats.summary(self.uid, scene.ring_radii)
+        return "\n".join(f"{title}: {fields[key]}" for key, title in STATS_FIELDS if key in fields)
+
     def hoverEnterEvent(self, event):
         self.update_tooltip()
         super().hoverEnterEvent(event)
@@ -228,36 +355,54 @@ class MovingObjectItem(QGraphicsEllipseItem):
         super().hoverMoveEvent(event)
 
     def update_tooltip(self):
-        lon = self.pos().x()
-        lat = self.pos().y()
+        lon = self.sim_pos.x()
+        lat = self.sim_pos.y()
+        coord_fmt = ".1f"
+        region = getattr(self.scene(), "region", None)
+        geo = region.scene_to_geo(self.sim_pos) if region is not None else None
+        if geo is not None:
+            lon, lat = geo
+            coord_fmt = ".5f"
         spd = self.speed_mps
         lbl = self.label or "-"
         conf = f"{self.confidence:.2f}" if self.label else "-"
         self.setToolTip(
         
             f"Скорость: {spd:.1f} м/с\n"
-            f"Долгота: {lon:.1f}\nШирота: {lat:.1f}\n"
+            f"Высота: {self.altitude:.0f} м\n"
+            f"Долгота: {lon:{coord_fmt}}\nШирота: {lat:{coord_fmt}}\n"
             f"Состояние: {self.state}\n"
         )
 
 class MapScene(QGraphicsScene):
     alarmTriggered = pyqtSignal(str)
-    ringEvent = pyqtSignal(int, int, float)  # uid, band_index, distance_m
+    ringEvent = pyqtSignal(str, int, int, float)  # radar_id, uid, band_index, distance_m
+    mapChanged = pyqtSignal(str)  # region_id
+    # Модель одна на все виды сцены: виды подписываются на начало/конец тика
+    aboutToTick = pyqtSignal(int)  # сколько объектов обновили графику в прошлом тике
+    ticked = pyqtSignal()
+    renderActiveChanged = pyqtSignal(bool)
 
     def __init__(self, db, show_traj=True, show_heading=True,
                  max_objects_limit=DEFAULT_MAX_OBJECTS,
                  map_path: str = DEFAULT_MAP_PATH,
                  radar_center: QPointF = DEFAULT_RADAR_CENTER,
-                 mode: str = "training"):  # 🔧 [mode] добавлен параметр режима
+                 mode: str = "training",  # 🔧 [mode] добавлен параметр режима
+                 catalog: MapCatalog = None, map_cache=None):
         super().__init__()
         self.db = db
         self.show_traj = show_traj
         self.show_heading = show_heading
         self.max_objects_limit = max_objects_limit
         self.objects = []
+        # Меняется при добавлении/удалении объектов и перемещении РЛС (индекс луча)
+        self.objects_generation = 0
         self.detect_zones = []
         self.ignore_zones = []
-        self.radar_center = QPointF(radar_center)
+        # Набор зон карты: "" — по умолчанию, иначе имя сценария
+        self.zone_scenario = ""
+        # РЛС сцены; первая — основная (radar_center, ring_radii)
+        self.radars = RadarNetwork([RadarSite("main", radar_center)])
 
         # Управление авто-удалением объектов
         self.bird_lifetime_limit = 10.0
@@ -266,67 +411,366 @@ class MapScene(QGraphicsScene):
         # 🔧 [mode] режим сцены: training | live
         self.mode = mode
 
+        # Каталог регионов и общий кэш декодированных карт
+        self.catalog = catalog or MapCatalog.load(default_region=default_map_region())
+        self.map_cache = map_cache or shared_map_cache()
+        self.region = None
+
         self.map_item = None
+        self.coverage = None
         self._init_map_background(map_path)
+        if self.region.radars:
+            self.radars = RadarNetwork.from_region(self.region)
         self._init_radar_rings()
+        self.coverage.set_radars(self.radars)
 
         self.drawing_mode = None
         self.temp_polygon = None
         self.temp_points = []
-
-        # Радиусы колец (м)
-        self.ring_radii = [1000, 3000, 7000]
+        # Предпросмотр зоны: зафиксированный путь дополняется по клику,
+        # на движение мыши меняется только отрезок-«резинка»
+        self._temp_path = None
+        self.temp_rubber = None
+        # Вершины для привязки (зоны сцены), N x 2
+        self._snap_xy = np.empty((0, 2))
+
+        # Тревоги: склейка, подавление повторов и ограничение частоты
+        self.alarm_engine = AlarmEngine()
+
+        # Классификация: кэш признаков по uid и сменная модель
+        self.feature_cache = FeatureCache()
+        self.classifier_runner = ClassifierRunner()
+
+        # Накопительная статистика движения по трекам (для панели информации)
+        self.track_stats = TrackStatsStore()
+
+
+        # Уровень детализации задают виды по своему масштабу (см. lod.py); у сцены —
+        # самый детальный из уровней видов, кластеры считаются для самого крупного
+        # масштаба среди видов на уровне кластеров
+        self.lod = LOD_FULL
+        self.lod_scale = 1.0
+        self.cluster_scale = None
+        self.trail_epsilon = 0.0
+        self._view_lods = {}    # вид -> (уровень, масштаб)
+        self.cluster_item = ClusterItem(self.sceneRect())
+        self.cluster_item.setVisible(False)
+        self.addItem(self.cluster_item)
+
+        # Видимые области видов с запасом; пусто — отсечение выключено
+        self._view_rects = {}   # вид -> QRectF или None
+        self.cull_rects = []
+        # Идёт ли сеанс (виды перерисовываются по изменениям) — см. MapView.set_render_active
+        self.render_active = True
+        # Модель вращающегося луча (None — цели видны непрерывно)
+        self.sweep = None
+        self.sweep_layer = None
+        # Генератор помех и слой их отметок (None — выключено)
+        self.clutter = None
+        self.clutter_layer = None
+        self._clutter_elapsed = 0.0
+        self._clutter_time = 0.0
+        # Сопровождение: фильтр Калмана по зашумлённым отметкам (None — выключено)
+        self.tracker = None
+        self.track_layer = None
+        self._plot_rng = np.random.default_rng()
+        # Сколько объектов обновили графику за последний тик
+        self.graphics_updates = 0
+        # Модельное время с создания сцены, с (по нему ведётся запись сеанса)
+        self.sim_time = 0.0
+
+        # Сохранённые зоны текущей карты (набор по умолчанию)
+        self.load_zones()
 
     def _init_map_background(self, map_path: str):
-        self.setSceneRect(QRectF(-WORLD_WIDTH/2, -WORLD_HEIGHT/2, WORLD_WIDTH, WORLD_HEIGHT))
         self.setBackgroundBrush(QBrush(QColor(12, 26, 32)))
-
+        region = self.catalog.find_by_path(map_path) if map_path else None
+        if region is None:
+            # Карта вне каталога — регистрируем её с параметрами по умолчанию
+            region = default_map_region()
+            region.id, region.path = map_path or region.id, map_path
+            self.catalog.add(region)
+        self._apply_region(region)
+
+    def _apply_region(self, region: MapRegion):
+        if self.map_item is not None:
+            self.removeItem(self.map_item)
+            self.map_item = None
+        self.region = region
+        self.setSceneRect(region.extent)
+        # Растры видимости РЛС строятся по карте высот региона (в фоне, с кэшем на диске)
+        if self.coverage is not None:
+            self.coverage.shutdown()
+        self.coverage = CoverageMap(region.id, HeightMap.from_region(region))
+        if getattr(self, "cluster_item", None) is not None:
+            self.cluster_item.set_rect(region.extent)
         try:
-            if map_path and os.path.exists(map_path):
-                pm = QPixmap(map_path)
-                if not pm.isNull():
-                    self.map_item = QGraphicsPixmapItem(pm)
-                    sx = WORLD_WIDTH / pm.width()
-                    sy = WORLD_HEIGHT / pm.height()
-                    transform = QTransform()
-                    transform.scale(sx, sy)
-                    self.map_item.setTransform(transform)
-                    self.map_item.setPos(-WORLD_WIDTH/2, -WORLD_HEIGHT/2)
-                    self.map_item.setZValue(-100)
-                    self.addItem(self.map_item)
+            if region.path:
+                self.map_item = self.map_cache.create_item(region)
+            if self.map_item is not None:
+                self.addItem(self.map_item)
             else:
-                print(f"[graphics] Map file not found: {map_path}")
+                print(f"[graphics] Map file not found: {region.path}")
         except Exception as e:
             print(f"[graphics] Failed to load map: {e}")
+        nxt = self.catalog.next_region(region.id)
+        if nxt is not None:
+            self.map_cache.prefetch(nxt.path)
+
+    def set_map(self, region_id: str) -> bool:
+        """
+        Переключает карту без пересоздания сцены: объекты и зоны прежнего
+        региона удаляются, радар переносится в центр нового региона.
+        """
+        region = self.catalog.get(region_id)
+        if region is None:
+            return False
+        if self.region is not None and region.id == self.region.id:
+            return True
+        self.cancel_temp_zone()
+        for obj in list(self.objects):
+            self.remove_object(obj)
+        self._clear_zone_items()
+        self._apply_region(region)
+        if self.tracker is not None:
+            self.set_tracking(True)
+        self.set_radars(RadarNetwork.from_region(region))
+        self.load_zones(self.zone_scenario)
+        self.mapChanged.emit(region.id)
+        return True
+
+    @property
+    def radar_center(self) -> QPointF:
+        return self.radars.primary.center
+
+    @property
+    def ring_radii(self):
+        return self.radars.primary.ring_radii
 
     def _init_radar_rings(self):
-        center = self.radar_center
         for item in list(self.items()):
             if isinstance(item, (QGraphicsEllipseItem, QGraphicsLineItem)) and item.zValue() <= -9:
                 self.removeItem(item)
 
-        for dist, color, z in [(1000, QColor(0, 80, 160, 90), -10),
-                               (3000, QColor(0, 60, 120, 60), -11),
-                               (7000, QColor(0, 40, 80, 40), -12)]:
-            ring = self.addEllipse(QRectF(center.x() - dist, center.y() - dist, 2*dist, 2*dist),
-                                   QPen(QColor(0, 180, 240, 120), 1, Qt.SolidLine),
-                                   QBrush(color))
-            ring.setZValue(z)
-
+        ring_colors = [QColor(0, 80, 160, 90), QColor(0, 60, 120, 60), QColor(0, 40, 80, 40)]
         axis_pen = QPen(QColor(50, 90, 110, 180), 1, Qt.DashDotLine)
-        self.addLine(center.x() - 7500, center.y(), center.x() + 7500, center.y(), axis_pen).setZValue(-9)
-        self.addLine(center.x(), center.y() - 7500, center.x(), center.y() + 7500, axis_pen).setZValue(-9)
-
-    def set_radar_center(self, point: QPointF, redraw=True):
-        self.radar_center = QPointF(point)
+        for site in self.radars.sites:
+            center = site.center
+            for i, dist in enumerate(site.ring_radii):
+                color = ring_colors[min(i, len(ring_colors) - 1)]
+                ring = self.addEllipse(QRectF(center.x() - dist, center.y() - dist, 2*dist, 2*dist),
+                                       QPen(QColor(0, 180, 240, 120), 1, Qt.SolidLine),
+                                       QBrush(color))
+                ring.setZValue(-10 - i)
+
+            axis = (site.ring_radii[-1] if site.ring_radii else site.coverage_range) + 500
+            self.addLine(center.x() - axis, center.y(), center.x() + axis, center.y(), axis_pen).setZValue(-9)
+            self.addLine(center.x(), center.y() - axis, center.x(), center.y() + axis, axis_pen).setZValue(-9)
+
+        if getattr(self, "sweep_layer", None) is not None:
+            self.sweep_layer.set_geometry(self.radars.primary.center, self.radars.primary.coverage_range)
+            self.sweep_layer.clear()
+        if getattr(self, "clutter", None) is not None:
+            # Помехи привязаны к РЛС и участкам региона — пересоздаём генератор
+            self.set_clutter(True, self.clutter.seed)
+
+    def set_radar_center(self, point: QPointF, redraw=True, radar_id=None):
+        """Переносит РЛС (по умолчанию основную); растр видимости пересчитывается только у неё."""
+        self.radars.move(radar_id if radar_id is not None else self.radars.primary.id, point)
+        self.coverage.set_radars(self.radars)
+        self.objects_generation += 1
         if redraw:
             self._init_radar_rings()
 
+    def set_radars(self, network: RadarNetwork):
+        self.radars = network
+        self.coverage.set_radars(network)
+        self.objects_generation += 1
+        self._init_radar_rings()
+
     def add_object(self, item: MovingObjectItem):
+        self._apply_lod(item)
         self.addItem(item.traj_item)
         self.addItem(item.heading_item)
         self.addItem(item)
         self.objects.append(item)
+        self.objects_generation += 1
+
+    def set_lod(self, scale: float, view=None) -> bool:
+        """
+        Масштаб вида view (None — единственный вид). Уровень сцены — самый
+        детальный из уровней видов; True, если уровень сцены сменился.
+        """
+        prev = self._view_lods.get(view, (self.lod, scale))[0]
+        self._view_lods[view] = (lod_for_scale(scale, prev), scale)
+        return self._apply_view_lods()
+
+    def view_lod(self, view=None) -> int:
+        return self._view_lods.get(view, (self.lod, self.lod_scale))[0]
+
+    def detach_view(self, view):
+        """Вид скрыт или закрыт: его масштаб и область больше не учитываются."""
+        self._view_lods.pop(view, None)
+        self._view_rects.pop(view, None)
+        if self._view_lods:
+            self._apply_view_lods()
+        self._update_cull_rects()
+
+    def _apply_view_lods(self) -> bool:
+        if not self._view_lods:
+            return False
+        level = min(lv for lv, _ in self._view_lods.values())
+        scale = max(s for _, s in self._view_lods.values())
+        cluster = [s for lv, s in self._view_lods.values() if lv == LOD_CLUSTER]
+        self.cluster_scale = min(cluster) if cluster else None
+        changed = level != self.lod
+        epsilon = TRAIL_TOLERANCE_PX / scale if level != LOD_FULL else 0.0
+        self.lod, self.lod_scale = level, scale
+        if changed or epsilon != self.trail_epsilon:
+            self.trail_epsilon = epsilon
+            for obj in self.objects:
+                if changed:
+                    self._apply_lod(obj)
+                if self.defers_graphics(obj):
+                    obj._graphics_dirty = True
+                elif obj.show_traj:
+                    obj._rebuild_traj(epsilon, force=True)
+        self.cluster_item.setVisible(self.cluster_scale is not None)
+        if self.cluster_scale is not None:
+            self._update_clusters()
+        else:
+            self.cluster_item.update()
+        return changed
+
+    def _apply_lod(self, obj: MovingObjectItem):
+        obj.setVisible(self.lod != LOD_CLUSTER)
+        obj.heading_item.setVisible(self.lod == LOD_FULL)
+        if self.lod == LOD_FULL and obj.show_heading:
+            obj._update_heading()
+
+    def set_view_rect(self, rect, view=None):
+        """
+        Видимая область вида view (с запасом) в координатах сцены; None —
+        вид без отсечения. Объекты, попавшие в неё после прокрутки или
+        масштабирования, получают отложенные обновления.
+        """
+        self._view_rects[view] = QRectF(rect) if rect is not None else None
+        self._update_cull_rects()
+
+    def _update_cull_rects(self):
+        rects = list(self._view_rects.values())
+        # Хотя бы один вид без отсечения — обновляется всё
+        self.cull_rects = rects if rects and None not in rects else []
+        self._sync_dirty_objects()
+
+    def _sync_dirty_objects(self):
+        if self.sweep is not None:
+            # При обзоре луча положение на экране обновляет только луч
+            return
+        for obj in self.objects:
+            if obj._graphics_dirty and not self.is_culled(obj):
+                obj.sync_graphics(self)
+
+    def is_culled(self, obj: MovingObjectItem) -> bool:
+        """Объект вне видимых областей всех видов."""
+        if not self.cull_rects:
+            return False
+        bounds = obj.scene_bounds()
+        return not any(r.intersects(bounds) for r in self.cull_rects)
+
+    def defers_graphics(self, obj: MovingObjectItem) -> bool:
+        return self.sweep is not None or self.is_culled(obj)
+
+    def set_clutter(self, enabled: bool, seed=CLUTTER_SEED):
+        """Включает/выключает помехи; участки плотности берутся из региона карты."""
+        if not enabled:
+            if self.clutter_layer is not None:
+                self.removeItem(self.clutter_layer)
+            self.clutter = self.clutter_layer = None
+            return
+        self.clutter = ClutterGenerator(self.radars, self.region.clutter if self.region else (), seed)
+        if self.clutter_layer is None:
+            self.clutter_layer = ClutterLayer(coverage_rect(self.radars))
+            self.addItem(self.clutter_layer)
+        else:
+            self.clutter_layer.set_rect(coverage_rect(self.radars))
+        self.clutter_layer.clear()
+        self._clutter_elapsed = CLUTTER_REFRESH_SEC
+
+    def set_tracking(self, enabled: bool):
+        """
+        Включает сопровождение: отображение и классификатор получают оценки
+        треков вместо точных положений объектов.
+        """
+        if not enabled:
+            if self.track_layer is not None:
+                self.removeItem(self.track_layer)
+            self.tracker = self.track_layer = None
+            self.feature_cache.clear()
+            return
+        self.tracker = KalmanTracker()
+        self._sync_tracker_timing()
+        if self.track_layer is None:
+            self.track_layer = TrackLayer(self.sceneRect())
+            self.addItem(self.track_layer)
+        self.track_layer.set_tracks(np.empty((0, 4)), np.empty(0))
+        self.feature_cache.clear()
+
+    def _track_coast_sec(self) -> float:
+        # При обзоре луча отметка приходит раз за оборот — трек должен пережить оборот
+        return max(TRACK_COAST_SEC, 1.5 * self.sweep.period) if self.sweep is not None else TRACK_COAST_SEC
+
+    def _sync_tracker_timing(self):
+        self.tracker.coast_sec = self._track_coast_sec()
+        self.tracker.revisit_sec = self.sweep.period if self.sweep is not None else 0.0
+
+    def _update_tracks(self, dt, sources, clutter=None, clutter_pass=TRACK_CLUTTER_PASS):
+        """
+        sources — [(obj, x, y), ...]: отметки целей с шумом измерения для трекера;
+        clutter — отметки помех (N x 2) того же шага: доля clutter_pass из них
+        идёт в трекер ложными отметками (источник -1).
+        """
+        xy = np.array([(x, y) for _, x, y in sources], dtype=np.float64).reshape(-1, 2)
+        xy += self._plot_rng.normal(0.0, TRACK_PLOT_SIGMA, xy.shape)
+        uids = np.array([o.uid for o, _, _ in sources], dtype=np.int64)
+        if clutter is not None and len(clutter):
+            clutter = clutter[self._plot_rng.random(len(clutter)) < clutter_pass]
+            xy = np.vstack([xy, clutter])
+            uids = np.concatenate([uids, np.full(len(clutter), -1, dtype=np.int64)])
+        for key in self.tracker.step(dt, xy, uids).tolist():
+            self.feature_cache.remove(key)
+        slots, _, x, status, _ = self.tracker.tracks()
+        self.track_layer.set_tracks(x, status)
+        self.feature_cache.update_arrays(self.tracker.keys(slots), x[:, 2:], self.tracker.born[slots],
+                                         dt, self.tracker.time)
+
+    def set_sweep(self, rpm):
+        """Включает модель вращающегося луча (rpm > 0) или выключает её (0/None)."""
+        if not rpm:
+            if self.sweep is None:
+                return
+            self.sweep = None
+            self.removeItem(self.sweep_layer)
+            self.sweep_layer = None
+            self._sync_dirty_objects()
+            if self.tracker is not None:
+                self._sync_tracker_timing()
+            return
+        self.sweep = SweepModel(rpm)
+        if self.tracker is not None:
+            self._sync_tracker_timing()
+        if self.sweep_layer is None:
+            site = self.radars.primary
+            self.sweep_layer = SweepLayer(site.center, site.coverage_range)
+            self.addItem(self.sweep_layer)
+        self.sweep_layer.clear()
+
+    def _update_clusters(self):
+        xy = np.array([(o.sim_pos.x(), o.sim_pos.y()) for o in self.objects], dtype=np.float64).reshape(-1, 2)
+        scale = self.cluster_scale or self.lod_scale
+        centers, counts = grid_clusters(xy, CLUSTER_CELL_PX / scale)
+        # Сдвиги меньше полупикселя не перерисовываем
+        self.cluster_item.set_clusters(centers, counts, tolerance=0.5 / scale)
 
     def remove_object(self, item: MovingObjectItem):
         try:
@@ -334,8 +778,11 @@ class MapScene(QGraphicsScene):
             self.removeItem(item.heading_item)
             self.removeItem(item)
             self.objects.remove(item)
+            self.objects_generation += 1
         except ValueError:
             pass
+        self.feature_cache.remove(item.uid)
+        self.track_stats.remove(item.uid)
 
     def set_show_flags(self, show_traj, show_heading):
         self.show_traj = show_traj
@@ -345,6 +792,7 @@ class MapScene(QGraphicsScene):
             obj.show_heading = show_heading
             if not show_traj:
                 obj.traj_item.setPath(QPainterPath())
+                obj._traj_built_at = None
             if not show_heading:
                 obj.heading_item.setLine(QLineF())
 
@@ -358,29 +806,123 @@ class MapScene(QGraphicsScene):
         self.temp_polygon.setPen(pen)
         self.temp_polygon.setZValue(-2)
         self.addItem(self.temp_polygon)
+        self.temp_rubber = QGraphicsLineItem()
+        self.temp_rubber.setPen(pen)
+        self.temp_rubber.setZValue(-2)
+        self.addItem(self.temp_rubber)
+        zones = self.detect_zones + self.ignore_zones
+        self._snap_xy = np.concatenate([z.geometry.points for z in zones]) if zones else np.empty((0, 2))
 
     def cancel_temp_zone(self):
-        if self.temp_polygon:
-            self.removeItem(self.temp_polygon)
-        self.temp_polygon = None
+        for item in (self.temp_polygon, self.temp_rubber):
+            if item is not None:
+                self.removeItem(item)
+        self.temp_polygon = self.temp_rubber = None
+        self._temp_path = None
         self.temp_points = []
+        self._snap_xy = np.empty((0, 2))
         self.drawing_mode = None
 
     def finalize_zone(self):
         if len(self.temp_points) >= 3 and self.drawing_mode:
-            poly = QPolygonF(self.temp_points)
-            item = ZoneItem(poly, self.drawing_mode)
-            self.addItem(item)
-            if self.drawing_mode == "detect":
-                self.detect_zones.append(item)
-            else:
-                self.ignore_zones.append(item)
+            xy = np.array([(p.x(), p.y()) for p in self.temp_points], dtype=np.float64)
+            xy = self._simplify_zone(xy)
+            if len(xy) >= 3:
+                item = self._add_zone_item(ZoneGeometry.from_points(xy), self.drawing_mode)
+                self.save_zone(item)
         self.cancel_temp_zone()
 
+    def _simplify_zone(self, xy):
+        """Убирает вершины, отклоняющиеся от контура меньше ZONE_SIMPLIFY_PX на экране."""
+        eps = ZONE_SIMPLIFY_PX / max(self.lod_scale, 1e-9)
+        # Замкнутый контур: упрощаем с повтором первой вершины в конце
+        keep = simplify_polyline(np.vstack([xy, xy[:1]]), eps)
+        keep = keep[keep < len(xy)]
+        return xy[keep] if len(keep) >= 3 else xy
+
+    def snap_point(self, pos: QPointF) -> QPointF:
+        """
+        Ближайшая в радиусе ZONE_SNAP_PX вершина других зон или первая вершина
+        рисуемого контура (для замыкания), иначе pos.
+        """
+        radius2 = (ZONE_SNAP_PX / max(self.lod_scale, 1e-9)) ** 2
+        if len(self.temp_points) >= 3:
+            first = self.temp_points[0]
+            if (first.x() - pos.x()) ** 2 + (first.y() - pos.y()) ** 2 <= radius2:
+                return QPointF(first)
+        if len(self._snap_xy) == 0:
+            return pos
+        d2 = (self._snap_xy[:, 0] - pos.x()) ** 2 + (self._snap_xy[:, 1] - pos.y()) ** 2
+        i = int(np.argmin(d2))
+        if d2[i] > radius2:
+            return pos
+        return QPointF(*self._snap_xy[i])
+
+    def add_temp_point(self, pos: QPointF):
+        """Вершина рисуемой зоны; клик в первую вершину замыкает контур."""
+        if not self.drawing_mode:
+            return
+        pos = self.snap_point(pos)
+        if len(self.temp_points) >= 3 and pos == self.temp_points[0]:
+            self.finalize_zone()
+            return
+        self.temp_points.append(pos)
+        if self._temp_path is None:
+            self._temp_path = QPainterPath(pos)
+        else:
+            self._temp_path.lineTo(pos)
+        self.temp_polygon.setPath(self._temp_path)
+        self.temp_rubber.setLine(QLineF(pos, pos))
+
+    def _add_zone_item(self, geometry: ZoneGeometry, zone_type, db_id=None) -> ZoneItem:
+        item = ZoneItem(geometry.polygon(), zone_type, geometry, db_id)
+        self.addItem(item)
+        if zone_type == "detect":
+            self.detect_zones.append(item)
+        else:
+            self.ignore_zones.append(item)
+        return item
+
+    def save_zone(self, item: ZoneItem):
+        """Записывает зону в БД (в фоне) для текущей карты и сценария."""
+        if self.db is None or self.region is None:
+            return
+
+        def _saved(zone_id):
+            item.db_id = zone_id
+            # Зону успели удалить, пока шла запись
+            if item.removed:
+                self.db.call_async("delete_zone", zone_id)
+        self.db.call_async("save_zone", self.region.id, self.zone_scenario, item.zone_type,
+                           item.geometry.to_row(), item.db_id, on_done=_saved)
+
+    def load_zones(self, scenario=""):
+        """Заменяет зоны сцены набором карты/сценария из БД (геометрия — без пересчёта)."""
+        self._clear_zone_items()
+        self.zone_scenario = scenario or ""
+        if self.db is None or self.region is None:
+            return
+        key = (self.region.id, self.zone_scenario)
+
+        def _loaded(rows):
+            # Пока шёл запрос, карту или сценарий могли сменить
+            if self.region is None or (self.region.id, self.zone_scenario) != key:
+                return
+            for row in rows:
+                try:
+                    self._add_zone_item(ZoneGeometry.from_row(row), row["zone_type"], row["id"])
+                except Exception as e:
+                    print(f"[graphics] Bad zone {row['id']}: {e}")
+        self.db.call_async("get_zones", self.region.id, self.zone_scenario, on_done=_loaded)
+
+    def _clear_zone_items(self):
+        """Убирает зоны со сцены, не трогая БД."""
+        for z in list(self.detect_zones + self.ignore_zones):
+            self.remove_zone_item(z, persist=False)
+
     def mousePressEvent(self, event):
         if self.drawing_mode and event.button() == Qt.LeftButton:
-            self.temp_points.append(event.scenePos())
-            self._update_temp_path()
+            self.add_temp_point(event.scenePos())
             return
         super().mousePressEvent(event)
 
@@ -392,8 +934,7 @@ class MapScene(QGraphicsScene):
 
     def mouseMoveEvent(self, event):
         if self.drawing_mode and self.temp_points:
-            pts = self.temp_points + [event.scenePos()]
-            self._update_temp_path(pts)
+            self.temp_rubber.setLine(QLineF(self.temp_points[-1], self.snap_point(event.scenePos())))
             return
         super().mouseMoveEvent(event)
 
@@ -418,81 +959,185 @@ class MapScene(QGraphicsScene):
             if isinstance(item, ZoneItem):
                 self.remove_zone_item(item)
 
-    def remove_zone_item(self, item: ZoneItem):
+    def remove_zone_item(self, item: ZoneItem, persist=True):
         if item in self.detect_zones:
             self.detect_zones.remove(item)
         if item in self.ignore_zones:
             self.ignore_zones.remove(item)
         self.removeItem(item)
-
-    def _update_temp_path(self, pts=None):
-        pts = pts or self.temp_points
-        if not pts:
-            return
-        path = QPainterPath(pts[0])
-        for p in pts[1:]:
-            path.lineTo(p)
-        self.temp_polygon.setPath(path)
+        if persist:
+            item.removed = True
+            if self.db is not None and item.db_id is not None:
+                self.db.call_async("delete_zone", item.db_id)
 
     def is_in_detect_but_not_ignored(self, pos: QPointF) -> bool:
-        in_detect = False
-        for z in self.detect_zones:
-            if point_in_polygon(pos, z.polygon()):
-                in_detect = True
+        return self.detect_zone_at(pos) is not None
+
+    def detect_zone_at(self, pos: QPointF):
+        """Зона обнаружения, содержащая точку (если точка не в зоне игнора)."""
+        return self.detect_zones_at(np.array([[pos.x(), pos.y()]]))[0]
+
+    def detect_zones_at(self, xy):
+        """
+        Зоны обнаружения для точек N x 2 за один проход по зонам (None — вне зон
+        или в зоне игнора). Используется предрасчитанная геометрия зон.
+        """
+        n = len(xy)
+        if not self.detect_zones or n == 0:
+            return [None] * n
+        hit = np.full(n, -1)
+        for k, z in enumerate(self.detect_zones):
+            free = hit < 0
+            if not free.any():
                 break
-        if not in_detect:
-            return False
+            hit[free & z.geometry.contains_many(xy)] = k
         for z in self.ignore_zones:
-            if point_in_polygon(pos, z.polygon()):
-                return False
-        return True
+            hit[z.geometry.contains_many(xy)] = -1
+        return [self.detect_zones[k] if k >= 0 else None for k in hit.tolist()]
 
     def _ring_band_for_dist(self, dist: float) -> int:
+        """Кольцо основной РЛС для одной дальности (пакетно — RadarNetwork.measure)."""
         for i, r in enumerate(self.ring_radii):
             if dist <= r:
                 return i
         return -1
 
+    def set_render_active(self, active: bool):
+        """Сеанс идёт (True) или стоит на паузе/не начат (False) — для всех видов сцены."""
+        self.render_active = bool(active)
+        self.renderActiveChanged.emit(self.render_active)
+
     def tick(self, dt, parent_window):
+        """Один шаг модели на все виды сцены."""
+        self.aboutToTick.emit(self.graphics_updates)
+        self.sim_time += dt
         to_check_alarm = []
+        entered = []
+        self.graphics_updates = 0
         for obj in list(self.objects):
             obj.update_motion(dt, self)
-            to_check_alarm.append(obj)
-
-        for obj in to_check_alarm:
-            # кольца
-            cx, cy = self.radar_center.x(), self.radar_center.y()
-            dist = math.hypot(obj.pos().x() - cx, obj.pos().y() - cy)
-            band_now = self._ring_band_for_dist(dist)
-            if band_now != obj._ring_band_last and band_now != -1:
-                obj._ring_band_last = band_now
-                self.ringEvent.emit(obj.uid, band_now, dist)
+            # Объект мог быть удалён по времени жизни или дальности
+            if obj.scene() is self:
+                to_check_alarm.append(obj)
+
+        # Видимость с учётом рельефа: порог высоты из растров РЛС, O(1) на объект
+        n, m = len(to_check_alarm), len(self.radars)
+        if n:
+            xy = np.array([(o.sim_pos.x(), o.sim_pos.y()) for o in to_check_alarm], dtype=np.float64)
+            alt = np.array([o.altitude for o in to_check_alarm], dtype=np.float64)
+            for obj, seen in zip(to_check_alarm, self.coverage.detectable(xy, alt).tolist()):
+                obj.set_detected(seen)
+
+        # Обзор луча: отметки и обновление на экране — только в пройденном секторе
+        hits = None
+        if self.sweep is not None:
+            hits = [h for h in self.sweep.step(dt, to_check_alarm, self.radar_center, self.objects_generation) if h[0].detected]
+            for obj, _, _ in hits:
+                if not self.is_culled(obj):
+                    obj.sync_graphics(self)
+                    self.graphics_updates += 1
+            self.sweep_layer.add_points(np.array([(x, y) for _, x, y in hits], dtype=np.float64).reshape(-1, 2),
+                                       self.sweep.time)
+            self.sweep_layer.advance_beam(self.sweep.angle, self.sweep.time, self.sweep.persistence)
+
+        # Помехи: при обзоре луча — в пройденном секторе, без луча — кадр раз в CLUTTER_REFRESH_SEC
+        clutter_xy = None
+        if self.clutter is not None:
+            if self.sweep is not None:
+                clutter_xy = self.clutter.generate(dt, self.sweep.last_sector)
+                self.clutter_layer.add_points(clutter_xy, self.sweep.time)
+                self.clutter_layer.advance(self.sweep.time, self.sweep.persistence, self.sweep_layer.last_wedge)
             else:
-                obj._ring_band_last = band_now
-
-            # зоны обнаружения
-            if obj.type_ == "bvs":
-                if self.is_in_detect_but_not_ignored(obj.pos()):
+                self._clutter_elapsed += dt
+                if self._clutter_elapsed >= CLUTTER_REFRESH_SEC:
+                    self._clutter_time += self._clutter_elapsed
+                    clutter_xy = self.clutter.generate(self._clutter_elapsed)
+                    self.clutter_layer.replace_points(clutter_xy, self._clutter_time)
+                    self._clutter_elapsed = 0.0
+                    self.clutter_layer.advance(self._clutter_time, CLUTTER_REFRESH_SEC * 2)
+
+        if self.cluster_scale is not None:
+            self._update_clusters()
+
+        # Признаки всех объектов — одним проходом по массивам; при сопровождении —
+        # по оценкам треков (отметки: при обзоре — от луча, иначе от всех объектов;
+        # плюс ложные отметки помех этого шага)
+        if self.tracker is not None:
+            if hits is None:
+                hits = [(o, o.sim_pos.x(), o.sim_pos.y()) for o in to_check_alarm if o.detected]
+            # Без луча кадр помех — полный обзор каждые CLUTTER_REFRESH_SEC: ложных
+            # отметок в секунду столько же, сколько при обзоре с периодом по умолчанию
+            clutter_pass = TRACK_CLUTTER_PASS
+            if self.sweep is None:
+                clutter_pass *= CLUTTER_REFRESH_SEC * SWEEP_DEFAULT_RPM / 60.0
+            self._update_tracks(dt, hits, clutter_xy, clutter_pass)
+        else:
+            self.feature_cache.update(self.objects, dt)
+        if self.mode == "live":
+            self._apply_classification(self.classifier_runner.step(self.feature_cache))
+
+        # Кольца: дальности и номера колец всех объектов до всех РЛС за один проход
+        if n:
+            dist, bands = self.radars.measure(xy)
+            prev = np.array([o._ring_bands if len(o._ring_bands) == m else np.full(m, -1)
+                             for o in to_check_alarm], dtype=np.int64).reshape(n, m)
+            for i, j in zip(*np.nonzero((bands != prev) & (bands != -1))):
+                self.ringEvent.emit(self.radars.ids[j], to_check_alarm[i].uid, int(bands[i, j]), float(dist[i, j]))
+            nearest = dist.min(axis=1)
+
+        zones = self.detect_zones_at(xy) if n else []
+        for i, obj in enumerate(to_check_alarm):
+            obj._ring_bands = bands[i]
+            band_now = obj._ring_band_last = int(bands[i, 0])
+
+            zone = zones[i]
+            v = obj.velocity
+            self.track_stats.update(obj.uid, obj.type_, dt, float(dist[i, 0]), math.hypot(v.x(), v.y()),
+                                    calculate_course(obj), band_now,
+                                    zone.zone_id if zone is not None else None)
+
+            # зоны обнаружения: срабатывания копятся в движке тревог
+            # (важность — по дальности до ближайшей РЛС); закрытые рельефом не срабатывают
+            if obj.type_ == "bvs" and obj.detected:
+                if zone is not None:
                     self.classify_object(obj)
-                    if self.mode == "training":
-                        self.raise_alarm(parent_window, f"БВС в зоне обнаружения! ({obj.pos().x():.0f}, {obj.pos().y():.0f})")
-                    else:
-                        self.raise_alarm(parent_window, f"БВС в зоне обнаружения! ({obj.pos().x():.0f}, {obj.pos().y():.0f})")
-                    self.remove_object(obj)
-
-    def raise_alarm(self, parent_window, message: str):
-        os.makedirs(SCREENSHOTS_DIR, exist_ok=True)
-        shot_path = os.path.join(SCREENSHOTS_DIR, f"alarm_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png")
+                    self.alarm_engine.submit(zone.zone_id, obj.uid, obj.sim_pos.x(), obj.sim_pos.y(),
+                                             float(nearest[i]))
+                    entered.append(obj)
+
+        # Одна тревога на зону и один скриншот на всю пачку за тик
+        alarms = self.alarm_engine.flush()
+        alarmed = set()
+        if alarms:
+            shot_path = self._save_alarm_screenshot(parent_window)
+            for alarm in alarms:
+                parent_window.add_notification(alarm.message(), screenshot=shot_path, type_="alarm",
+                                               group="БВС в зоне обнаружения")
+                self.alarmTriggered.emit(alarm.message())
+                alarmed.update(alarm.uids)
+        # Снимаются только объекты с тревогой; подавленные остаются до своей тревоги
+        for obj in entered:
+            if obj.uid in alarmed:
+                self.remove_object(obj)
+        self.ticked.emit()
+
+    def _save_alarm_screenshot(self, parent_window):
         if hasattr(parent_window, "training_view"):
             pv = parent_window.training_view.map_view.viewport() if hasattr(parent_window.training_view, "map_view") else parent_window.training_view
             pix = pv.grab()
         else:
             pix = parent_window.grab()
+        # Кодирование и очистка старых снимков — в фоне, через хранилище окна
+        storage = getattr(parent_window, "screenshot_storage", None)
+        if storage is not None:
+            return storage.save(pix, prefix="alarm")
+        os.makedirs(SCREENSHOTS_DIR, exist_ok=True)
+        shot_path = os.path.join(SCREENSHOTS_DIR, f"alarm_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png")
         try:
             pix.save(shot_path)
         except Exception:
             shot_path = None
-        parent_window.add_notification(message, screenshot=shot_path)
+        return shot_path
 
     def spawn_random_object(self, bvs_ratio=0.5):
         if len(self.objects) >= self.max_objects_limit:
@@ -512,6 +1157,7 @@ class MapScene(QGraphicsScene):
             v = QPointF(-dx, -dy)
             vlen = math.hypot(v.x(), v.y())
             v = QPointF(v.x()/vlen * speed, v.y()/vlen * speed)
+            altitude = random.uniform(30, 400)
         else:
             r = random.uniform(100, 7000)
             ang = random.uniform(0, 2*math.pi)
@@ -526,8 +1172,9 @@ class MapScene(QGraphicsScene):
             a = random.uniform(-0.6, 0.6)
             cos_a, sin_a = math.cos(a), math.sin(a)
             v = QPointF(v.x()*cos_a - v.y()*sin_a, v.x()*sin_a + v.y()*cos_a)
+            altitude = random.uniform(5, 150)
 
-        obj = MovingObjectItem(type_, QPointF(x, y), v, speed, self.show_traj, self.show_heading)
+        obj = MovingObjectItem(type_, QPointF(x, y), v, speed, self.show_traj, self.show_heading, altitude)
         self.add_object(obj)
 
     def pick_object_at(self, scene_pos: QPointF, pixel_radius=10, view=None):
@@ -535,7 +1182,13 @@ class MapScene(QGraphicsScene):
             return None
         best = None
         best_dist_px = 1e9
+        # На уровне кластеров (у сцены или у этого вида) отдельные объекты не выбираются
+        if getattr(view, "lod", LOD_FULL) == LOD_CLUSTER:
+            return None
         for obj in self.objects:
+            if not obj.isVisible():
+                continue
+            # Выбор — по положению на экране (при обзоре луча оно отстаёт от модели)
             pt_view = view.mapFromScene(obj.pos())
             click_view = view.mapFromScene(scene_pos)
             dist_px = math.hypot(pt_view.x() - click_view.x(), pt_view.y() - click_view.y())
@@ -558,11 +1211,21 @@ class MapScene(QGraphicsScene):
         obj._update_visuals()
 
     def classify_object(self, obj: MovingObjectItem):
-        obj.label, obj.confidence = classifier(
-            calculate_speed(obj),
-            calculate_course(obj),
-            obj.lifetime()
-        )
+        features = self.feature_cache.row(obj.uid)
+        if features is None:
+            self.feature_cache.update([obj], 0.0)
+            features = self.feature_cache.row(obj.uid)
+        labels, conf = self.classifier_runner.classify(features)
+        obj.label, obj.confidence = labels[0], float(conf[0])
+
+    def _apply_classification(self, results):
+        if not results:
+            return
+        by_uid = {o.uid: o for o in self.objects}
+        for uid, label, conf in results:
+            obj = by_uid.get(uid)
+            if obj is not None:
+                obj.label, obj.confidence = label, conf
 
     # 🔧 snapshot для веб-карты
     def objects_snapshot(self):
@@ -571,8 +1234,8 @@ class MapScene(QGraphicsScene):
             data.append({
                 "uid": o.uid,
                 "type": o.type_,
-                "x": float(o.pos().x()),
-                "y": float(o.pos().y()),
+                "x": float(o.sim_pos.x()),
+                "y": float(o.sim_pos.y()),
                 "speed": float(o.speed_mps),
                 "course": float(calculate_course(o))
             })
@@ -581,6 +1244,8 @@ class MapScene(QGraphicsScene):
 
 class MapView(QGraphicsView):
     targetIdentified = pyqtSignal(bool)
+    objectIdentified = pyqtSignal(object, bool)  # объект (ещё в сцене), верно ли
+    objectClicked = pyqtSignal(object)  # MovingObjectItem или None
 
     def __init__(self, scene: MapScene, parent=None):
         super().__init__(scene, parent)
@@ -591,29 +1256,197 @@ class MapView(QGraphicsView):
         self.setMouseTracking(True)
         self.setBackgroundBrush(QBrush(QColor(10, 20, 26)))
 
+        # Несколько видов могут показывать одну сцену (одну модель): у каждого
+        # свой масштаб и уровень детализации, скрытые слои и цель слежения
+        self.lod = LOD_FULL
+        self.hidden_layers = set()
+        self.follow_target = None
+        # Опознавание двойным щелчком (у монитора инструктора выключено)
+        self.identify_enabled = True
+
+        # Политика перерисовки: пока сеанс идёт — по изменившимся областям,
+        # на паузе и без сеанса — только по действиям пользователя
+        self._render_active = True
+        self.setViewportUpdateMode(QGraphicsView.MinimalViewportUpdate)
+        scene.changed.connect(self._on_scene_changed)
+        if isinstance(scene, MapScene):
+            scene.aboutToTick.connect(self.begin_frame)
+            scene.ticked.connect(self._on_scene_ticked)
+            scene.renderActiveChanged.connect(self.set_render_active)
+            self.set_render_active(scene.render_active)
+        self.reset_repaint_stats()
+        self._update_lod()
+
+    def set_layer_visible(self, layer, visible: bool):
+        """Показывает или скрывает слой (см. lod.LAYER_*) только в этом виде."""
+        if visible:
+            self.hidden_layers.discard(layer)
+        else:
+            self.hidden_layers.add(layer)
+        self.viewport().update()
+
+    def set_follow(self, obj):
+        """Вид держит объект в центре после каждого тика (None — без слежения)."""
+        self.follow_target = obj
+        if obj is not None:
+            self.centerOn(obj.pos())
+
+    def _on_scene_ticked(self):
+        obj = self.follow_target
+        if obj is None:
+            return
+        if obj.scene() is not self.scene():
+            self.follow_target = None
+            return
+        self.centerOn(obj.pos())
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._update_lod()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        scene = self.scene()
+        if scene is not None and hasattr(scene, "detach_view"):
+            scene.detach_view(self)
+
+    def set_render_active(self, active: bool):
+        """Сеанс идёт (True) или стоит на паузе/не начат (False)."""
+        self._render_active = bool(active)
+        if active:
+            self.setViewportUpdateMode(QGraphicsView.MinimalViewportUpdate)
+        else:
+            self.setViewportUpdateMode(QGraphicsView.NoViewportUpdate)
+        self.viewport().update()
+
+    def begin_frame(self, changed_items: int):
+        """
+        Перед тиком: много изменившихся объектов — одна ограничивающая область
+        вместо множества мелких (дешевле отсечение и заливка фона).
+        """
+        if not self._render_active:
+            return
+        mode = (QGraphicsView.MinimalViewportUpdate if changed_items <= REPAINT_MINIMAL_MAX_ITEMS
+                else QGraphicsView.BoundingRectViewportUpdate)
+        if mode != self.viewportUpdateMode():
+            self.setViewportUpdateMode(mode)
+
+    def _on_scene_changed(self, rects):
+        # На паузе сцена меняется только от действий пользователя (наведение,
+        # рисование зон, опознавание) — перерисовываем лишь затронутые области
+        if self._render_active:
+            return
+        for r in rects:
+            self.viewport().update(self.mapFromScene(r).boundingRect().adjusted(-2, -2, 2, 2))
+
+    def _interaction_repaint(self):
+        if not self._render_active:
+            self.viewport().update()
+
+    def paintEvent(self, event):
+        area = 0
+        for r in event.region().rects():
+            area += r.width() * r.height()
+        st = self._repaint_stats
+        st["frames"] += 1
+        st["last_px"] = area
+        st["total_px"] += area
+        st["viewport_px"] = max(1, self.viewport().width() * self.viewport().height())
+        super().paintEvent(event)
+
+    def reset_repaint_stats(self):
+        self._repaint_stats = {"frames": 0, "last_px": 0, "total_px": 0, "viewport_px": 1}
+
+    def repaint_stats(self) -> dict:
+        """Кадры, площадь перерисовки (пикс.) и её средняя доля от окна вида."""
+        st = dict(self._repaint_stats)
+        st["avg_fraction"] = st["total_px"] / st["frames"] / st["viewport_px"] if st["frames"] else 0.0
+        return st
+
+    def _update_lod(self):
+        scene = self.scene()
+        if scene is not None and hasattr(scene, "set_lod"):
+            scene.set_lod(view_scale(self.transform()), view=self)
+            level = scene.view_lod(self)
+            if level != self.lod:
+                self.lod = level
+                self.viewport().update()
+        self._update_cull_rect()
+        self._interaction_repaint()
+
+    def _update_cull_rect(self):
+        scene = self.scene()
+        if scene is None or not hasattr(scene, "set_view_rect"):
+            return
+        m = CULL_MARGIN_PX
+        rect = self.viewport().rect().adjusted(-m, -m, m, m)
+        scene.set_view_rect(self.mapToScene(rect).boundingRect(), view=self)
+
+    def scrollContentsBy(self, dx, dy):
+        super().scrollContentsBy(dx, dy)
+        self._update_cull_rect()
+        self._interaction_repaint()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_cull_rect()
+        self._interaction_repaint()
+
     def wheelEvent(self, event):
         angle = event.angleDelta().y()
         factor = 1.15 if angle > 0 else 1/1.15
         self.scale(factor, factor)
+        self._update_lod()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self._press_pos = event.pos()
+        super().mousePressEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        press = getattr(self, "_press_pos", None)
+        self._press_pos = None
+        super().mouseReleaseEvent(event)
+        # Клик без перетаскивания карты — выбор объекта для слежения
+        if event.button() == Qt.LeftButton and press is not None and not self.scene().drawing_mode:
+            if (event.pos() - press).manhattanLength() <= 4:
+                scene_pos = self.mapToScene(event.pos())
+                self.objectClicked.emit(self.scene().pick_object_at(scene_pos, pixel_radius=14, view=self))
 
     def mouseDoubleClickEvent(self, event):
         if event.button() == Qt.LeftButton:
             scene_pos = self.mapToScene(event.pos())
+            if self.lod == LOD_CLUSTER and self._zoom_into_cluster(scene_pos):
+                return
             obj = self.scene().pick_object_at(scene_pos, pixel_radius=14, view=self)
-            if obj:
+            if obj and self.identify_enabled:
                 correct = (obj.type_ == "bvs")
+                self.objectIdentified.emit(obj, correct)
                 self.targetIdentified.emit(correct)
                 self.scene().remove_object(obj)
         super().mouseDoubleClickEvent(event)
 
+    def _zoom_into_cluster(self, scene_pos: QPointF) -> bool:
+        """Двойной клик по кластеру — приближение до уровня отдельных объектов."""
+        scale = view_scale(self.transform())
+        center = self.scene().cluster_item.cluster_at(scene_pos, CLUSTER_CELL_PX / scale)
+        if center is None:
+            return False
+        factor = LOD_CLUSTER_SCALE * LOD_HYSTERESIS * 1.5 / scale
+        self.scale(factor, factor)
+        self.centerOn(center)
+        self._update_lod()
+        return True
+
     def keyPressEvent(self, event):
         if event.key() in (Qt.Key_Delete, Qt.Key_Escape):
             self.scene().keyPressEvent(event)
             return
         super().keyPressEvent(event)
 
-    def reset_to_home(self, db):
-        s = db.get_settings()
+    def reset_to_home(self, settings):
+        """settings — SettingsCache или DB: нужен только get_settings()."""
+        s = settings.get_settings()
         if not s:
             return
         self.setTransform(QTransform())
@@ -621,6 +1454,7 @@ class MapView(QGraphicsView):
         self.scale(scale, scale)
         center = QPointF(s["home_x"] or 0.0, s["home_y"] or 0.0)
         self.centerOn(center)
+        self._update_lod()
 
     def north_up(self):
         t = self.transform()
@@ -630,6 +1464,7 @@ class MapView(QGraphicsView):
         self.setTransform(QTransform())
         self.scale(scale_x, scale_y)
         self.centerOn(center)
+        self._update_lod()
 
 
 # 🔧 [math] Вспомогательные функции для классификации
@@ -0,0 +1,119 @@
+"""
+Накопительная статистика движения по каждому треку. Обновляется сценой
+раз в тик за O(1) на объект, поэтому панель информации не пересчитывает
+ничего по traj_points.
+"""
+
+# Изменение курса больше порога считается манёвром, градусы
+HEADING_CHANGE_DEG = 15.0
+
+# Поля панели информации об объекте: ключ summary() -> подпись
+STATS_FIELDS = (
+    ("uid", "Номер"),
+    ("age", "Время сопровождения"),
+    ("dist", "Дальность до РЛС"),
+    ("min_dist", "Мин. дальность"),
+    ("speed", "Скорость"),
+    ("avg_speed", "Средняя скорость"),
+    ("max_speed", "Макс. скорость"),
+    ("course", "Курс"),
+    ("heading_changes", "Манёвры курса"),
+    ("bands", "Время в кольцах"),
+    ("zones", "Время в зонах"),
+)
+
+
+def _angle_diff(a: float, b: float) -> float:
+    return (a - b + 180.0) % 360.0 - 180.0
+
+
+class TrackStats:
+    __slots__ = ("uid", "type_", "age", "dist", "min_dist", "speed", "speed_sum", "samples",
+                 "max_speed", "course", "ref_course", "heading_changes", "total_turn",
+                 "band", "band_time", "zone_id", "zone_time")
+
+    def __init__(self, uid, type_):
+        self.uid = uid
+        self.type_ = type_
+        self.age = 0.0
+        self.dist = 0.0
+        self.min_dist = float("inf")
+        self.speed = 0.0
+        self.speed_sum = 0.0
+        self.samples = 0
+        self.max_speed = 0.0
+        self.course = None
+        self.ref_course = None
+        self.heading_changes = 0
+        self.total_turn = 0.0
+        self.band = -1
+        self.band_time = {}
+        self.zone_id = None
+        self.zone_time = {}
+
+    @property
+    def avg_speed(self) -> float:
+        return self.speed_sum / self.samples if self.samples else 0.0
+
+
+class TrackStatsStore:
+    def __init__(self):
+        self._tracks = {}
+
+    def update(self, uid, type_, dt, dist, speed, course, band, zone_id=None):
+        st = self._tracks.get(uid)
+        if st is None:
+            st = self._tracks[uid] = TrackStats(uid, type_)
+        st.age += dt
+        st.dist = dist
+        st.min_dist = min(st.min_dist, dist)
+        st.speed = speed
+        st.speed_sum += speed
+        st.samples += 1
+        st.max_speed = max(st.max_speed, speed)
+        if st.course is not None:
+            st.total_turn += abs(_angle_diff(course, st.course))
+        if st.ref_course is None:
+            st.ref_course = course
+        elif abs(_angle_diff(course, st.ref_course)) > HEADING_CHANGE_DEG:
+            st.heading_changes += 1
+            st.ref_course = course
+        st.course = course
+        st.band = band
+        st.band_time[band] = st.band_time.get(band, 0.0) + dt
+        st.zone_id = zone_id
+        if zone_id is not None:
+            st.zone_time[zone_id] = st.zone_time.get(zone_id, 0.0) + dt
+
+    def get(self, uid):
+        return self._tracks.get(uid)
+
+    def remove(self, uid):
+        self._tracks.pop(uid, None)
+
+    def clear(self):
+        self._tracks.clear()
+
+    def summary(self, uid, ring_radii):
+        """Поля для панели информации: ключ -> готовый текст."""
+        st = self._tracks.get(uid)
+        if st is None:
+            return {}
+        bands = []
+        for band in sorted(st.band_time):
+            title = f"≤{ring_radii[band]:.0f} м" if 0 <= band < len(ring_radii) else "вне колец"
+            bands.append(f"{title}: {st.band_time[band]:.0f} с")
+        zones = "; ".join(f"зона {z}: {t:.0f} с" for z, t in sorted(st.zone_time.items()))
+        return {
+            "uid": str(st.uid),
+            "age": f"{st.age:.0f} с",
+            "dist": f"{st.dist:.0f} м",
+            "min_dist": f"{st.min_dist:.0f} м",
+            "speed": f"{st.speed:.1f} м/с",
+            "avg_speed": f"{st.avg_speed:.1f} м/с",
+            "max_speed": f"{st.max_speed:.1f} м/с",
+            "course": f"{st.course:.0f}°" if st.course is not None else "-",
+            "heading_changes": f"{st.heading_changes} (всего {st.total_turn:.0f}°)",
+            "bands": "; ".join(bands) or "-",
+            "zones": zones or "-",
+        }
@@ -0,0 +1,196 @@
+"""
+Уровни детализации карты (LOD) по текущему масштабу вида.
+
+LOD_FULL    — все объекты, полные траектории и направления;
+LOD_SIMPLE  — объекты без линий направления, траектории прорежены;
+LOD_CLUSTER — объекты скрыты, вместо них кластеры по сетке экрана с
+              числом целей; траектории прорежены сильнее.
+
+Пороги с гистерезисом, чтобы уровень не «дребезжал» на границе. Стоимость
+отрисовки кластеров зависит от площади экрана (числа ячеек), а не от
+количества целей.
+
+Одну сцену могут показывать несколько видов с разным масштабом: у каждого
+свой уровень (MapView.lod) и набор скрытых слоёв (MapView.hidden_layers).
+Элементы сцены спрашивают об этом при отрисовке — view_lod / view_shows по
+аргументу widget метода paint (это viewport вида).
+"""
+import math
+
+import numpy as np
+from PyQt5.QtCore import Qt, QRectF, QPointF
+from PyQt5.QtGui import QBrush, QPen, QColor, QFont
+from PyQt5.QtWidgets import QGraphicsItem
+
+LOD_FULL = 0
+LOD_SIMPLE = 1
+LOD_CLUSTER = 2
+
+# Масштаб (пикселей на единицу сцены), ниже которого включается уровень
+LOD_SIMPLE_SCALE = 0.15
+LOD_CLUSTER_SCALE = 0.06
+# Гистерезис: обратно на более детальный уровень — при масштабе выше порога * k
+LOD_HYSTERESIS = 1.15
+
+# Размер ячейки кластеризации на экране, пикселей
+CLUSTER_CELL_PX = 48
+# Допуск прореживания траекторий, пикселей экрана
+TRAIL_TOLERANCE_PX = 1.5
+
+# Слои, которые отдельный вид может не рисовать
+LAYER_TARGETS = "targets"
+LAYER_TRAJECTORIES = "trajectories"
+LAYER_HEADINGS = "headings"
+LAYER_ZONES = "zones"
+LAYER_SWEEP = "sweep"
+LAYER_CLUTTER = "clutter"
+LAYER_TRACKS = "tracks"
+
+
+def _painting_view(widget):
+    # widget в paint — viewport вида; без него (scene.render) — None
+    return widget.parent() if widget is not None else None
+
+
+def view_lod(widget, default: int = LOD_FULL) -> int:
+    """Уровень детализации вида, для которого идёт отрисовка."""
+    return getattr(_painting_view(widget), "lod", default)
+
+
+def view_shows(widget, layer) -> bool:
+    """Рисует ли вид слой layer (без вида — рисуется всё)."""
+    hidden = getattr(_painting_view(widget), "hidden_layers", None)
+    return not hidden or layer not in hidden
+
+
+def view_scale(transform) -> float:
+    """Масштаб вида с учётом поворота (как в MapView.north_up)."""
+    return math.hypot(transform.m11(), transform.m12())
+
+
+def lod_for_scale(scale: float, current: int = LOD_FULL) -> int:
+    """Уровень детализации для масштаба; current — текущий уровень (для гистерезиса)."""
+    up = LOD_HYSTERESIS
+    if current == LOD_CLUSTER:
+        if scale < LOD_CLUSTER_SCALE * up:
+            return LOD_CLUSTER
+        return LOD_SIMPLE if scale < LOD_SIMPLE_SCALE * up else LOD_FULL
+    if current == LOD_SIMPLE:
+        if scale < LOD_CLUSTER_SCALE:
+            return LOD_CLUSTER
+        return LOD_SIMPLE if scale < LOD_SIMPLE_SCALE * up else LOD_FULL
+    if scale < LOD_CLUSTER_SCALE:
+        return LOD_CLUSTER
+    return LOD_SIMPLE if scale < LOD_SIMPLE_SCALE else LOD_FULL
+
+
+def simplify_polyline(xy, epsilon: float):
+    """
+    Прореживание Дугласа — Пекера. xy — массив N x 2; возвращает индексы
+    сохранённых точек (первая и последняя сохраняются всегда).
+    """
+    n = len(xy)
+    if n < 3 or epsilon <= 0:
+        return np.arange(n)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+        a, b = xy[i], xy[j]
+        seg = b - a
+        seg_len = math.hypot(seg[0], seg[1])
+        pts = xy[i + 1:j] - a
+        if seg_len < 1e-9:
+            d = np.hypot(pts[:, 0], pts[:, 1])
+        else:
+            d = np.abs(pts[:, 0] * seg[1] - pts[:, 1] * seg[0]) / seg_len
+        k = int(np.argmax(d))
+        if d[k] > epsilon:
+            m = i + 1 + k
+            keep[m] = True
+            stack.append((i, m))
+            stack.append((m, j))
+    return np.flatnonzero(keep)
+
+
+def grid_clusters(xy, cell: float):
+    """
+    Кластеры по квадратной сетке с шагом cell (единицы сцены).
+    Возвращает (центры K x 2, количества K).
+    """
+    if len(xy) == 0:
+        return np.empty((0, 2)), np.empty(0, dtype=np.int64)
+    keys = np.floor(xy / cell).astype(np.int64)
+    _, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    centers = np.zeros((len(counts), 2))
+    np.add.at(centers, inverse, xy)
+    centers /= counts[:, None]
+    return centers, counts
+
+
+class ClusterItem(QGraphicsItem):
+    """
+    Слой кластеров: рисует все кластеры одним элементом, в пикселях экрана
+    (размер кружков не зависит от масштаба).
+    """
+
+    def __init__(self, rect: QRectF):
+        super().__init__()
+        self._rect = QRectF(rect)
+        self.centers = np.empty((0, 2))
+        self.counts = np.empty(0, dtype=np.int64)
+        self._pen = QPen(QColor(0, 120, 180), 1)
+        self._brush = QBrush(QColor(0, 200, 255, 170))
+        self._text_pen = QPen(QColor(10, 20, 26))
+        self._font = QFont()
+        self._font.setPixelSize(11)
+        self._font.setBold(True)
+        self.setZValue(6)
+        self.setAcceptedMouseButtons(Qt.NoButton)
+
+    def set_rect(self, rect: QRectF):
+        self.prepareGeometryChange()
+        self._rect = QRectF(rect)
+
+    def set_clusters(self, centers, counts, tolerance=0.0):
+        """Новые кластеры; если все центры сдвинулись меньше tolerance — без перерисовки."""
+        if (tolerance > 0 and counts.shape == self.counts.shape and np.array_equal(counts, self.counts)
+                and (len(counts) == 0 or np.abs(centers - self.centers).max() < tolerance)):
+            return
+        self.centers = centers
+        self.counts = counts
+        self.update()
+
+    def cluster_at(self, scene_pos: QPointF, radius: float):
+        """Центр ближайшего кластера в пределах radius (единицы сцены) или None."""
+        if len(self.counts) == 0:
+            return None
+        d = np.hypot(self.centers[:, 0] - scene_pos.x(), self.centers[:, 1] - scene_pos.y())
+        k = int(np.argmin(d))
+        return QPointF(*self.centers[k]) if d[k] <= radius else None
+
+    def boundingRect(self) -> QRectF:
+        return self._rect
+
+    def paint(self, painter, option, widget=None):
+        # Кластеры — только в видах на уровне кластеров
+        if len(self.counts) == 0 or view_lod(widget, LOD_CLUSTER) != LOD_CLUSTER:
+            return
+        world = painter.worldTransform()
+        painter.save()
+        painter.resetTransform()
+        painter.setFont(self._font)
+        for (x, y), n in zip(self.centers.tolist(), self.counts.tolist()):
+            p = world.map(QPointF(x, y))
+            r = 5.0 if n == 1 else min(18.0, 7.0 + 3.0 * math.log2(n))
+            painter.setPen(self._pen)
+            painter.setBrush(self._brush)
+            painter.drawEllipse(p, r, r)
+            if n > 1:
+                painter.setPen(self._text_pen)
+                painter.drawText(QRectF(p.x() - r, p.y() - r, 2 * r, 2 * r), Qt.AlignCenter, str(n))
+        painter.restore()
@@ -1,20 +1,29 @@
 import sys
 import os
+import time
+import multiprocessing
 from datetime import datetime
 
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QStackedWidget, QAction, QToolBar,
-    QMessageBox, QFileDialog, QLabel, QDockWidget
+    QMessageBox, QFileDialog, QLabel, QDockWidget, QProgressDialog
 )
 
 from db import DB
-from dialogs import LoginDialog
-from widgets import NotificationsDock
-from views import TrainingView, ProfileView, SettingsView
+from dialogs import LoginDialog, VideoExportDialog
+from widgets import NotificationsDock, ObjectInfoPanel
+from storage import ScreenshotStorage
+from archive import EventArchiver
+from backup import BackupManager
+from settings_cache import SettingsCache
+from views import TrainingView, ProfileView, SettingsView, DebriefView
+from video_export import VideoExporter
 
 
 APP_TITLE = "RLS Trainer"
+# Панель информации об объекте обновляется не чаще, сек
+OBJECT_INFO_INTERVAL = 0.25
 
 class MainWindow(QMainWindow):
     def __init__(self, db: DB, user):
@@ -40,6 +49,29 @@ class MainWindow(QMainWindow):
         self.setWindowTitle(APP_TITLE)
         self.resize(1200, 800)
         
+        # Настройки читаются из памяти, запись в БД — с задержкой одной транзакцией
+        self.settings = SettingsCache(self.db, parent=self)
+
+        # Хранилище скриншотов тревог (фоновое кодирование и очистка)
+        self.screenshot_storage = ScreenshotStorage(self.db, parent=self)
+        self.screenshot_storage.maybe_prune(force=True)
+
+        # Перенос старых событий в помесячные архивы (фоном, небольшими пачками)
+        self.event_archiver = EventArchiver(self.db, parent=self)
+        self.event_archiver.start()
+
+        # Резервные копии базы по расписанию (онлайн, в фоновом потоке)
+        self.backup_manager = BackupManager(self.db.path, parent=self)
+        self.backup_manager.finished.connect(
+            lambda path: self.add_notification(f"Резервная копия сохранена: {os.path.basename(path)}"))
+        self.backup_manager.failed.connect(
+            lambda error: self.add_notification(f"Резервная копия не создана: {error}"))
+        self.backup_manager.start()
+
+        # Фоновый экспорт записи сеанса в видео (не больше одного)
+        self.video_exporter = None
+        self.export_progress = None
+
         # Центр — стек с представлениями
         self.stack = QStackedWidget()
         self.setCentralWidget(self.stack)
@@ -48,27 +80,28 @@ class MainWindow(QMainWindow):
         self.training_view = TrainingView(self.db, self)
         self.profile_view = ProfileView(self.db)
         self.settings_view = SettingsView(self.db, self)
+        self.debrief_view = DebriefView(self.db)
 
         self.stack.addWidget(self.training_view)
         self.stack.addWidget(self.profile_view)
         self.stack.addWidget(self.settings_view)
+        self.stack.addWidget(self.debrief_view)
 
         self.profile_view.set_user(self.user)
         self.settings_view.set_user(self.user)
+        self.debrief_view.set_user(self.user)
         # Уведомления
-        self.notifications = NotificationsDock(self)
+        self.notifications = NotificationsDock(self, db=self.db)
+        self.notifications.set_user(self.user)
         self.addDockWidget(Qt.RightDockWidgetArea, self.notifications)
 
         # Панель информации о выбранном объекте (режим слежения)
-        # Создаём док с меткой, которая будет содержать текст статистики.
-        self.object_info_label = QLabel()
-        # Многострочный текст; перенос строки позволяет тексту помещаться по ширине
-        self.object_info_label.setWordWrap(True)
-        self.object_info_label.setAlignment(Qt.AlignLeft | Qt.AlignTop)
-        # Стиль: оставим цвет как у уведомлений, чтобы была консистентность
-        self.object_info_label.setStyleSheet("padding: 8px; color: #black;")
+        # Док с панелью полей статистики; поля обновляются по отдельности.
+        self.object_info_panel = ObjectInfoPanel()
+        self._object_info_uid = None
+        self._object_info_last = 0.0
         self.stats_dock = QDockWidget("Информация об объекте", self)
-        self.stats_dock.setWidget(self.object_info_label)
+        self.stats_dock.setWidget(self.object_info_panel)
         # Разрешаем располагать док в правой и нижней областях
         self.stats_dock.setAllowedAreas(Qt.RightDockWidgetArea | Qt.BottomDockWidgetArea)
         # По умолчанию док скрыт до выбора объекта
@@ -104,6 +137,9 @@ class MainWindow(QMainWindow):
         act_settings = QAction("Настройки", self)
         act_settings.triggered.connect(lambda: self.stack.setCurrentWidget(self.settings_view))
 
+        act_debrief = QAction("Разбор", self)
+        act_debrief.triggered.connect(lambda: self.stack.setCurrentWidget(self.debrief_view))
+
         act_start = QAction("Старт", self)
         act_start.triggered.connect(self.training_view.open_settings)
 
@@ -113,33 +149,42 @@ class MainWindow(QMainWindow):
         act_screenshot = QAction("Скриншот...", self)
         act_screenshot.triggered.connect(self.take_screenshot)
 
+        act_video = QAction("Экспорт видео...", self)
+        act_video.triggered.connect(self.export_video)
+
         act_exit = QAction("Выход", self)
         act_exit.triggered.connect(self.close)
 
         tb.addAction(act_training)
         tb.addAction(act_profile)
         tb.addAction(act_settings)
+        tb.addAction(act_debrief)
         tb.addSeparator()
         tb.addAction(act_start)
         tb.addAction(act_stop)
         tb.addSeparator()
         tb.addAction(act_screenshot)
+        tb.addAction(act_video)
         tb.addSeparator()
         tb.addAction(act_exit)
 
-    def add_notification(self, message: str, screenshot: str = None, type_: str = "info"):
-        self.notifications.add(message)
+    def add_notification(self, message: str, screenshot: str = None, type_: str = "info",
+                         group: str = None):
+        entry = self.notifications.add(message, type_, group=group, screenshot=screenshot)
+        # Запись в журнал — в потоке БД; id события приходит позже
         try:
-            self.db.add_event(self.user["id"], type_, message, screenshot)
+            self.db.call_async("add_event", self.user["id"], type_, message, screenshot,
+                               on_done=lambda event_id: self.notifications.model.set_event_id(entry, event_id),
+                               on_error=lambda e: None)  # не мешаем работе из-за ошибок логирования
         except Exception:
-            pass  # не мешаем работе из-за ошибок логирования
+            pass
 
     def on_training_finished(self, correct, wrong, started_at_iso, duration_sec):
-        try:
-            self.db.add_training(self.user["id"], started_at_iso, duration_sec, correct, wrong)
-        except Exception as e:
-            QMessageBox.warning(self, "Ошибка сохранения", f"Не удалось сохранить результаты: {e}")
-        self.profile_view.reload_history()
+        self.db.call_async("save_training_session", self.user["id"], started_at_iso, duration_sec,
+                           correct, wrong, self.training_view.take_identifications(),
+                           on_done=lambda _: self.profile_view.reload_history(),
+                           on_error=lambda e: QMessageBox.warning(
+                               self, "Ошибка сохранения", f"Не удалось сохранить результаты: {e}"))
         self.add_notification(f"Итоги сеанса: верно={correct}, ошибки={wrong}, длительность={duration_sec} сек")
 
     def show_object_info(self, obj):
@@ -150,35 +195,42 @@ class MainWindow(QMainWindow):
         if not obj:
             self.hide_object_info()
             return
-        # Получаем текст статистики от объекта; используем try/except на случай
-        # необычных исключений
-        try:
-            text = obj.get_stats_text()
-        except Exception:
-            text = ""
-        self.object_info_label.setText(text)
+        if obj.uid != self._object_info_uid:
+            self.object_info_panel.clear()
+            self._object_info_uid = obj.uid
+        self._render_object_info(obj)
         self.stats_dock.show()
 
     def update_object_info(self, obj):
         """
-        Обновляет текст в доке статистики для текущего объекта. Метод ничего
-        не делает, если док скрыт или объект пуст.
+        Обновляет поля статистики для текущего объекта не чаще
+        OBJECT_INFO_INTERVAL. Ничего не делает, если док скрыт или объект пуст.
         """
         if not obj or not self.stats_dock.isVisible():
             return
+        if time.monotonic() - self._object_info_last < OBJECT_INFO_INTERVAL:
+            return
+        self._render_object_info(obj)
+
+    def _render_object_info(self, obj):
+        self._object_info_last = time.monotonic()
+        scene = obj.scene()
+        if scene is None:
+            return
         try:
-            text = obj.get_stats_text()
+            values = scene.track_stats.summary(obj.uid, scene.ring_radii)
         except Exception:
-            text = ""
-        self.object_info_label.setText(text)
+            values = {}
+        self.object_info_panel.update_fields(values)
 
     def hide_object_info(self):
         """
-        Скрывает док с информацией об объекте и очищает текст.
+        Скрывает док с информацией об объекте и очищает поля.
         """
         try:
             self.stats_dock.hide()
-            self.object_info_label.setText("")
+            self.object_info_panel.clear()
+            self._object_info_uid = None
         except Exception:
             pass
 
@@ -193,8 +245,79 @@ class MainWindow(QMainWindow):
         except Exception as e:
             QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить скриншот: {e}")
 
+    def export_video(self):
+        if self.video_exporter is not None and self.video_exporter.is_running():
+            QMessageBox.information(self, "Экспорт видео", "Экспорт уже выполняется")
+            return
+        opts = VideoExportDialog(self, self.training_view.last_recording).get()
+        if not opts:
+            return
+        recording, output = opts.pop("recording"), opts.pop("output")
+        exporter = VideoExporter(recording, output, self, **opts)
+        self.export_progress = QProgressDialog("Экспорт видео...", "Отмена", 0, 100, self)
+        self.export_progress.setWindowTitle("Экспорт видео")
+        self.export_progress.setMinimumDuration(0)
+        self.export_progress.canceled.connect(exporter.cancel)
+        exporter.progress.connect(self._on_export_progress)
+        exporter.finished.connect(self._on_export_finished)
+        exporter.failed.connect(self._on_export_failed)
+        exporter.cancelled.connect(self._on_export_cancelled)
+        self.video_exporter = exporter
+        exporter.start()
+
+    def _on_export_progress(self, done, total):
+        if self.export_progress is not None:
+            self.export_progress.setMaximum(total)
+            self.export_progress.setValue(done)
+
+    def _close_export_progress(self):
+        if self.export_progress is not None:
+            self.export_progress.close()
+            self.export_progress = None
+
+    def _on_export_finished(self, path):
+        self._close_export_progress()
+        self.add_notification(f"Видео сохранено: {os.path.basename(path)}")
+
+    def _on_export_failed(self, error):
+        self._close_export_progress()
+        QMessageBox.warning(self, "Ошибка", f"Не удалось экспортировать видео: {error}")
+
+    def _on_export_cancelled(self):
+        self._close_export_progress()
+        self.add_notification("Экспорт видео отменён")
+
     def closeEvent(self, event):
-        # Закрываем БД при выходе
+        # Сбрасываем отложенные настройки, дописываем скриншоты из очереди
+        # и закрываем БД при выходе (вместе с монитором инструктора)
+        try:
+            if self.training_view.monitor is not None:
+                self.training_view.monitor.close()
+        except Exception:
+            pass
+        try:
+            if self.video_exporter is not None:
+                self.video_exporter.cancel()
+                self.video_exporter.wait()
+        except Exception:
+            pass
+        try:
+            self.event_archiver.stop()
+        except Exception:
+            pass
+        try:
+            self.backup_manager.cancel()
+            self.backup_manager.wait()
+        except Exception:
+            pass
+        try:
+            self.settings.flush()
+        except Exception:
+            pass
+        try:
+            self.screenshot_storage.shutdown()
+        except Exception:
+            pass
         try:
             self.db.close()
         except Exception:
@@ -215,4 +338,6 @@ def main():
         sys.exit(app.exec_())
 
 if __name__ == "__main__":
+    # Процессы пула экспорта видео (spawn) в собранном exe не должны запускать GUI
+    multiprocessing.freeze_support()
     main()
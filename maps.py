@@ -0,0 +1,185 @@
+"""
+Каталог карт (регионов) и кэш декодированных карт.
+
+Каталог читается из assets/maps.json (если файла нет — используется одна
+карта по умолчанию из graphics.py). Формат:
+
+    [
+        {
+            "id": "spb",
+            "title": "Санкт-Петербург",
+            "path": "assets/spb.map.png",
+            "extent": [-10000, -10000, 20000, 20000],   # x, y, w, h на сцене
+            "radar_center": [2000, 0],
+            "geo_bounds": [29.9, 59.8, 30.6, 60.1],      # lon_min, lat_min, lon_max, lat_max (необяз.)
+            "radars": [...],                              # несколько РЛС (необяз., см. radars.py)
+            "clutter": [...],                             # участки помех (необяз., см. clutter.py)
+            "heightmap": {...}                            # карта высот (необяз., см. coverage.py)
+        }
+    ]
+"""
+import os
+import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QPointF, QRectF
+from PyQt5.QtGui import QImage, QPixmap, QTransform
+from PyQt5.QtWidgets import QGraphicsPixmapItem
+
+from maptiles import TiledMap, TiledMapItem, open_tiled_map
+
+MAPS_CATALOG_PATH = "assets/maps.json"
+MAP_CACHE_SIZE = 3
+
+
+class MapRegion:
+    """Регион: файл карты, его положение на сцене и центр радара (или список РЛС)."""
+
+    def __init__(self, id_, title, path, extent: QRectF, radar_center: QPointF, geo_bounds=None,
+                 radars=None, clutter=None, heightmap=None):
+        self.id = id_
+        self.title = title
+        self.path = path
+        self.extent = QRectF(extent)
+        self.radar_center = QPointF(radar_center)
+        self.geo_bounds = tuple(geo_bounds) if geo_bounds else None
+        self.radars = list(radars) if radars else []
+        self.clutter = list(clutter) if clutter else []
+        self.heightmap = heightmap
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        x, y, w, h = d["extent"]
+        cx, cy = d["radar_center"]
+        return cls(d["id"], d.get("title", d["id"]), d["path"],
+                   QRectF(x, y, w, h), QPointF(cx, cy), d.get("geo_bounds"), d.get("radars"),
+                   d.get("clutter"), d.get("heightmap"))
+
+    def scene_to_geo(self, pos: QPointF):
+        """Пересчёт координат сцены в (долгота, широта); None без привязки."""
+        if not self.geo_bounds:
+            return None
+        lon_min, lat_min, lon_max, lat_max = self.geo_bounds
+        e = self.extent
+        fx = (pos.x() - e.left()) / e.width()
+        fy = (pos.y() - e.top()) / e.height()
+        return lon_min + fx * (lon_max - lon_min), lat_max - fy * (lat_max - lat_min)
+
+
+class MapCatalog:
+    def __init__(self, regions):
+        self._regions = OrderedDict((r.id, r) for r in regions)
+
+    @classmethod
+    def load(cls, path=MAPS_CATALOG_PATH, default_region: MapRegion = None):
+        regions = []
+        try:
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    regions = [MapRegion.from_dict(d) for d in json.load(f)]
+        except Exception as e:
+            print(f"[maps] Failed to load catalog {path}: {e}")
+        if not regions and default_region is not None:
+            regions = [default_region]
+        return cls(regions)
+
+    def regions(self):
+        return list(self._regions.values())
+
+    def get(self, region_id):
+        return self._regions.get(region_id)
+
+    def find_by_path(self, path):
+        for r in self._regions.values():
+            if os.path.normpath(r.path) == os.path.normpath(path):
+                return r
+        return None
+
+    def add(self, region: MapRegion):
+        self._regions[region.id] = region
+
+    def next_region(self, region_id):
+        """Следующий регион по кругу — кандидат на предзагрузку."""
+        ids = list(self._regions)
+        if region_id not in self._regions or len(ids) < 2:
+            return None
+        return self._regions[ids[(ids.index(region_id) + 1) % len(ids)]]
+
+
+def _decode_map(path):
+    # Выполняется в фоновом потоке: только QImage/mmap, без QPixmap
+    tiled = open_tiled_map(path)
+    if tiled is not None:
+        return tiled
+    if not os.path.exists(path):
+        return None
+    img = QImage(path)
+    return None if img.isNull() else img
+
+
+class MapCache:
+    """
+    LRU декодированных карт (TiledMap или QPixmap) с фоновой предзагрузкой.
+    Методы get/prefetch/create_item вызываются из GUI-потока.
+    """
+
+    def __init__(self, capacity=MAP_CACHE_SIZE):
+        self.capacity = max(1, int(capacity))
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="map-prefetch")
+
+    def prefetch(self, path):
+        if not path or path in self._entries or path in self._pending:
+            return
+        self._pending[path] = self._executor.submit(_decode_map, path)
+
+    def get(self, path):
+        if path in self._entries:
+            self._entries.move_to_end(path)
+            return self._entries[path]
+        future = self._pending.pop(path, None)
+        try:
+            data = future.result() if future is not None else _decode_map(path)
+        except Exception as e:
+            print(f"[maps] Failed to decode {path}: {e}")
+            data = None
+        if isinstance(data, QImage):
+            data = QPixmap.fromImage(data)
+        if data is not None:
+            self._entries[path] = data
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return data
+
+    def create_item(self, region: MapRegion):
+        """Графический элемент карты, растянутый на extent региона."""
+        data = self.get(region.path)
+        if data is None:
+            return None
+        if isinstance(data, TiledMap):
+            item = TiledMapItem(data)
+        else:
+            item = QGraphicsPixmapItem(data)
+        transform = QTransform()
+        transform.scale(region.extent.width() / data.width(), region.extent.height() / data.height())
+        item.setTransform(transform)
+        item.setPos(region.extent.topLeft())
+        item.setZValue(-100)
+        return item
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+        self._pending.clear()
+
+
+_shared_cache = None
+
+
+def shared_map_cache() -> MapCache:
+    """Общий кэш карт для всех сцен приложения."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = MapCache()
+    return _shared_cache
@@ -0,0 +1,229 @@
+"""
+Тайловый формат карты (.rlsmap) с отображением файла в память.
+
+Сборка (один раз, после замены PNG):
+    python maptiles.py assets/spb.map.png            -> assets/spb.map.rlsmap
+    python maptiles.py assets/spb.map.png --zlib     -> тайлы со сжатием zlib
+
+Файл состоит из заголовка, таблицы тайлов и данных тайлов. Несжатые тайлы
+выровнены по границе страницы, поэтому QImage строится прямо поверх mmap без
+копирования, а несколько запущенных тренажёров делят одни и те же страницы
+через кэш ОС.
+"""
+import os
+import sys
+import mmap
+import zlib
+import ctypes
+import struct
+import argparse
+
+from PyQt5 import sip
+from PyQt5.QtCore import QRectF, QPointF
+from PyQt5.QtGui import QImage
+from PyQt5.QtWidgets import QGraphicsItem
+
+MAGIC = b"RLSMAP01"
+VERSION = 1
+TILED_MAP_EXT = ".rlsmap"
+DEFAULT_TILE_SIZE = 512
+PAGE_SIZE = 4096
+
+COMPRESSION_RAW = 0
+COMPRESSION_ZLIB = 1
+
+# magic, version, compression, width, height, tile_size, QImage.Format
+_HEADER = struct.Struct("<8sHHIIII")
+# offset, length, bytes_per_line, tile_w, tile_h
+_TILE_ENTRY = struct.Struct("<QIIHH")
+
+
+def tiled_path_for(image_path: str) -> str:
+    """Путь к тайловому файлу рядом с исходным изображением."""
+    root, _ = os.path.splitext(image_path)
+    return root + TILED_MAP_EXT
+
+
+def _align(value: int, alignment: int = PAGE_SIZE) -> int:
+    return (value + alignment - 1) // alignment * alignment
+
+
+def build_tiled_map(image_path: str, out_path: str = None,
+                    tile_size: int = DEFAULT_TILE_SIZE, compress: bool = False) -> str:
+    """Декодирует изображение и записывает его в формате .rlsmap."""
+    img = QImage(image_path)
+    if img.isNull():
+        raise ValueError(f"Не удалось прочитать изображение: {image_path}")
+    fmt = QImage.Format_ARGB32_Premultiplied if img.hasAlphaChannel() else QImage.Format_RGB32
+    img = img.convertToFormat(fmt)
+    out_path = out_path or tiled_path_for(image_path)
+
+    w, h = img.width(), img.height()
+    tiles_x = (w + tile_size - 1) // tile_size
+    tiles_y = (h + tile_size - 1) // tile_size
+    compression = COMPRESSION_ZLIB if compress else COMPRESSION_RAW
+
+    blobs = []
+    for ty in range(tiles_y):
+        for tx in range(tiles_x):
+            tile = img.copy(tx * tile_size, ty * tile_size,
+                            min(tile_size, w - tx * tile_size),
+                            min(tile_size, h - ty * tile_size))
+            ptr = tile.constBits()
+            ptr.setsize(tile.sizeInBytes())
+            data = bytes(ptr)
+            if compression == COMPRESSION_ZLIB:
+                data = zlib.compress(data, 1)
+            blobs.append((data, tile.bytesPerLine(), tile.width(), tile.height()))
+
+    table_size = _HEADER.size + _TILE_ENTRY.size * len(blobs)
+    offset = _align(table_size)
+    entries = []
+    for data, bpl, tw, th in blobs:
+        entries.append(_TILE_ENTRY.pack(offset, len(data), bpl, tw, th))
+        offset = _align(offset + len(data)) if compression == COMPRESSION_RAW else offset + len(data)
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, compression, w, h, tile_size, int(fmt)))
+        for e in entries:
+            f.write(e)
+        for (data, *_), entry in zip(blobs, entries):
+            f.seek(_TILE_ENTRY.unpack(entry)[0])
+            f.write(data)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+class TiledMap:
+    """
+    Открытый .rlsmap: заголовок разобран, данные отображены в память.
+    Несжатые тайлы отдаются как QImage поверх mmap (без копирования),
+    сжатые — распаковываются при первом обращении и кэшируются.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        # ACCESS_COPY: страницы общие с кэшем ОС, пока в них никто не пишет
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, version, compression, w, h, tile, fmt = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Неподдерживаемый формат карты: {path}")
+        self.compression = compression
+        self._width = w
+        self._height = h
+        self.tile_size = tile
+        self.image_format = QImage.Format(fmt)
+        self.tiles_x = (w + tile - 1) // tile
+        self.tiles_y = (h + tile - 1) // tile
+        self._entries = [
+            _TILE_ENTRY.unpack_from(self._mm, _HEADER.size + i * _TILE_ENTRY.size)
+            for i in range(self.tiles_x * self.tiles_y)
+        ]
+        self._images = {}
+        self._buffers = {}
+
+    def width(self) -> int:
+        return self._width
+
+    def height(self) -> int:
+        return self._height
+
+    def tile_image(self, tx: int, ty: int) -> QImage:
+        key = (tx, ty)
+        img = self._images.get(key)
+        if img is not None:
+            return img
+        offset, length, bpl, tw, th = self._entries[ty * self.tiles_x + tx]
+        if self.compression == COMPRESSION_RAW:
+            buf = (ctypes.c_char * length).from_buffer(self._mm, offset)
+            self._buffers[key] = buf
+            img = QImage(sip.voidptr(ctypes.addressof(buf)), tw, th, bpl, self.image_format)
+        else:
+            data = zlib.decompress(self._mm[offset:offset + length])
+            self._buffers[key] = data
+            img = QImage(data, tw, th, bpl, self.image_format)
+        self._images[key] = img
+        return img
+
+    def tiles_in_rect(self, rect: QRectF):
+        """Индексы тайлов, пересекающих прямоугольник (в пикселях карты)."""
+        ts = self.tile_size
+        x0 = max(0, int(rect.left() // ts))
+        y0 = max(0, int(rect.top() // ts))
+        x1 = min(self.tiles_x - 1, int(rect.right() // ts))
+        y1 = min(self.tiles_y - 1, int(rect.bottom() // ts))
+        for ty in range(y0, y1 + 1):
+            for tx in range(x0, x1 + 1):
+                yield tx, ty
+
+    def close(self):
+        # QImage ссылаются на буферы mmap — сначала отпускаем их
+        self._images.clear()
+        self._buffers.clear()
+        try:
+            self._mm.close()
+        except (BufferError, ValueError):
+            pass
+        try:
+            self._file.close()
+        except Exception:
+            pass
+
+
+class TiledMapItem(QGraphicsItem):
+    """Элемент сцены, рисующий только тайлы, попавшие в видимую область."""
+
+    def __init__(self, tiled_map: TiledMap, parent=None):
+        super().__init__(parent)
+        self.tiled_map = tiled_map
+        self._bounds = QRectF(0, 0, tiled_map.width(), tiled_map.height())
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+
+    def boundingRect(self) -> QRectF:
+        return self._bounds
+
+    def paint(self, painter, option, widget=None):
+        tm = self.tiled_map
+        ts = tm.tile_size
+        for tx, ty in tm.tiles_in_rect(option.exposedRect.intersected(self._bounds)):
+            painter.drawImage(QPointF(tx * ts, ty * ts), tm.tile_image(tx, ty))
+
+
+def open_tiled_map(image_path: str):
+    """
+    Возвращает TiledMap для изображения, если рядом лежит актуальный .rlsmap
+    (или если передан сам .rlsmap), иначе None.
+    """
+    if image_path.endswith(TILED_MAP_EXT):
+        tiled = image_path
+    else:
+        tiled = tiled_path_for(image_path)
+        if not os.path.exists(tiled):
+            return None
+        if os.path.exists(image_path) and os.path.getmtime(image_path) > os.path.getmtime(tiled):
+            print(f"[maptiles] {tiled} устарел, используется {image_path}")
+            return None
+    try:
+        return TiledMap(tiled)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"[maptiles] Failed to open {tiled}: {e}")
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сборка тайловой карты .rlsmap")
+    parser.add_argument("images", nargs="+", help="исходные изображения карт")
+    parser.add_argument("--tile", type=int, default=DEFAULT_TILE_SIZE, help="размер тайла, px")
+    parser.add_argument("--zlib", action="store_true", help="сжимать тайлы (без mmap-отображения)")
+    args = parser.parse_args(argv)
+    for path in args.images:
+        out = build_tiled_map(path, tile_size=args.tile, compress=args.zlib)
+        print(f"{path} -> {out} ({os.path.getsize(out) // 1024} KB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Облако точек как один QGraphicsItem: координаты и время появления точек
+лежат в заранее выделенных массивах (кольцевой буфер), отрисовка — пачками
+drawPoints по градациям яркости, без отдельного элемента на точку.
+"""
+import numpy as np
+from PyQt5.QtCore import Qt, QRectF
+from PyQt5.QtGui import QColor, QPen, QPolygonF
+from PyQt5.QtWidgets import QGraphicsItem
+
+from lod import view_shows
+
+# Градации яркости при затухании (одна пачка drawPoints на градацию)
+FADE_LEVELS = 8
+# Частота перерисовки затухания всего облака, кадров/с
+FADE_FPS = 10.0
+
+
+def polygon_from_xy(xy) -> QPolygonF:
+    """QPolygonF из массива N x 2 float64 без поточечного цикла в Python."""
+    xy = np.ascontiguousarray(xy, dtype=np.float64).reshape(-1, 2)
+    poly = QPolygonF(len(xy))
+    if len(xy):
+        ptr = poly.data()
+        ptr.setsize(xy.nbytes)
+        np.frombuffer(ptr, dtype=np.float64)[:] = xy.ravel()
+    return poly
+
+
+class PointCloudItem(QGraphicsItem):
+    """
+    Точки с затуханием за persistence секунд. Размер точки задаётся в
+    пикселях экрана (косметическое перо) и не зависит от масштаба.
+    layer — слой (см. lod.py), который вид может скрыть.
+    """
+    layer = None
+
+    def __init__(self, rect: QRectF, capacity: int, color: QColor, size_px=3.0):
+        super().__init__()
+        self._rect = QRectF(rect)
+        self.xy = np.zeros((capacity, 2), dtype=np.float64)
+        self.t = np.full(capacity, -np.inf)
+        self._next = 0
+        self.now = 0.0
+        self.persistence = 1.0
+        self._last_fade = -np.inf
+        self._pens = []
+        for level in range(FADE_LEVELS):
+            c = QColor(color)
+            c.setAlpha(int(color.alpha() * (FADE_LEVELS - level) / FADE_LEVELS))
+            pen = QPen(c, size_px, Qt.SolidLine, Qt.RoundCap)
+            pen.setCosmetic(True)
+            self._pens.append(pen)
+        self.setAcceptedMouseButtons(Qt.NoButton)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.t)
+
+    def set_rect(self, rect: QRectF):
+        self.prepareGeometryChange()
+        self._rect = QRectF(rect)
+
+    def clear(self):
+        self.t[:] = -np.inf
+        self._next = 0
+        self.update()
+
+    def add_points(self, xy, t):
+        """Дописывает точки в кольцевой буфер (самые старые вытесняются)."""
+        n = len(xy)
+        if n == 0:
+            return
+        cap = self.capacity
+        if n > cap:
+            xy, n = xy[-cap:], cap
+        idx = (self._next + np.arange(n)) % cap
+        self.xy[idx] = xy
+        self.t[idx] = t
+        self._next = int((self._next + n) % cap)
+
+    def replace_points(self, xy, t):
+        """Заменяет всё облако (режим без луча: новый кадр помех)."""
+        self.t[:] = -np.inf
+        self._next = 0
+        self.add_points(xy, t)
+
+    def advance(self, now, persistence, dirty_rect: QRectF = None):
+        """
+        Новое время кадра. Затухание перерисовывается целиком не чаще FADE_FPS,
+        в остальных кадрах — только dirty_rect (например, сектор луча).
+        """
+        self.now, self.persistence = now, persistence
+        if now - self._last_fade >= 1.0 / FADE_FPS:
+            self._last_fade = now
+            self.update()
+        elif dirty_rect is not None:
+            self.update(dirty_rect)
+
+    def boundingRect(self) -> QRectF:
+        return self._rect
+
+    def paint(self, painter, option, widget=None):
+        if self.layer is not None and not view_shows(widget, self.layer):
+            return
+        age = self.now - self.t
+        alive = np.flatnonzero(age < self.persistence)
+        if len(alive) == 0:
+            return
+        levels = np.minimum((age[alive] / self.persistence * FADE_LEVELS).astype(np.int64), FADE_LEVELS - 1)
+        for level in np.unique(levels).tolist():
+            painter.setPen(self._pens[level])
+            painter.drawPoints(polygon_from_xy(self.xy[alive[levels == level]]))
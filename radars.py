@@ -0,0 +1,102 @@
+"""
+Радарные позиции и пакетный расчёт дальностей и колец.
+
+Сцена может содержать несколько РЛС (перекрывающиеся зоны). Дальности и
+номера колец для всех объектов относительно всех РЛС считаются одним
+векторизованным проходом: measure(xy) -> матрицы N x M.
+
+Радары региона задаются в assets/maps.json необязательным списком:
+
+    "radars": [
+        {"id": "r1", "center": [2000, 0], "ring_radii": [1000, 3000, 7000], "range": 9000, "height": 15},
+        {"id": "r2", "center": [-4000, 3000], "ring_radii": [1500, 4000], "range": 6000}
+    ]
+
+Без списка используется одна РЛС в radar_center региона.
+"""
+import numpy as np
+from PyQt5.QtCore import QPointF
+
+DEFAULT_RING_RADII = (1000, 3000, 7000)
+DEFAULT_COVERAGE_RANGE = 9000.0
+# Высота антенны над землёй, м (для расчёта прямой видимости, см. coverage.py)
+DEFAULT_ANTENNA_HEIGHT = 15.0
+
+
+class RadarSite:
+    def __init__(self, id_, center: QPointF, ring_radii=DEFAULT_RING_RADII,
+                 coverage_range=DEFAULT_COVERAGE_RANGE, title=None, height=DEFAULT_ANTENNA_HEIGHT):
+        self.id = str(id_)
+        self.center = QPointF(center)
+        self.ring_radii = [float(r) for r in sorted(ring_radii)]
+        self.coverage_range = float(coverage_range)
+        self.title = title or self.id
+        self.height = float(height)
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        cx, cy = d["center"]
+        return cls(d["id"], QPointF(cx, cy), d.get("ring_radii", DEFAULT_RING_RADII),
+                   d.get("range", DEFAULT_COVERAGE_RANGE), d.get("title"),
+                   d.get("height", DEFAULT_ANTENNA_HEIGHT))
+
+
+class RadarNetwork:
+    """Набор РЛС сцены; первая — основная (radar_center, ring_radii сцены)."""
+
+    def __init__(self, sites):
+        if not sites:
+            raise ValueError("RadarNetwork needs at least one site")
+        self.sites = list(sites)
+        self._rebuild()
+
+    @classmethod
+    def from_region(cls, region):
+        dicts = getattr(region, "radars", None) or []
+        sites = []
+        for d in dicts:
+            try:
+                sites.append(RadarSite.from_dict(d))
+            except Exception as e:
+                print(f"[radars] Bad radar entry in region {region.id}: {e}")
+        return cls(sites or [RadarSite("main", region.radar_center)])
+
+    def _rebuild(self):
+        """Массивы параметров всех РЛС для векторных расчётов."""
+        m = len(self.sites)
+        k = max(len(s.ring_radii) for s in self.sites)
+        self.centers = np.array([(s.center.x(), s.center.y()) for s in self.sites], dtype=np.float64)
+        self.coverage = np.array([s.coverage_range for s in self.sites], dtype=np.float64)
+        self.ring_counts = np.array([len(s.ring_radii) for s in self.sites], dtype=np.int64)
+        # M x K, недостающие кольца — бесконечность (в счёт не попадают)
+        self.radii = np.full((m, k), np.inf)
+        for i, s in enumerate(self.sites):
+            self.radii[i, :len(s.ring_radii)] = s.ring_radii
+        self.ids = [s.id for s in self.sites]
+
+    @property
+    def primary(self) -> RadarSite:
+        return self.sites[0]
+
+    def __len__(self):
+        return len(self.sites)
+
+    def index_of(self, radar_id) -> int:
+        return self.ids.index(str(radar_id))
+
+    def move(self, radar_id, center: QPointF):
+        self.sites[self.index_of(radar_id)].center = QPointF(center)
+        self._rebuild()
+
+    def measure(self, xy):
+        """
+        xy — N x 2. Возвращает (dist N x M, bands N x M): номер первого кольца,
+        радиус которого не меньше дальности, или -1 (вне колец или вне дальности РЛС).
+        """
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        d = xy[:, None, :] - self.centers[None, :, :]
+        dist = np.hypot(d[..., 0], d[..., 1])
+        bands = (dist[:, :, None] > self.radii[None, :, :]).sum(axis=2)
+        outside = (bands >= self.ring_counts[None, :]) | (dist > self.coverage[None, :])
+        bands[outside] = -1
+        return dist, bands
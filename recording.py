@@ -0,0 +1,202 @@
+"""
+Запись сеанса для разбора и экспорта в видео (см. video_export.py).
+
+Рекордер подписывается на тик сцены и RECORD_FPS раз в секунду модельного
+времени снимает компактное состояние целей в массивы NumPy. Статическая
+часть (регион, РЛС) пишется один раз, контуры зон — при изменении набора.
+По окончании сеанса всё сохраняется одним файлом .npz в RECORDINGS_DIR.
+
+Час сеанса с 40 целями при 10 кадрах/с — порядка 20 МБ в памяти.
+"""
+import os
+import json
+from datetime import datetime
+
+import numpy as np
+
+RECORDINGS_DIR = "recordings"
+RECORDING_EXT = ".npz"
+# Кадров записи в секунду модельного времени
+RECORD_FPS = 10.0
+
+KINDS = ("bvs", "bird")
+STATES = ("normal", "suppressed", "landed")
+LABELS = ("bvs", "bird")
+
+FLAG_DETECTED = 1
+FLAG_ECM = 2
+
+
+def _code(values, value):
+    try:
+        return values.index(value)
+    except ValueError:
+        return -1
+
+
+class SessionRecorder:
+    def __init__(self, scene, fps=RECORD_FPS):
+        self.scene = scene
+        self.interval = 1.0 / float(fps)
+        self.started_at = None
+        self._next_t = 0.0
+        self._t0 = 0.0
+        self._active = False
+        self._reset()
+
+    def _reset(self):
+        self.frame_t, self.frame_count, self.frame_zones, self.frame_sweep = [], [], [], []
+        self.uid, self.xy, self.vel, self.kind, self.state, self.label, self.flags = [], [], [], [], [], [], []
+        self.zone_sets = []
+        self._zone_key = None
+        self.alarms = []
+
+    def start(self):
+        self._reset()
+        self.started_at = datetime.now()
+        self._t0 = self.scene.sim_time
+        if not self._active:
+            self.scene.ticked.connect(self._on_tick)
+            self.scene.alarmTriggered.connect(self._on_alarm)
+            self._active = True
+        self._capture(0.0)
+        self._next_t = self.interval
+
+    def stop(self):
+        if self._active:
+            self.scene.ticked.disconnect(self._on_tick)
+            self.scene.alarmTriggered.disconnect(self._on_alarm)
+            self._active = False
+
+    @property
+    def frames(self) -> int:
+        return len(self.frame_t)
+
+    def _on_alarm(self, message):
+        self.alarms.append((self.scene.sim_time - self._t0, message))
+
+    def _on_tick(self):
+        t = self.scene.sim_time - self._t0
+        if t + 1e-9 >= self._next_t:
+            self._capture(t)
+            # По расписанию, без накопления задержки тика; после долгой паузы — догоняем
+            self._next_t += self.interval
+            if self._next_t <= t:
+                self._next_t = t + self.interval
+
+    def _zone_set_index(self) -> int:
+        zones = self.scene.detect_zones + self.scene.ignore_zones
+        key = tuple(id(z.geometry) for z in zones)
+        if key != self._zone_key:
+            self._zone_key = key
+            self.zone_sets.append([(z.zone_type, z.geometry.points.copy()) for z in zones])
+        return len(self.zone_sets) - 1
+
+    def _capture(self, t):
+        objs = self.scene.objects
+        n = len(objs)
+        self.frame_t.append(t)
+        self.frame_count.append(n)
+        self.frame_zones.append(self._zone_set_index())
+        sweep = self.scene.sweep
+        self.frame_sweep.append(sweep.angle if sweep is not None else np.nan)
+        if n == 0:
+            return
+        self.uid.append(np.fromiter((o.uid for o in objs), dtype=np.int32, count=n))
+        self.xy.append(np.array([(o.sim_pos.x(), o.sim_pos.y()) for o in objs], dtype=np.float32))
+        self.vel.append(np.array([(o.velocity.x(), o.velocity.y()) for o in objs], dtype=np.float32))
+        self.kind.append(np.fromiter((_code(KINDS, o.type_) for o in objs), dtype=np.int8, count=n))
+        self.state.append(np.fromiter((_code(STATES, o.state) for o in objs), dtype=np.int8, count=n))
+        self.label.append(np.fromiter((_code(LABELS, o.label) for o in objs), dtype=np.int8, count=n))
+        self.flags.append(np.fromiter((FLAG_DETECTED * o.detected + FLAG_ECM * o.has_ecm for o in objs),
+                                      dtype=np.int8, count=n))
+
+    def _meta(self) -> dict:
+        region = self.scene.region
+        e = region.extent
+        return {
+            "version": 1,
+            "fps": 1.0 / self.interval,
+            "started_at": self.started_at.isoformat(timespec="seconds") if self.started_at else None,
+            "region": {"id": region.id, "title": region.title, "path": region.path,
+                       "extent": [e.x(), e.y(), e.width(), e.height()]},
+            "radars": [{"id": s.id, "center": [s.center.x(), s.center.y()], "ring_radii": s.ring_radii,
+                        "range": s.coverage_range} for s in self.scene.radars.sites],
+            "alarms": self.alarms,
+        }
+
+    def save(self, path=None) -> str:
+        """Сохраняет запись (.npz); без path — в RECORDINGS_DIR по времени начала."""
+        if path is None:
+            stamp = (self.started_at or datetime.now()).strftime("%Y%m%d_%H%M%S")
+            path = os.path.join(RECORDINGS_DIR, f"session_{stamp}{RECORDING_EXT}")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        def cat(parts, dtype, shape=()):
+            return np.concatenate(parts) if parts else np.empty((0,) + shape, dtype=dtype)
+
+        zone_types, zone_sizes, zone_points, set_sizes = [], [], [], []
+        for zones in self.zone_sets:
+            set_sizes.append(len(zones))
+            for zone_type, pts in zones:
+                zone_types.append(0 if zone_type == "detect" else 1)
+                zone_sizes.append(len(pts))
+                zone_points.append(pts)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                meta=np.array(json.dumps(self._meta(), ensure_ascii=False)),
+                frame_t=np.array(self.frame_t, dtype=np.float64),
+                frame_offset=np.concatenate([[0], np.cumsum(self.frame_count)]).astype(np.int64),
+                frame_zones=np.array(self.frame_zones, dtype=np.int32),
+                frame_sweep=np.array(self.frame_sweep, dtype=np.float32),
+                uid=cat(self.uid, np.int32), xy=cat(self.xy, np.float32, (2,)),
+                vel=cat(self.vel, np.float32, (2,)), kind=cat(self.kind, np.int8),
+                state=cat(self.state, np.int8), label=cat(self.label, np.int8),
+                flags=cat(self.flags, np.int8),
+                zone_set_offset=np.concatenate([[0], np.cumsum(set_sizes)]).astype(np.int64),
+                zone_offset=np.concatenate([[0], np.cumsum(zone_sizes)]).astype(np.int64),
+                zone_type=np.array(zone_types, dtype=np.int8),
+                zone_points=cat(zone_points, np.float64, (2,)),
+            )
+        os.replace(tmp_path, path)
+        return path
+
+
+class SessionRecording:
+    """Загруженная запись: срезы кадров без копирования."""
+
+    def __init__(self, arrays: dict):
+        self.meta = json.loads(str(arrays["meta"]))
+        for key, value in arrays.items():
+            if key != "meta":
+                setattr(self, key, value)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls({key: data[key] for key in data.files})
+
+    def __len__(self):
+        return len(self.frame_t)
+
+    @property
+    def duration(self) -> float:
+        return float(self.frame_t[-1]) if len(self.frame_t) else 0.0
+
+    def frame_at(self, t: float) -> int:
+        """Последний кадр записи не позже момента t."""
+        return max(0, int(np.searchsorted(self.frame_t, t, side="right")) - 1)
+
+    def frame_slice(self, index) -> slice:
+        return slice(int(self.frame_offset[index]), int(self.frame_offset[index + 1]))
+
+    def zones(self, index):
+        """[(тип 0 — обнаружение / 1 — игнор, точки K x 2), ...] для кадра."""
+        s = int(self.frame_zones[index])
+        out = []
+        for z in range(int(self.zone_set_offset[s]), int(self.zone_set_offset[s + 1])):
+            out.append((int(self.zone_type[z]),
+                        self.zone_points[int(self.zone_offset[z]):int(self.zone_offset[z + 1])]))
+        return out
@@ -0,0 +1,74 @@
+"""
+Кэш настроек приложения в памяти. Строка settings читается из БД один раз,
+чтение идёт из памяти, изменения копятся и записываются одной транзакцией
+после паузы SETTINGS_DEBOUNCE_MS. Подписчики узнают об изменениях сразу.
+"""
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+SETTINGS_DEBOUNCE_MS = 500
+
+SETTINGS_DEFAULTS = {
+    "home_x": 0.0,
+    "home_y": 0.0,
+    "home_scale": 1.0,
+    "show_trajectory": 1,
+    "show_heading": 1,
+    "sound_volume": 0.5,
+}
+
+
+class SettingsCache(QObject):
+    changed = pyqtSignal(dict)  # только изменившиеся ключи
+
+    def __init__(self, db, debounce_ms=SETTINGS_DEBOUNCE_MS, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self._values = dict(SETTINGS_DEFAULTS)
+        try:
+            row = db.get_settings()
+            if row:
+                self._values.update({k: row[k] for k in row.keys() if k in SETTINGS_DEFAULTS})
+        except Exception as e:
+            print(f"[settings] Failed to load settings: {e}")
+        self._dirty = {}
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(debounce_ms)
+        self._timer.timeout.connect(self.flush)
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def get_settings(self) -> dict:
+        """Снимок настроек; совместим с DB.get_settings() по ключам."""
+        return dict(self._values)
+
+    def update(self, **changes):
+        diff = {k: v for k, v in changes.items()
+                if v is not None and k in SETTINGS_DEFAULTS and self._values.get(k) != v}
+        if not diff:
+            return
+        self._values.update(diff)
+        self._dirty.update(diff)
+        self._timer.start()
+        self.changed.emit(diff)
+
+    def subscribe(self, callback, keys=None):
+        """callback(diff) при изменении любого из keys (или любых ключей)."""
+        keys = set(keys) if keys else None
+
+        def _filter(diff):
+            if keys is None or keys & diff.keys():
+                callback(diff)
+        self.changed.connect(_filter)
+        return _filter
+
+    def flush(self):
+        self._timer.stop()
+        if not self._dirty:
+            return None
+        dirty, self._dirty = self._dirty, {}
+        return self.db.call_async("save_settings", **dirty)
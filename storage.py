@@ -0,0 +1,156 @@
+"""
+Хранилище скриншотов тревог: кодирование в фоне (JPEG/WebP/PNG, с
+уменьшением), миниатюры для интерфейса и очистка по возрасту, объёму и
+количеству файлов. При удалении файлов поле events.screenshot_path
+обнуляется, чтобы журнал не ссылался на несуществующие снимки.
+"""
+import os
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import Qt, QObject, QCoreApplication, pyqtSignal
+from PyQt5.QtGui import QImageWriter
+
+SCREENSHOTS_DIR = "screenshots"
+THUMBS_SUBDIR = "thumbs"
+
+# Кодирование: формат (jpg | webp | png), качество 0..100, коэффициент уменьшения
+SCREENSHOT_FORMAT = "jpg"
+SCREENSHOT_QUALITY = 80
+SCREENSHOT_DOWNSCALE = 1.0
+THUMB_WIDTH = 240
+
+# Хранение: возраст (дни), общий объём (МБ), количество файлов
+RETENTION_MAX_AGE_DAYS = 30
+RETENTION_MAX_TOTAL_MB = 500
+RETENTION_MAX_COUNT = 2000
+# Не чаще одной проверки хранения за интервал, сек
+PRUNE_INTERVAL = 60.0
+
+_IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".webp")
+
+
+def thumbnail_path_for(path: str) -> str:
+    """Путь к миниатюре скриншота (screenshots/thumbs/<имя>.jpg)."""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, THUMBS_SUBDIR, os.path.splitext(name)[0] + ".jpg")
+
+
+def _writable_format(fmt: str) -> str:
+    fmt = fmt.lower()
+    supported = {bytes(f).decode().lower() for f in QImageWriter.supportedImageFormats()}
+    if fmt in supported:
+        return fmt
+    print(f"[storage] Format {fmt} is not supported, using jpg")
+    return "jpg"
+
+
+class ScreenshotStorage(QObject):
+    saved = pyqtSignal(str)
+    thumbnailReady = pyqtSignal(str, str)  # screenshot, thumbnail
+    pruned = pyqtSignal(list)
+
+    def __init__(self, db=None, directory=SCREENSHOTS_DIR, fmt=SCREENSHOT_FORMAT,
+                 quality=SCREENSHOT_QUALITY, downscale=SCREENSHOT_DOWNSCALE,
+                 max_age_days=RETENTION_MAX_AGE_DAYS, max_total_mb=RETENTION_MAX_TOTAL_MB,
+                 max_count=RETENTION_MAX_COUNT, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.directory = directory
+        self.fmt = _writable_format(fmt)
+        self.quality = int(quality)
+        self.downscale = max(0.05, min(1.0, float(downscale)))
+        self.max_age_days = max_age_days
+        self.max_total_bytes = int(max_total_mb * 1024 * 1024) if max_total_mb else None
+        self.max_count = max_count
+        self._last_prune = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="screenshots")
+        # Сигнал из рабочего потока доставляется в GUI-поток (queued connection)
+        self.pruned.connect(self._on_pruned)
+
+    def save(self, pixmap, prefix="alarm") -> str:
+        """
+        Ставит снимок в очередь на кодирование и сразу возвращает путь,
+        под которым он появится. Захват (QPixmap -> QImage) — в GUI-потоке.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        path = os.path.join(self.directory, f"{prefix}_{stamp}.{self.fmt}")
+        self._executor.submit(self._encode, pixmap.toImage(), path)
+        self.maybe_prune()
+        return path
+
+    def _encode(self, img, path):
+        try:
+            if self.downscale < 1.0:
+                img = img.scaledToWidth(max(1, int(img.width() * self.downscale)), Qt.SmoothTransformation)
+            if not img.save(path, self.fmt, self.quality):
+                print(f"[storage] Failed to save {path}")
+                return
+            self.saved.emit(path)
+            thumb_path = thumbnail_path_for(path)
+            os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+            thumb = img.scaledToWidth(min(THUMB_WIDTH, img.width()), Qt.SmoothTransformation)
+            if thumb.save(thumb_path, "jpg", 70):
+                self.thumbnailReady.emit(path, thumb_path)
+        except Exception as e:
+            print(f"[storage] Failed to encode {path}: {e}")
+
+    def maybe_prune(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_prune < PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        self._executor.submit(self._prune)
+
+    def _prune(self):
+        try:
+            files = []
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.lower().endswith(_IMAGE_EXTS):
+                        st = entry.stat()
+                        files.append((st.st_mtime, st.st_size, entry.name))
+        except FileNotFoundError:
+            return
+        files.sort()
+        victims = []
+        if self.max_age_days:
+            cutoff = time.time() - self.max_age_days * 86400
+            while files and files[0][0] < cutoff:
+                victims.append(files.pop(0))
+        total = sum(f[1] for f in files)
+        while files and ((self.max_count and len(files) > self.max_count) or
+                         (self.max_total_bytes and total > self.max_total_bytes)):
+            victim = files.pop(0)
+            total -= victim[1]
+            victims.append(victim)
+        removed = []
+        for _, _, name in victims:
+            path = os.path.join(self.directory, name)
+            try:
+                os.remove(path)
+                removed.append(path)
+            except OSError:
+                continue
+            try:
+                os.remove(thumbnail_path_for(path))
+            except OSError:
+                pass
+        if removed:
+            self.pruned.emit(removed)
+
+    def _on_pruned(self, paths):
+        if self.db is None:
+            return
+        try:
+            self.db.submit("clear_screenshot_paths", paths)
+        except Exception as e:
+            print(f"[storage] Failed to update events: {e}")
+
+    def shutdown(self):
+        # Дожидаемся записи файлов, поставленных в очередь, и доставляем
+        # отложенный сигнал pruned, пока БД ещё открыта
+        self._executor.shutdown(wait=True)
+        QCoreApplication.sendPostedEvents(self)
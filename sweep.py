@@ -0,0 +1,162 @@
+"""
+Модель вращающегося луча РЛС (индикатор кругового обзора).
+
+Луч основной РЛС вращается с заданной скоростью (об/мин). За кадр он
+проходит сектор [прежний угол, новый угол); отметки (плоты) получают только
+объекты внутри этого сектора, и только у них обновляется положение на
+экране. Отметки гаснут за время SWEEP_PERSISTENCE_REVS оборотов.
+
+Объекты хранятся в индексе, отсортированном по азимуту, поэтому выборка
+сектора — двоичный поиск и k кандидатов, O(log n + k). Индекс строится
+раз за оборот: между перестроениями объекты смещаются по азимуту не больше
+чем на (макс. угловая скорость x время), и сектор запроса расширяется на
+этот запас; кандидаты затем проверяются по текущему положению.
+"""
+import math
+
+import numpy as np
+from PyQt5.QtCore import QRectF, QPointF, QLineF
+from PyQt5.QtGui import QColor, QPen, QPolygonF
+
+from pointcloud import PointCloudItem
+from lod import LAYER_SWEEP, view_shows
+
+SWEEP_DEFAULT_RPM = 12.0
+# Сколько оборотов гаснет отметка
+SWEEP_PERSISTENCE_REVS = 1.0
+# Запас сектора больше этого (градусы) — индекс перестраивается раньше срока
+SWEEP_INDEX_MAX_MARGIN = 20.0
+# Ёмкость кольцевого буфера отметок
+SWEEP_MAX_PLOTS = 4096
+
+
+def azimuths(xy, center: QPointF):
+    """Азимуты точек относительно центра, градусы [0, 360) в системе сцены."""
+    return np.degrees(np.arctan2(xy[:, 1] - center.y(), xy[:, 0] - center.x())) % 360.0
+
+
+class SectorIndex:
+    """Объекты, отсортированные по азимуту, с оценкой дрейфа с момента построения."""
+
+    def __init__(self):
+        self.az = np.empty(0)
+        self.items = []
+        self.omega_max = 0.0   # град/с
+        self.built_at = 0.0
+
+    def build(self, objects, center: QPointF, t: float):
+        self.built_at = t
+        if not objects:
+            self.az, self.items, self.omega_max = np.empty(0), [], 0.0
+            return
+        xy = np.array([(o.sim_pos.x(), o.sim_pos.y()) for o in objects], dtype=np.float64)
+        vel = np.array([(o.velocity.x(), o.velocity.y()) for o in objects], dtype=np.float64)
+        az = azimuths(xy, center)
+        order = np.argsort(az)
+        self.az = az[order]
+        self.items = [objects[i] for i in order]
+        # Угловая скорость: поперечная составляющая скорости / дальность
+        r = np.maximum(np.hypot(xy[:, 0] - center.x(), xy[:, 1] - center.y()), 1.0)
+        omega = np.degrees(np.hypot(vel[:, 0], vel[:, 1]) / r)
+        self.omega_max = float(omega.max())
+
+    def margin(self, t: float) -> float:
+        return self.omega_max * max(0.0, t - self.built_at)
+
+    def _range(self, a0, a1):
+        i = int(np.searchsorted(self.az, a0, side="left"))
+        j = int(np.searchsorted(self.az, a1, side="left"))
+        return self.items[i:j]
+
+    def candidates(self, start: float, width: float, t: float):
+        """Кандидаты в секторе [start, start + width) с учётом дрейфа; O(log n + k)."""
+        m = self.margin(t)
+        width = width + 2 * m
+        if width >= 360.0:
+            return list(self.items)
+        a0 = (start - m) % 360.0
+        a1 = a0 + width
+        if a1 <= 360.0:
+            return self._range(a0, a1)
+        return self._range(a0, 360.0) + self._range(0.0, a1 - 360.0)
+
+
+class SweepModel:
+    def __init__(self, rpm=SWEEP_DEFAULT_RPM, persistence_revs=SWEEP_PERSISTENCE_REVS):
+        self.rpm = float(rpm)
+        self.period = 60.0 / self.rpm
+        self.persistence = self.period * persistence_revs
+        self.angle = 0.0
+        self.time = 0.0
+        # Сектор, пройденный за последний шаг: (начало, ширина), градусы
+        self.last_sector = (0.0, 0.0)
+        self.index = SectorIndex()
+        self._index_generation = None
+
+    def step(self, dt, objects, center: QPointF, generation=None):
+        """
+        Поворачивает луч на dt и возвращает [(obj, x, y), ...] — объекты,
+        попавшие в пройденный сектор. generation — счётчик изменений набора
+        объектов и положения РЛС на сцене: при его смене индекс строится заново.
+        """
+        start = self.angle
+        width = min(360.0, 360.0 * dt / self.period)
+        self.time += dt
+        self.angle = (start + width) % 360.0
+        self.last_sector = (start, width)
+        if (generation is None or generation != self._index_generation or self.time - self.index.built_at >= self.period
+                or self.index.margin(self.time) > SWEEP_INDEX_MAX_MARGIN):
+            self.index.build(objects, center, self.time)
+            self._index_generation = generation
+        cands = [o for o in self.index.candidates(start, width, self.time) if o.scene() is not None]
+        if not cands:
+            return []
+        xy = np.array([(o.sim_pos.x(), o.sim_pos.y()) for o in cands], dtype=np.float64)
+        rel = (azimuths(xy, center) - start) % 360.0
+        hit = np.flatnonzero(rel < width)
+        return [(cands[i], xy[i, 0], xy[i, 1]) for i in hit.tolist()]
+
+
+class SweepLayer(PointCloudItem):
+    """Луч и затухающие отметки целей в одном элементе."""
+    layer = LAYER_SWEEP
+
+    def __init__(self, center: QPointF, radius: float, capacity=SWEEP_MAX_PLOTS):
+        self.center = QPointF(center)
+        self.radius = float(radius)
+        super().__init__(self._circle_rect(), capacity, QColor(120, 255, 140), size_px=5.0)
+        self.angle = 0.0
+        # Область, затронутая лучом за последний шаг
+        self.last_wedge = QRectF()
+        self._beam_pen = QPen(QColor(80, 255, 120, 200), 2)
+        self._beam_pen.setCosmetic(True)
+        self.setZValue(4)
+
+    def _circle_rect(self) -> QRectF:
+        r = self.radius + 50
+        return QRectF(self.center.x() - r, self.center.y() - r, 2 * r, 2 * r)
+
+    def set_geometry(self, center: QPointF, radius: float):
+        self.center = QPointF(center)
+        self.radius = float(radius)
+        self.set_rect(self._circle_rect())
+
+    def _beam_line(self, angle) -> QLineF:
+        a = math.radians(angle)
+        c = self.center
+        return QLineF(c, QPointF(c.x() + self.radius * math.cos(a), c.y() + self.radius * math.sin(a)))
+
+    def advance_beam(self, angle, now, persistence):
+        """Новый угол луча: каждый тик перерисовывается полоса между прежним и новым лучом."""
+        old = self._beam_line(self.angle)
+        self.angle = angle
+        new = self._beam_line(angle)
+        self.last_wedge = QPolygonF([old.p1(), old.p2(), new.p2()]).boundingRect().adjusted(-20, -20, 20, 20)
+        self.advance(now, persistence, self.last_wedge)
+
+    def paint(self, painter, option, widget=None):
+        if not view_shows(widget, self.layer):
+            return
+        super().paint(painter, option, widget)
+        painter.setPen(self._beam_pen)
+        painter.drawLine(self._beam_line(self.angle))
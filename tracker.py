@@ -0,0 +1,285 @@
+"""
+Сопровождение целей: из зашумлённых отметок (плотов) — треки.
+
+Фильтр Калмана с моделью постоянной скорости (состояние x, y, vx, vy)
+считается пакетно для всех треков сразу: прогноз, стробирование и
+обновление — операции NumPy над массивами T x 4 и T x 4 x 4.
+
+Привязка отметок: кандидаты в строб ищутся по сеточному индексу отметок
+(ячейка = размер строба, 9 соседних ячеек на трек), затем отбираются по
+расстоянию Махаланобиса; пары назначаются жадно по возрастанию расстояния.
+
+Жизненный цикл: неподтверждённый трек (tentative) становится
+подтверждённым после TRACK_CONFIRM_HITS отметок; без отметок трек
+экстраполируется (coasting) и удаляется через coast_sec секунд. При
+обзоре лучом отметки приходят раз за оборот (revisit_sec): пропуском
+считается только отсутствие отметки дольше этого интервала.
+"""
+import numpy as np
+from PyQt5.QtCore import Qt, QRectF
+from PyQt5.QtGui import QColor, QPen
+from PyQt5.QtWidgets import QGraphicsItem
+
+from pointcloud import polygon_from_xy
+from lod import LAYER_TRACKS, view_shows
+
+TRACK_TENTATIVE = 0
+TRACK_CONFIRMED = 1
+TRACK_COASTING = 2
+
+# СКО ошибки измерения координат отметки, м
+TRACK_PLOT_SIGMA = 15.0
+# Доля отметок помех, проходящих порог обнаружения к трекеру (на экране —
+# все отметки помех; трекер получает ложные отметки после порога)
+TRACK_CLUTTER_PASS = 0.02
+# Спектральная плотность шума ускорения модели, м/с^2
+TRACK_ACCEL_NOISE = 3.0
+# Начальная неопределённость скорости нового трека, м/с
+TRACK_INIT_VEL_SIGMA = 40.0
+# Строб: порог квадрата расстояния Махаланобиса (хи-квадрат, 2 ст. св., 99,9%)
+TRACK_GATE_CHI2 = 13.82
+# Отметки ближе этого порога к любому треку новых треков не завязывают
+# (иначе каждый пропуск строба порождает дубль трека)
+TRACK_INIT_EXCLUSION_CHI2 = 4 * TRACK_GATE_CHI2
+# Предельный радиус строба (и размер ячейки индекса отметок), м
+TRACK_GATE_DIST = 300.0
+# Отметок для подтверждения трека
+TRACK_CONFIRM_HITS = 3
+# Сколько секунд трек живёт без отметок
+TRACK_COAST_SEC = 3.0
+# Длина вектора скорости на экране, сек полёта
+TRACK_LEADER_SEC = 20.0
+
+
+class KalmanTracker:
+    def __init__(self, capacity=64, plot_sigma=TRACK_PLOT_SIGMA, accel_noise=TRACK_ACCEL_NOISE,
+                 coast_sec=TRACK_COAST_SEC, revisit_sec=0.0):
+        self.r = plot_sigma ** 2
+        self.q = accel_noise ** 2
+        self.coast_sec = float(coast_sec)
+        self.revisit_sec = float(revisit_sec)
+        self.time = 0.0
+        self._next_id = 1
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        self.x = np.zeros((capacity, 4))
+        self.P = np.zeros((capacity, 4, 4))
+        self.ids = np.zeros(capacity, dtype=np.int64)          # 0 — свободный слот
+        self.source = np.full(capacity, -1, dtype=np.int64)    # uid объекта-источника отметок (-1 — нет)
+        self.status = np.zeros(capacity, dtype=np.int8)
+        self.hits = np.zeros(capacity, dtype=np.int64)
+        self.born = np.zeros(capacity)
+        self.last_update = np.zeros(capacity)
+
+    def _grow(self, need):
+        n = len(self.ids)
+        cap = max(n * 2, n + need)
+        old = (self.x, self.P, self.ids, self.source, self.status, self.hits, self.born, self.last_update)
+        self._alloc(cap)
+        for dst, src in zip((self.x, self.P, self.ids, self.source, self.status, self.hits,
+                             self.born, self.last_update), old):
+            dst[:n] = src
+
+    @property
+    def active(self):
+        return np.flatnonzero(self.ids > 0)
+
+    def predict(self, dt):
+        idx = self.active
+        if dt <= 0 or len(idx) == 0:
+            return
+        F = np.eye(4)
+        F[0, 2] = F[1, 3] = dt
+        dt2, dt3, dt4 = dt * dt, dt ** 3, dt ** 4
+        Q = self.q * np.array([[dt4 / 4, 0, dt3 / 2, 0],
+                               [0, dt4 / 4, 0, dt3 / 2],
+                               [dt3 / 2, 0, dt2, 0],
+                               [0, dt3 / 2, 0, dt2]])
+        self.x[idx] = self.x[idx] @ F.T
+        self.P[idx] = F @ self.P[idx] @ F.T + Q
+
+    def _gate_pairs(self, idx, plots):
+        """Пары (номер в idx, номер отметки) из соседних ячеек сеточного индекса."""
+        cell = TRACK_GATE_DIST
+        m = 1 << 21
+        pk = np.floor(plots / cell).astype(np.int64)
+        pkey = pk[:, 0] * m + pk[:, 1]
+        order = np.argsort(pkey, kind="stable")
+        skey = pkey[order]
+        tk = np.floor(self.x[idx, :2] / cell).astype(np.int64)
+        rows, cols = [], []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                q = (tk[:, 0] + dx) * m + (tk[:, 1] + dy)
+                lo = np.searchsorted(skey, q, side="left")
+                hi = np.searchsorted(skey, q, side="right")
+                counts = hi - lo
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+                r = np.repeat(np.arange(len(idx)), counts)
+                offs = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                rows.append(r)
+                cols.append(order[np.repeat(lo, counts) + offs])
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(rows), np.concatenate(cols)
+
+    def step(self, dt, plots, plot_sources=None):
+        """
+        Шаг сопровождения: прогноз на dt, привязка отметок plots (N x 2),
+        обновление, завязка новых и удаление устаревших треков.
+        plot_sources — uid объектов-источников (для симуляции), иначе None.
+        Возвращает ключи (см. keys()) удалённых треков.
+        """
+        self.time += dt
+        self.predict(dt)
+        plots = np.asarray(plots, dtype=np.float64).reshape(-1, 2)
+        n = len(plots)
+        sources = np.full(n, -1, dtype=np.int64) if plot_sources is None else np.asarray(plot_sources)
+        idx = self.active
+        used = np.zeros(n, dtype=bool)
+        near = np.zeros(n, dtype=bool)
+
+        if len(idx) and n:
+            rows, cols = self._gate_pairs(idx, plots)
+            if len(rows):
+                # Расстояние Махаланобиса по ковариации невязки S = HPH' + R (2 x 2, обращаем явно)
+                P = self.P[idx[rows]]
+                s00, s01, s11 = P[:, 0, 0] + self.r, P[:, 0, 1], P[:, 1, 1] + self.r
+                det = s00 * s11 - s01 * s01
+                y = plots[cols] - self.x[idx[rows], :2]
+                d2 = (s11 * y[:, 0] ** 2 - 2 * s01 * y[:, 0] * y[:, 1] + s00 * y[:, 1] ** 2) / det
+                near[cols[d2 < TRACK_INIT_EXCLUSION_CHI2]] = True
+                ok = d2 < TRACK_GATE_CHI2
+                rows, cols, d2 = rows[ok], cols[ok], d2[ok]
+                # Жадное назначение: ближайшие пары первыми
+                track_used = np.zeros(len(idx), dtype=bool)
+                match_t, match_p = [], []
+                for k in np.argsort(d2).tolist():
+                    t, p = rows[k], cols[k]
+                    if not track_used[t] and not used[p]:
+                        track_used[t] = used[p] = True
+                        match_t.append(t)
+                        match_p.append(p)
+                if match_t:
+                    self._update(idx[np.array(match_t)], plots[np.array(match_p)], sources[np.array(match_p)])
+
+        # Завязка треков по непривязанным отметкам вдали от существующих треков
+        free = np.flatnonzero(~used & ~near)
+        if len(free):
+            self._initiate(plots[free], sources[free])
+
+        # Удаление: без отметок дольше coast_sec (неподтверждённые — вдвое раньше,
+        # но не раньше следующего ожидаемого обзора)
+        idx = self.active
+        silent = self.time - self.last_update[idx]
+        missed = silent > self.revisit_sec * 1.2 + 1e-9
+        self.status[idx[missed & (self.status[idx] == TRACK_CONFIRMED)]] = TRACK_COASTING
+        tentative_sec = max(self.coast_sec / 2, self.revisit_sec * 1.5)
+        dead = idx[(silent > self.coast_sec) |
+                   ((self.status[idx] == TRACK_TENTATIVE) & (silent > tentative_sec))]
+        removed = self.keys(dead)
+        self.ids[dead] = 0
+        return removed
+
+    def _update(self, slots, z, sources):
+        P = self.P[slots]
+        x = self.x[slots]
+        S = P[:, :2, :2] + self.r * np.eye(2)
+        K = P[:, :, :2] @ np.linalg.inv(S)            # T x 4 x 2
+        y = z - x[:, :2]
+        self.x[slots] = x + np.einsum("tij,tj->ti", K, y)
+        self.P[slots] = P - K @ P[:, :2, :]
+        self.hits[slots] += 1
+        self.last_update[slots] = self.time
+        self.source[slots] = sources
+        confirmed = self.hits[slots] >= TRACK_CONFIRM_HITS
+        self.status[slots] = np.where(confirmed, TRACK_CONFIRMED, TRACK_TENTATIVE)
+
+    def _initiate(self, z, sources):
+        k = len(z)
+        free = np.flatnonzero(self.ids == 0)
+        if len(free) < k:
+            self._grow(k - len(free))
+            free = np.flatnonzero(self.ids == 0)
+        slots = free[:k]
+        self.ids[slots] = np.arange(self._next_id, self._next_id + k)
+        self._next_id += k
+        self.x[slots] = 0.0
+        self.x[slots, :2] = z
+        self.P[slots] = np.diag([self.r, self.r, TRACK_INIT_VEL_SIGMA ** 2, TRACK_INIT_VEL_SIGMA ** 2])
+        self.source[slots] = sources
+        self.status[slots] = TRACK_TENTATIVE
+        self.hits[slots] = 1
+        self.born[slots] = self.time
+        self.last_update[slots] = self.time
+
+    def tracks(self, confirmed_only=True):
+        """Срез активных треков: (слоты, id, x N x 4, статус, uid источника)."""
+        idx = self.active
+        if confirmed_only:
+            idx = idx[self.status[idx] != TRACK_TENTATIVE]
+        return idx, self.ids[idx], self.x[idx], self.status[idx], self.source[idx]
+
+    def keys(self, slots):
+        """Ключи треков для кэша признаков: uid источника, если он известен, иначе -id."""
+        return np.where(self.source[slots] >= 0, self.source[slots], -self.ids[slots])
+
+
+class TrackLayer(QGraphicsItem):
+    """Символы треков и векторы скорости одним элементом (косметические перья)."""
+
+    def __init__(self, rect: QRectF):
+        super().__init__()
+        self._rect = QRectF(rect)
+        self.xy = np.empty((0, 2))
+        self.lead = np.empty((0, 2))
+        self.coasting = np.empty(0, dtype=bool)
+        self._dirty = QRectF()
+        self._pen = QPen(QColor(255, 220, 0), 8, Qt.SolidLine, Qt.SquareCap)
+        self._coast_pen = QPen(QColor(255, 140, 0, 160), 8, Qt.SolidLine, Qt.SquareCap)
+        self._lead_pen = QPen(QColor(255, 220, 0, 180), 1)
+        for pen in (self._pen, self._coast_pen, self._lead_pen):
+            pen.setCosmetic(True)
+        self.setZValue(7)
+        self.setAcceptedMouseButtons(Qt.NoButton)
+
+    def set_rect(self, rect: QRectF):
+        self.prepareGeometryChange()
+        self._rect = QRectF(rect)
+
+    def _bounds(self) -> QRectF:
+        if len(self.xy) == 0:
+            return QRectF()
+        pts = np.concatenate([self.xy, self.lead])
+        x0, y0 = pts.min(axis=0)
+        x1, y1 = pts.max(axis=0)
+        return QRectF(x0, y0, x1 - x0, y1 - y0)
+
+    def set_tracks(self, x, status):
+        old = self._bounds()
+        self.xy = x[:, :2].copy()
+        self.lead = self.xy + x[:, 2:] * TRACK_LEADER_SEC
+        self.coasting = status == TRACK_COASTING
+        # Перерисовываем только область старых и новых треков (с запасом на символ)
+        dirty = old.united(self._bounds())
+        if not dirty.isNull():
+            pad = 250.0  # символ 8 px даже на обзорных масштабах
+            self.update(dirty.adjusted(-pad, -pad, pad, pad))
+
+    def boundingRect(self) -> QRectF:
+        return self._rect
+
+    def paint(self, painter, option, widget=None):
+        if len(self.xy) == 0 or not view_shows(widget, LAYER_TRACKS):
+            return
+        painter.setPen(self._lead_pen)
+        pairs = np.empty((2 * len(self.xy), 2))
+        pairs[0::2], pairs[1::2] = self.xy, self.lead
+        painter.drawLines(polygon_from_xy(pairs))
+        for pen, mask in ((self._pen, ~self.coasting), (self._coast_pen, self.coasting)):
+            if mask.any():
+                painter.setPen(pen)
+                painter.drawPoints(polygon_from_xy(self.xy[mask]))
@@ -0,0 +1,473 @@
+"""
+Офлайн-экспорт записанного сеанса (recording.py) в видео.
+
+Кадры рисуются вне экрана (QImage + QPainter) в пуле процессов: каждый
+процесс один раз загружает запись и карту, уменьшенную до выходного
+размера, затем рисует пачки кадров и возвращает их в JPEG. Координатор
+собирает пачки строго по порядку (не больше EXPORT_QUEUE_CHUNKS пачек в
+работе) и пишет их в MJPEG/AVI собственным писателем RIFF или в
+последовательность JPEG-файлов — без внешних кодеров и сервисов.
+
+Отмена: ещё не начатые пачки снимаются, недописанный файл удаляется.
+
+    python video_export.py recordings/session_20260101_120000.npz out.avi --size 1280x720 --fps 25
+"""
+import os
+import sys
+import struct
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+import numpy as np
+from PyQt5.QtCore import Qt, QObject, QPointF, QRectF, QBuffer, QIODevice, pyqtSignal
+from PyQt5.QtGui import QImage, QPainter, QColor, QPen, QBrush, QFont, QPolygonF
+
+from recording import SessionRecording, KINDS, STATES, LABELS, FLAG_DETECTED, FLAG_ECM
+
+EXPORT_DEFAULT_SIZE = (1280, 720)
+EXPORT_DEFAULT_FPS = 25
+EXPORT_JPEG_QUALITY = 85
+# Кадров в одной задаче пула (меньше обмена между процессами)
+EXPORT_CHUNK_FRAMES = 8
+# Пачек в работе на процесс: ограничивает память под готовые, но не записанные кадры
+EXPORT_QUEUE_CHUNKS = 2
+# Длина хвоста траектории, с модельного времени
+EXPORT_TRAIL_SEC = 20.0
+# Сколько секунд после срабатывания тревога видна на кадре
+EXPORT_ALARM_SHOW_SEC = 4.0
+
+FORMAT_AVI = "avi"
+FORMAT_JPEG_SEQUENCE = "jpg"
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+# ---------------------------------------------------------------- запись AVI
+
+class AviMjpegWriter:
+    """
+    Минимальный AVI (RIFF) с одним потоком MJPEG и индексом idx1.
+    Размеры в заголовках дописываются при закрытии.
+    """
+
+    def __init__(self, path, width, height, fps):
+        self.path = path
+        self.width, self.height = int(width), int(height)
+        # Дробная частота: dwRate / dwScale
+        self.rate, self.scale = int(round(fps * 1000)), 1000
+        self.frames = 0
+        self.max_size = 0
+        self._index = []
+        self._f = open(path, "wb")
+        self._write_headers()
+
+    def _write_headers(self):
+        f, w, h = self._f, self.width, self.height
+        usec = int(round(1e6 * self.scale / self.rate))
+        avih = struct.pack("<14I", usec, 0, 0, 0x10, 0, 0, 1, 0, w, h, 0, 0, 0, 0)
+        strh = (b"vids" + b"MJPG" + struct.pack("<IHHIIIIIIiI", 0, 0, 0, 0, self.scale, self.rate, 0, 0, 0, -1, 0)
+                + struct.pack("<4h", 0, 0, w, h))
+        strf = struct.pack("<IiiHH4sIiiII", 40, w, h, 1, 24, b"MJPG", w * h * 3, 0, 0, 0, 0)
+        strl = (b"strh" + struct.pack("<I", len(strh)) + strh
+                + b"strf" + struct.pack("<I", len(strf)) + strf)
+        strl_list = b"LIST" + struct.pack("<I", 4 + len(strl)) + b"strl" + strl
+        hdrl = b"avih" + struct.pack("<I", len(avih)) + avih + strl_list
+        f.write(b"RIFF" + struct.pack("<I", 0) + b"AVI ")
+        self._hdrl_pos = f.tell()
+        f.write(b"LIST" + struct.pack("<I", 4 + len(hdrl)) + b"hdrl" + hdrl)
+        # Смещения полей, которые дописываются в close()
+        avih_data = self._hdrl_pos + 12 + 8
+        self._total_frames_pos = avih_data + 16
+        self._avih_bufsize_pos = avih_data + 28
+        strh_data = avih_data + len(avih) + 12 + 8
+        self._strh_length_pos = strh_data + 32
+        self._strh_bufsize_pos = strh_data + 36
+        self._movi_pos = f.tell()
+        f.write(b"LIST" + struct.pack("<I", 0) + b"movi")
+
+    def write(self, jpeg: bytes):
+        f = self._f
+        # Смещение в idx1 — от слова 'movi'
+        self._index.append((f.tell() - (self._movi_pos + 8), len(jpeg)))
+        f.write(b"00dc" + struct.pack("<I", len(jpeg)))
+        f.write(jpeg)
+        if len(jpeg) % 2:
+            f.write(b"\0")
+        self.frames += 1
+        self.max_size = max(self.max_size, len(jpeg))
+
+    def close(self):
+        f = self._f
+        if f.closed:
+            return
+        movi_end = f.tell()
+        idx = b"".join(b"00dc" + struct.pack("<III", 0x10, off, size) for off, size in self._index)
+        f.write(b"idx1" + struct.pack("<I", len(idx)) + idx)
+        end = f.tell()
+        for pos, value in ((4, end - 8), (self._movi_pos + 4, movi_end - self._movi_pos - 8),
+                           (self._total_frames_pos, self.frames), (self._avih_bufsize_pos, self.max_size),
+                           (self._strh_length_pos, self.frames), (self._strh_bufsize_pos, self.max_size)):
+            f.seek(pos)
+            f.write(struct.pack("<I", value))
+        f.close()
+
+    def abort(self):
+        self._f.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class JpegSequenceWriter:
+    """Кадры отдельными файлами frame_000000.jpg в каталоге."""
+
+    def __init__(self, path):
+        self.path = path
+        self.frames = 0
+        self._created = []
+        # Каталог выбирает пользователь: при отмене удаляется только то, что создано здесь
+        self._created_dir = not os.path.isdir(path)
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, jpeg: bytes):
+        name = os.path.join(self.path, f"frame_{self.frames:06d}.jpg")
+        self._created.append(name)
+        with open(name, "wb") as f:
+            f.write(jpeg)
+        self.frames += 1
+
+    def close(self):
+        pass
+
+    def abort(self):
+        for name in self._created:
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+        self._created = []
+        if self._created_dir:
+            try:
+                os.rmdir(self.path)
+            except OSError:
+                pass
+
+
+# ---------------------------------------------------------------- отрисовка (в процессе пула)
+
+_KIND_COLORS = {"bvs": QColor(0, 200, 255), "bird": QColor(255, 220, 0)}
+_STATE_COLORS = {"suppressed": QColor(150, 150, 150), "landed": QColor(0, 200, 120)}
+_LABEL_TEXT = {"bvs": "БВС", "bird": "птица"}
+
+_worker = None
+_worker_app = None
+
+
+class FrameRenderer:
+    def __init__(self, recording_path, width, height, view_rect=None, trail_sec=EXPORT_TRAIL_SEC,
+                 quality=EXPORT_JPEG_QUALITY):
+        self.rec = SessionRecording.load(recording_path)
+        self.width, self.height = int(width), int(height)
+        self.quality = int(quality)
+        region = self.rec.meta["region"]
+        rect = QRectF(*(view_rect or region["extent"]))
+        # Вписываем область сцены в кадр с сохранением пропорций
+        self.k = min(self.width / rect.width(), self.height / rect.height())
+        self.ox = (self.width - rect.width() * self.k) / 2 - rect.x() * self.k
+        self.oy = (self.height - rect.height() * self.k) / 2 - rect.y() * self.k
+        self.trail_frames = max(1, int(trail_sec * self.rec.meta["fps"]))
+        self.background = self._render_background(region)
+
+    def _to_px(self, xy):
+        return np.asarray(xy, dtype=np.float64) * self.k + (self.ox, self.oy)
+
+    def _render_background(self, region) -> QImage:
+        from maps import _decode_map
+        from maptiles import TiledMap
+
+        img = QImage(self.width, self.height, QImage.Format_RGB32)
+        img.fill(QColor(12, 26, 32))
+        data = None
+        try:
+            data = _decode_map(region["path"])
+        except Exception as e:
+            print(f"[video] Failed to decode map {region['path']}: {e}")
+        p = QPainter(img)
+        p.setRenderHint(QPainter.SmoothPixmapTransform)
+        x, y, w, h = region["extent"]
+        if data is not None:
+            # Карта растянута на extent региона (как в MapCache.create_item)
+            p.translate(self.ox + x * self.k, self.oy + y * self.k)
+            p.scale(w * self.k / data.width(), h * self.k / data.height())
+            if isinstance(data, TiledMap):
+                ts = data.tile_size
+                for tx, ty in data.tiles_in_rect(QRectF(0, 0, data.width(), data.height())):
+                    p.drawImage(QPointF(tx * ts, ty * ts), data.tile_image(tx, ty))
+            else:
+                p.drawImage(QPointF(0, 0), data)
+            p.resetTransform()
+        # Кольца РЛС — статичны, рисуются один раз
+        p.setRenderHint(QPainter.Antialiasing)
+        p.setBrush(Qt.NoBrush)
+        for radar in self.rec.meta["radars"]:
+            cx, cy = self._to_px(radar["center"])
+            p.setPen(QPen(QColor(0, 180, 240, 120), 1))
+            for r in radar["ring_radii"]:
+                p.drawEllipse(QPointF(cx, cy), r * self.k, r * self.k)
+            p.setPen(QPen(QColor(50, 90, 110, 180), 1, Qt.DashDotLine))
+            rr = radar["range"] * self.k
+            p.drawLine(QPointF(cx - rr, cy), QPointF(cx + rr, cy))
+            p.drawLine(QPointF(cx, cy - rr), QPointF(cx, cy + rr))
+        p.end()
+        if isinstance(data, TiledMap):
+            data.close()
+        return img
+
+    def render(self, t: float) -> bytes:
+        rec = self.rec
+        i = rec.frame_at(t)
+        img = self.background.copy()
+        p = QPainter(img)
+        p.setRenderHint(QPainter.Antialiasing)
+        self._draw_zones(p, i)
+        self._draw_sweep(p, i)
+        self._draw_trails(p, i)
+        self._draw_targets(p, i)
+        self._draw_hud(p, i)
+        p.end()
+        buf = QBuffer()
+        buf.open(QIODevice.WriteOnly)
+        img.save(buf, "JPG", self.quality)
+        return bytes(buf.data())
+
+    def _draw_zones(self, p, i):
+        for zone_type, pts in self.rec.zones(i):
+            poly = QPolygonF([QPointF(x, y) for x, y in self._to_px(pts)])
+            if zone_type == 0:
+                p.setPen(QPen(QColor(0, 180, 0, 160), 2, Qt.DashLine))
+                p.setBrush(QBrush(QColor(0, 255, 0, 40)))
+            else:
+                p.setPen(QPen(QColor(180, 0, 0, 160), 2, Qt.DashLine))
+                p.setBrush(QBrush(QColor(255, 0, 0, 40)))
+            p.drawPolygon(poly)
+
+    def _draw_sweep(self, p, i):
+        angle = float(self.rec.frame_sweep[i])
+        if np.isnan(angle) or not self.rec.meta["radars"]:
+            return
+        radar = self.rec.meta["radars"][0]
+        cx, cy = radar["center"]
+        a = np.radians(angle)
+        c = self._to_px([cx, cy])
+        e = self._to_px([cx + radar["range"] * np.cos(a), cy + radar["range"] * np.sin(a)])
+        p.setPen(QPen(QColor(80, 255, 120, 200), 2))
+        p.drawLine(QPointF(*c), QPointF(*e))
+
+    def _draw_trails(self, p, i):
+        rec = self.rec
+        lo = int(rec.frame_offset[max(0, i - self.trail_frames)])
+        hi = int(rec.frame_offset[i + 1])
+        if hi - lo < 2:
+            return
+        uid = rec.uid[lo:hi]
+        # Устойчивая сортировка сохраняет порядок по времени внутри цели
+        order = np.argsort(uid, kind="stable")
+        xy = self._to_px(rec.xy[lo:hi][order])
+        bounds = np.flatnonzero(np.diff(uid[order])) + 1
+        p.setPen(QPen(QColor(255, 255, 0, 150), 1))
+        p.setBrush(Qt.NoBrush)
+        for part in np.split(xy, bounds):
+            if len(part) > 1:
+                p.drawPolyline(QPolygonF([QPointF(x, y) for x, y in part]))
+
+    def _draw_targets(self, p, i):
+        rec = self.rec
+        s = rec.frame_slice(i)
+        if s.stop == s.start:
+            return
+        xy = self._to_px(rec.xy[s])
+        kind, state, label, flags = rec.kind[s], rec.state[s], rec.label[s], rec.flags[s]
+        r = 5.0
+        p.setFont(QFont("Sans", 8))
+        for k in range(len(xy)):
+            x, y = float(xy[k, 0]), float(xy[k, 1])
+            p.setOpacity(1.0 if flags[k] & FLAG_DETECTED else 0.25)
+            if flags[k] & FLAG_ECM:
+                p.setPen(QPen(QColor(0, 120, 255, 200), 2))
+                p.setBrush(QBrush(QColor(0, 120, 255, 30)))
+                p.drawEllipse(QPointF(x, y), 3 * r, 3 * r)
+            st = STATES[state[k]] if state[k] >= 0 else "normal"
+            color = _STATE_COLORS.get(st) or _KIND_COLORS.get(KINDS[kind[k]] if kind[k] >= 0 else "", QColor(0, 200, 255))
+            p.setPen(QPen(color.darker(150), 1))
+            p.setBrush(QBrush(color))
+            p.drawEllipse(QPointF(x, y), r, r)
+            if label[k] >= 0:
+                p.setPen(QColor(255, 255, 255))
+                p.drawText(QPointF(x + r + 2, y - r), _LABEL_TEXT[LABELS[label[k]]])
+        p.setOpacity(1.0)
+
+    def _draw_hud(self, p, i):
+        rec = self.rec
+        t = float(rec.frame_t[i])
+        s = rec.frame_slice(i)
+        lines = [f"{int(t // 60):02d}:{t % 60:04.1f}   целей: {s.stop - s.start}"]
+        for at, message in rec.meta["alarms"]:
+            if at <= t < at + EXPORT_ALARM_SHOW_SEC:
+                lines.append(f"⚠ {message}")
+        p.setFont(QFont("Sans", 11))
+        fm = p.fontMetrics()
+        h = fm.height() + 4
+        p.setPen(Qt.NoPen)
+        p.setBrush(QBrush(QColor(0, 0, 0, 150)))
+        p.drawRect(QRectF(8, 8, max(fm.width(line) for line in lines) + 16, h * len(lines) + 8))
+        for n, line in enumerate(lines):
+            p.setPen(QColor(255, 255, 255) if n == 0 else QColor(255, 110, 90))
+            p.drawText(QPointF(16, 12 + h * n + fm.ascent()), line)
+
+
+def _init_worker(recording_path, width, height, view_rect, trail_sec, quality):
+    global _worker, _worker_app
+    # Рисование текста требует QGuiApplication; окна не нужны
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtGui import QGuiApplication
+    if QGuiApplication.instance() is None:
+        _worker_app = QGuiApplication([])
+    _worker = FrameRenderer(recording_path, width, height, view_rect, trail_sec, quality)
+
+
+def _render_chunk(times):
+    return [_worker.render(t) for t in times]
+
+
+# ---------------------------------------------------------------- координатор
+
+def export_video(recording_path, output, size=EXPORT_DEFAULT_SIZE, fps=EXPORT_DEFAULT_FPS, speed=1.0,
+                 fmt=None, workers=None, view_rect=None, trail_sec=EXPORT_TRAIL_SEC,
+                 quality=EXPORT_JPEG_QUALITY, progress=None, cancel_event=None) -> int:
+    """
+    Рендерит запись в output и возвращает число кадров.
+    Кадр k соответствует моменту записи k * speed / fps.
+    progress(done, total) вызывается из потока координатора; cancel_event
+    (threading.Event) прерывает экспорт с ExportCancelled.
+    """
+    rec = SessionRecording.load(recording_path)
+    width, height = (int(v) for v in size)
+    fmt = fmt or (FORMAT_AVI if output.lower().endswith(".avi") else FORMAT_JPEG_SEQUENCE)
+    total = int(rec.duration * fps / speed) + 1
+    times = [k * speed / fps for k in range(total)]
+    chunks = [times[i:i + EXPORT_CHUNK_FRAMES] for i in range(0, total, EXPORT_CHUNK_FRAMES)]
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    del rec
+
+    writer = AviMjpegWriter(output, width, height, fps) if fmt == FORMAT_AVI else JpegSequenceWriter(output)
+    # spawn: дочерние процессы не наследуют состояние Qt родителя
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker,
+                               initargs=(recording_path, width, height, view_rect, trail_sec, quality))
+    pending = []
+    done = 0
+    try:
+        next_chunk = 0
+        while next_chunk < len(chunks) or pending:
+            while next_chunk < len(chunks) and len(pending) < workers * EXPORT_QUEUE_CHUNKS:
+                pending.append(pool.submit(_render_chunk, chunks[next_chunk]))
+                next_chunk += 1
+            # Пачки пишутся строго по порядку
+            future = pending.pop(0)
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ExportCancelled()
+                try:
+                    frames = future.result(timeout=0.2)
+                    break
+                except TimeoutError:
+                    continue
+            for jpeg in frames:
+                writer.write(jpeg)
+            done += len(frames)
+            if progress is not None:
+                progress(done, total)
+        writer.close()
+        print(f"[video] Exported {done} frames to {output}")
+        return done
+    except BaseException:
+        for f in pending:
+            f.cancel()
+        writer.abort()
+        raise
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+class VideoExporter(QObject):
+    """Экспорт в фоновом потоке; сигналы доставляются в поток владельца."""
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(str)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, recording_path, output, parent=None, **options):
+        super().__init__(parent)
+        self.recording_path = recording_path
+        self.output = output
+        self.options = options
+        self._cancel = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._cancel.clear()
+        self._thread = threading.Thread(target=self._run, name="video-export", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            export_video(self.recording_path, self.output, progress=self.progress.emit,
+                         cancel_event=self._cancel, **self.options)
+        except ExportCancelled:
+            print(f"[video] Export of {self.recording_path} cancelled")
+            self.cancelled.emit()
+        except Exception as e:
+            print(f"[video] Export failed: {e}")
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(self.output)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Экспорт записи сеанса в видео (MJPEG/AVI или JPEG-кадры)")
+    parser.add_argument("recording")
+    parser.add_argument("output", help="файл .avi или каталог для кадров")
+    parser.add_argument("--size", default="%dx%d" % EXPORT_DEFAULT_SIZE)
+    parser.add_argument("--fps", type=float, default=EXPORT_DEFAULT_FPS)
+    parser.add_argument("--speed", type=float, default=1.0, help="ускорение относительно модельного времени")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+    w, h = (int(v) for v in args.size.lower().split("x"))
+
+    def report(done, total):
+        print(f"\r[video] {done}/{total}", end="", flush=True)
+
+    export_video(args.recording, args.output, (w, h), args.fps, args.speed, workers=args.workers,
+                 progress=report)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,31 @@
+import os
 import math
 from datetime import datetime, timedelta
 import time
-from PyQt5.QtCore import QTimer, pyqtSignal, QObject
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QObject, QDateTime, QUrl
 from PyQt5.QtGui import QTransform
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QFormLayout, QGroupBox,
-    QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox, QDialog, QLineEdit, QDialogButtonBox, QComboBox, QDoubleSpinBox, QCheckBox
+    QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox, QDialog, QLineEdit, QDialogButtonBox, QComboBox, QDoubleSpinBox, QCheckBox,
+    QDateTimeEdit
 )
-from db import DB
+from db import DB, EVENTS_SEARCH_COUNT_LIMIT
+from storage import thumbnail_path_for
+from widgets import NOTIFICATION_TYPES
 from dialogs import TrainingSettings
 from graphics import MapScene, MapView
+from recording import SessionRecorder
+from lod import (LAYER_TARGETS, LAYER_TRAJECTORIES, LAYER_HEADINGS, LAYER_ZONES, LAYER_SWEEP,
+                 LAYER_CLUTTER, LAYER_TRACKS)
+
+# Набор зон карты без имени сценария
+ZONE_SET_DEFAULT_TITLE = "по умолчанию"
+# Строк на странице результатов поиска (панель разбора)
+DEBRIEF_PAGE_SIZE = 50
+# Период поиска по умолчанию, дни
+DEBRIEF_DEFAULT_DAYS = 7
+# Статистика перерисовки карты в конце сеанса (отладка): RLS_TRAINER_DEBUG=1
+DEBUG_REPAINT_STATS = bool(os.environ.get("RLS_TRAINER_DEBUG"))
 def minutes_to_seconds(minutes: float) -> int:
     return int(math.ceil(minutes * 60))
 
@@ -103,24 +119,53 @@ class TrainingView(QWidget):
         self.parent_main = parent_main
         self.scene = MapScene(db, max_objects_limit=12)
         self.map_view = MapView(self.scene)
+        # Запись сеанса для разбора и экспорта в видео
+        self.recorder = SessionRecorder(self.scene)
+        self.last_recording = None
         self.map_view.targetIdentified.connect(self.on_identified)
+        self.map_view.objectIdentified.connect(self.on_object_identified)
 
         left = QVBoxLayout()
         btn_draw_detect = QPushButton("Добавить зону обнаружения")
         btn_draw_ignore = QPushButton("Добавить зону игнора")
         btn_cancel_draw = QPushButton("Отменить рисование зоны")
         btn_settings = QPushButton("Настройки тренировки")
+        btn_monitor = QPushButton("Монитор инструктора")
+        self.cmb_map = QComboBox()
+        for region in self.scene.catalog.regions():
+            self.cmb_map.addItem(region.title, region.id)
+        if self.scene.region is not None:
+            self.cmb_map.setCurrentIndex(max(0, self.cmb_map.findData(self.scene.region.id)))
         left.addWidget(btn_settings)
         left.addSpacing(12)
+        left.addWidget(QLabel("Карта:"))
+        left.addWidget(self.cmb_map)
+        # Набор зон: по умолчанию для карты или именованный сценарий (можно ввести новый)
+        self.cmb_zone_set = QComboBox()
+        self.cmb_zone_set.setEditable(True)
+        self.cmb_zone_set.setInsertPolicy(QComboBox.NoInsert)
+        self.cmb_zone_set.addItem(ZONE_SET_DEFAULT_TITLE)
+        left.addWidget(QLabel("Набор зон:"))
+        left.addWidget(self.cmb_zone_set)
+        left.addSpacing(12)
         left.addWidget(btn_draw_detect)
         left.addWidget(btn_draw_ignore)
         left.addWidget(btn_cancel_draw)
+        left.addSpacing(12)
+        left.addWidget(btn_monitor)
         left.addStretch()
 
         btn_draw_detect.clicked.connect(lambda: self.scene.start_draw_zone("detect"))
         btn_draw_ignore.clicked.connect(lambda: self.scene.start_draw_zone("ignore"))
         btn_cancel_draw.clicked.connect(self.scene.cancel_temp_zone)
         btn_settings.clicked.connect(self.open_settings)
+        btn_monitor.clicked.connect(self.open_monitor)
+        self.monitor = None
+        self.cmb_map.currentIndexChanged.connect(self.on_map_selected)
+        self.cmb_zone_set.activated[str].connect(self.on_zone_set_selected)
+        self.cmb_zone_set.lineEdit().returnPressed.connect(
+            lambda: self.on_zone_set_selected(self.cmb_zone_set.currentText()))
+        self._refresh_zone_sets()
 
         top = QHBoxLayout()
         self.btn_pause = QPushButton("Пауза")
@@ -138,7 +183,7 @@ class TrainingView(QWidget):
 
         self.btn_pause.clicked.connect(self.toggle_pause)
         self.btn_compass.clicked.connect(self.map_view.north_up)
-        self.btn_home.clicked.connect(lambda: self.map_view.reset_to_home(self.db))
+        self.btn_home.clicked.connect(lambda: self.map_view.reset_to_home(self.parent_main.settings))
 
         center_layout = QVBoxLayout()
         center_layout.addLayout(top)
@@ -155,11 +200,14 @@ class TrainingView(QWidget):
         root.addLayout(center_layout)
         self.setLayout(root)
 
+        # Часы: грубый таймер (ОС может объединять пробуждения), только пока вид на экране
         self.clock_timer = QTimer(self)
+        self.clock_timer.setTimerType(Qt.VeryCoarseTimer)
         self.clock_timer.timeout.connect(self.update_clock)
         self.clock_timer.start(1000)
 
         self.sim_timer = QTimer(self)
+        self.sim_timer.setTimerType(Qt.PreciseTimer)
         self.sim_timer.timeout.connect(self.on_tick)
 
         self.spawn_timer = QTimer(self)
@@ -170,10 +218,15 @@ class TrainingView(QWidget):
         self.session_started_at = None
         self.correct = 0
         self.wrong = 0
+        # Опознавания за сеанс; пишутся в БД одной пачкой по окончании
+        self.identifications = []
         self.session_settings = {
             "time_limit": 120,
             "max_objects": 12,
             "bvs_ratio": 0.5,
+            "sweep_rpm": 0,
+            "clutter": False,
+            "tracking": False,
             "show_traj": True,
             "show_heading": True
         }
@@ -186,20 +239,47 @@ class TrainingView(QWidget):
         except Exception:
             pass
 
-        self.map_view.reset_to_home(self.db)
+        self.map_view.reset_to_home(self.parent_main.settings)
+        # До начала сеанса вид перерисовывается только по действиям пользователя
+        self.scene.set_render_active(False)
+        # Флаги отображения меняются и из окна настроек — применяем сразу
+        self.parent_main.settings.subscribe(self._on_display_settings_changed,
+                                            ("show_trajectory", "show_heading"))
+
+    def _on_display_settings_changed(self, diff):
+        s = self.parent_main.settings
+        self.session_settings["show_traj"] = bool(s["show_trajectory"])
+        self.session_settings["show_heading"] = bool(s["show_heading"])
+        self.scene.set_show_flags(self.session_settings["show_traj"], self.session_settings["show_heading"])
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_clock()
+        self.clock_timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.clock_timer.stop()
 
     def update_clock(self):
         now = datetime.now().strftime("%H:%M:%S")
         self.lbl_time.setText(now)
 
+    def open_monitor(self):
+        """Второй экран того же сеанса: модель общая, вид — свой."""
+        if self.monitor is None:
+            self.monitor = MonitorWindow(self.scene, self.parent_main.settings)
+        self.monitor.show()
+        self.monitor.raise_()
+
     def open_settings(self):
-        dlg = TrainingSettings(self.db, self, max_objects_limit=100)
+        dlg = TrainingSettings(self.db, self, max_objects_limit=100, settings=self.parent_main.settings)
         s = dlg.get()
         if s:
             self.session_settings.update(s)
-            # сохраняем глобальные флаги отображения
-            self.db.save_settings(show_trajectory=int(s["show_traj"]),
-                                  show_heading=int(s["show_heading"]))
+            # сохраняем глобальные флаги отображения (в кэш, в БД — отложенно)
+            self.parent_main.settings.update(show_trajectory=int(s["show_traj"]),
+                                             show_heading=int(s["show_heading"]))
             # применяем в сцене
             self.scene.set_show_flags(s["show_traj"], s["show_heading"])
             self.scene.max_objects_limit = s["max_objects"]
@@ -208,17 +288,25 @@ class TrainingView(QWidget):
     def start_session(self):
         self.scene.set_show_flags(self.session_settings["show_traj"], self.session_settings["show_heading"])
         self.scene.max_objects_limit = self.session_settings["max_objects"]
+        self.scene.set_sweep(self.session_settings["sweep_rpm"])
+        self.scene.set_clutter(self.session_settings["clutter"])
+        self.scene.set_tracking(self.session_settings["tracking"])
         self.correct = 0
         self.wrong = 0
+        self.identifications = []
         self.parent_main.add_notification("Сеанс тренировки начат")
         self.session_active = True
         self.session_started_at = datetime.now()
         self.session_end_time = self.session_started_at + timedelta(seconds=self.session_settings["time_limit"])
         for obj in list(self.scene.objects):
             self.scene.remove_object(obj)
+        self.scene.alarm_engine.reset()
         self.sim_timer.start(33)
         self.spawn_timer.start(1000)
         self.btn_pause.setText("Пауза")
+        self.map_view.reset_repaint_stats()
+        self.scene.set_render_active(True)
+        self.recorder.start()
 
         # Сброс режима слежения при запуске новой сессии
         self.follow_object = None
@@ -233,7 +321,19 @@ class TrainingView(QWidget):
         self.session_active = False
         self.sim_timer.stop()
         self.spawn_timer.stop()
+        self.scene.set_render_active(False)
+        if DEBUG_REPAINT_STATS:
+            st = self.map_view.repaint_stats()
+            print(f"[views] Repaint: {st['frames']} frames, avg {st['avg_fraction'] * 100:.1f}% of viewport")
         self.parent_main.add_notification("Сеанс тренировки завершён")
+        if self.scene.alarm_engine.log:
+            self.parent_main.add_notification(self.scene.alarm_engine.summary())
+        self.recorder.stop()
+        try:
+            self.last_recording = self.recorder.save()
+            self.parent_main.add_notification(f"Запись сеанса: {self.last_recording} ({self.recorder.frames} кадров)")
+        except Exception as e:
+            print(f"[views] Failed to save recording: {e}")
         duration = int((datetime.now() - self.session_started_at).total_seconds()) if self.session_started_at else 0
         self.finished.emit(self.correct, self.wrong,
                            self.session_started_at.isoformat(timespec='seconds') if self.session_started_at else datetime.now().isoformat(timespec='seconds'),
@@ -252,11 +352,13 @@ class TrainingView(QWidget):
         if self.sim_timer.isActive():
             self.sim_timer.stop()
             self.spawn_timer.stop()
+            self.scene.set_render_active(False)
             self.btn_pause.setText("Продолжить")
             self.parent_main.add_notification("Пауза")
         else:
             self.sim_timer.start(33)
             self.spawn_timer.start(1000)
+            self.scene.set_render_active(True)
             self.btn_pause.setText("Пауза")
             self.parent_main.add_notification("Продолжить")
 
@@ -267,6 +369,7 @@ class TrainingView(QWidget):
         if now >= self.session_end_time:
             self.end_session()
             return
+        # Один шаг модели; все виды сцены (и монитор инструктора) перерисовываются от него
         self.scene.tick(0.033, self.parent_main)
 
         # Если есть выбранный объект, обновляем информацию или прекращаем слежение
@@ -285,6 +388,41 @@ class TrainingView(QWidget):
                 except Exception:
                     pass
 
+    def on_map_selected(self, index: int):
+        region_id = self.cmb_map.itemData(index)
+        if not region_id or not self.scene.set_map(region_id):
+            return
+        self.follow_object = None
+        try:
+            self.parent_main.hide_object_info()
+        except Exception:
+            pass
+        self.map_view.centerOn(self.scene.radar_center)
+        self._refresh_zone_sets()
+        self.parent_main.add_notification(f"Карта: {self.cmb_map.itemText(index)}")
+
+    def _refresh_zone_sets(self):
+        if self.scene.region is not None:
+            self.db.call_async("list_zone_scenarios", self.scene.region.id, on_done=self._fill_zone_sets)
+
+    def _fill_zone_sets(self, names):
+        self.cmb_zone_set.blockSignals(True)
+        self.cmb_zone_set.clear()
+        self.cmb_zone_set.addItem(ZONE_SET_DEFAULT_TITLE)
+        self.cmb_zone_set.addItems(names)
+        self.cmb_zone_set.setCurrentText(self.scene.zone_scenario or ZONE_SET_DEFAULT_TITLE)
+        self.cmb_zone_set.blockSignals(False)
+
+    def on_zone_set_selected(self, text):
+        text = (text or "").strip()
+        scenario = "" if text in ("", ZONE_SET_DEFAULT_TITLE) else text
+        if scenario == self.scene.zone_scenario:
+            return
+        self.scene.load_zones(scenario)
+        if self.cmb_zone_set.findText(text or ZONE_SET_DEFAULT_TITLE) < 0:
+            self.cmb_zone_set.addItem(text)
+        self.parent_main.add_notification(f"Набор зон: {text or ZONE_SET_DEFAULT_TITLE}")
+
     def on_spawn(self):
         if not self.session_active:
             return
@@ -301,6 +439,28 @@ class TrainingView(QWidget):
             self.wrong += 1
             self.parent_main.add_notification("Неверно: это не БВС")
 
+    def on_object_identified(self, obj, correct: bool):
+        """
+        Запоминает опознавание (объект ещё в сцене). Только сбор кортежа —
+        запись в БД идёт пачкой в конце сеанса.
+        """
+        if not self.session_active:
+            return
+        st = self.scene.track_stats.get(obj.uid)
+        if st is not None:
+            latency, dist, band = st.age, st.dist, st.band
+        else:
+            c = self.scene.radar_center
+            latency = obj.lifetime()
+            dist = math.hypot(obj.sim_pos.x() - c.x(), obj.sim_pos.y() - c.y())
+            band = obj._ring_band_last
+        self.identifications.append((obj.uid, obj.type_, latency, dist, band, int(correct),
+                                     datetime.now().isoformat(timespec='seconds')))
+
+    def take_identifications(self):
+        rows, self.identifications = self.identifications, []
+        return rows
+
     def on_object_clicked(self, obj):
         """
         Вызывается при одиночном клике на объект. Если объект существует,
@@ -326,6 +486,65 @@ class TrainingView(QWidget):
                 pass
 
 
+class MonitorWindow(QWidget):
+    """
+    Монитор инструктора: отдельное окно со своим видом на сцену тренировки.
+    Масштаб, слои и слежение — свои; модель не дублируется (шаг делает
+    TrainingView), опознавание с этого экрана выключено.
+    """
+    LAYERS = (
+        (LAYER_TARGETS, "Цели"),
+        (LAYER_TRAJECTORIES, "Траектории"),
+        (LAYER_HEADINGS, "Направления"),
+        (LAYER_ZONES, "Зоны"),
+        (LAYER_SWEEP, "Луч"),
+        (LAYER_CLUTTER, "Помехи"),
+        (LAYER_TRACKS, "Треки"),
+    )
+
+    def __init__(self, scene: MapScene, settings, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Монитор инструктора")
+        self.resize(900, 700)
+        self.settings = settings
+        self.map_view = MapView(scene)
+        self.map_view.identify_enabled = False
+
+        top = QHBoxLayout()
+        btn_home = QPushButton("Дом")
+        btn_compass = QPushButton("Компас (North-Up)")
+        self.chk_follow = QCheckBox("Следить за выбранной целью")
+        top.addWidget(btn_home)
+        top.addWidget(btn_compass)
+        top.addWidget(self.chk_follow)
+        top.addStretch()
+
+        layers = QHBoxLayout()
+        layers.addWidget(QLabel("Слои:"))
+        for layer, title in self.LAYERS:
+            chk = QCheckBox(title)
+            chk.setChecked(True)
+            chk.toggled.connect(lambda on, layer=layer: self.map_view.set_layer_visible(layer, on))
+            layers.addWidget(chk)
+        layers.addStretch()
+
+        root = QVBoxLayout()
+        root.addLayout(top)
+        root.addLayout(layers)
+        root.addWidget(self.map_view)
+        self.setLayout(root)
+
+        btn_home.clicked.connect(lambda: self.map_view.reset_to_home(self.settings))
+        btn_compass.clicked.connect(self.map_view.north_up)
+        self.chk_follow.toggled.connect(lambda on: None if on else self.map_view.set_follow(None))
+        self.map_view.objectClicked.connect(self.on_object_clicked)
+        self.map_view.reset_to_home(self.settings)
+
+    def on_object_clicked(self, obj):
+        if self.chk_follow.isChecked():
+            self.map_view.set_follow(obj)
+
+
 class ProfileView(QWidget):
     def __init__(self, db: DB):
         super().__init__()
@@ -338,6 +557,9 @@ class ProfileView(QWidget):
         layout.addWidget(self.lbl_user)
         layout.addWidget(self.lbl_role)
 
+        self.lbl_latency = QLabel("Время реакции: -")
+        layout.addWidget(self.lbl_latency)
+
         layout.addWidget(QLabel("История тренировок:"))
         self.table = QTableWidget(0, 5)
         self.table.setHorizontalHeaderLabels(["Начало", "Длительность (с)", "Верно", "Ошибки", "Точность"])
@@ -355,7 +577,10 @@ class ProfileView(QWidget):
     def reload_history(self):
         if not self.user:
             return
-        rows = self.db.get_trainings(self.user["id"])
+        self.db.call_async("get_trainings", self.user["id"], on_done=self._fill_history)
+        self.db.call_async("get_latency_percentiles", self.user["id"], on_done=self._show_latency)
+
+    def _fill_history(self, rows):
         self.table.setRowCount(0)
         for r in rows:
             i = self.table.rowCount()
@@ -366,6 +591,198 @@ class ProfileView(QWidget):
             self.table.setItem(i, 3, QTableWidgetItem(str(r["wrong"])))
             self.table.setItem(i, 4, QTableWidgetItem(f"{(r['accuracy']*100):.1f}%"))
 
+    def _show_latency(self, p):
+        if not p:
+            self.lbl_latency.setText("Время реакции: -")
+            return
+        self.lbl_latency.setText("Время реакции (верные опознавания): " +
+                                 ", ".join(f"p{k}={v:.1f} с" for k, v in p.items()))
+
+
+class DebriefView(QWidget):
+    """
+    Разбор: полнотекстовый поиск по журналу событий (включая архивы) с
+    фильтрами по типу, пользователю и периоду, постранично, со ссылками на
+    скриншоты. Оператор видит только свои события.
+    """
+
+    def __init__(self, db: DB):
+        super().__init__()
+        self.db = db
+        self.user = None
+        self.page = 0
+        self.total = 0
+        # Номер последнего запроса: ответы на устаревшие запросы отбрасываются
+        self._search_seq = 0
+        self._search_started = 0.0
+
+        self.txt_query = QLineEdit()
+        self.txt_query.setPlaceholderText("Слова из сообщения, например: зона 17")
+        self.txt_query.returnPressed.connect(self.search)
+
+        self.cmb_type = QComboBox()
+        self.cmb_type.addItem("Все", "")
+        for type_, title in NOTIFICATION_TYPES.items():
+            self.cmb_type.addItem(title, type_)
+
+        self.cmb_user = QComboBox()
+
+        now = QDateTime.currentDateTime()
+        self.chk_since = QCheckBox("с")
+        self.chk_since.setChecked(True)
+        self.dt_since = QDateTimeEdit(now.addDays(-DEBRIEF_DEFAULT_DAYS))
+        self.dt_since.setCalendarPopup(True)
+        self.dt_since.setDisplayFormat("dd.MM.yyyy HH:mm")
+        self.chk_until = QCheckBox("по")
+        self.chk_until.setChecked(False)
+        self.dt_until = QDateTimeEdit(now)
+        self.dt_until.setCalendarPopup(True)
+        self.dt_until.setDisplayFormat("dd.MM.yyyy HH:mm")
+        self.chk_since.toggled.connect(self.dt_since.setEnabled)
+        self.chk_until.toggled.connect(self.dt_until.setEnabled)
+        self.dt_until.setEnabled(False)
+
+        self.btn_search = QPushButton("Найти")
+        self.btn_search.clicked.connect(self.search)
+
+        filters = QHBoxLayout()
+        filters.addWidget(QLabel("Тип:"))
+        filters.addWidget(self.cmb_type)
+        filters.addWidget(QLabel("Пользователь:"))
+        filters.addWidget(self.cmb_user)
+        filters.addWidget(self.chk_since)
+        filters.addWidget(self.dt_since)
+        filters.addWidget(self.chk_until)
+        filters.addWidget(self.dt_until)
+        filters.addStretch(1)
+
+        top = QHBoxLayout()
+        top.addWidget(self.txt_query, 1)
+        top.addWidget(self.btn_search)
+
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(["Время", "Пользователь", "Тип", "Сообщение", "Скриншот"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+
+        self.btn_prev = QPushButton("← Назад")
+        self.btn_prev.clicked.connect(lambda: self._load_page(self.page - 1))
+        self.btn_next = QPushButton("Вперёд →")
+        self.btn_next.clicked.connect(lambda: self._load_page(self.page + 1))
+        self.lbl_page = QLabel("-")
+        pages = QHBoxLayout()
+        pages.addWidget(self.btn_prev)
+        pages.addWidget(self.lbl_page, 1, Qt.AlignCenter)
+        pages.addWidget(self.btn_next)
+
+        layout = QVBoxLayout()
+        layout.addLayout(top)
+        layout.addLayout(filters)
+        layout.addWidget(self.table)
+        layout.addLayout(pages)
+        self.setLayout(layout)
+        self._update_pager(0)
+
+    def set_user(self, user):
+        self.user = user
+        self.cmb_user.clear()
+        if user["role"] == "admin":
+            self.cmb_user.addItem("Все", None)
+            self.db.call_async("list_users", on_done=self._fill_users)
+        else:
+            self.cmb_user.addItem(user["username"], user["id"])
+        self.cmb_user.setEnabled(user["role"] == "admin")
+
+    def _fill_users(self, rows):
+        for r in rows:
+            self.cmb_user.addItem(r["username"], r["id"])
+
+    def _filters(self) -> dict:
+        fmt = "yyyy-MM-ddTHH:mm:ss"
+        return {
+            "text": self.txt_query.text().strip(),
+            "user_id": self.cmb_user.currentData(),
+            "type_": self.cmb_type.currentData() or None,
+            "since": self.dt_since.dateTime().toString(fmt) if self.chk_since.isChecked() else None,
+            "until": self.dt_until.dateTime().toString(fmt) if self.chk_until.isChecked() else None,
+        }
+
+    def search(self):
+        self._load_page(0)
+
+    def _load_page(self, page):
+        if self.user is None or page < 0:
+            return
+        self.page = page
+        self._search_seq += 1
+        seq = self._search_seq
+        self._search_started = time.perf_counter()
+        self.btn_search.setEnabled(False)
+        self.db.call_async("search_events", limit=DEBRIEF_PAGE_SIZE, offset=page * DEBRIEF_PAGE_SIZE,
+                           on_done=lambda result: self._on_results(seq, result),
+                           on_error=lambda e: self._on_error(seq, e), **self._filters())
+
+    def _on_error(self, seq, error):
+        if seq != self._search_seq:
+            return
+        self.btn_search.setEnabled(True)
+        QMessageBox.warning(self, "Ошибка", f"Поиск не выполнен: {error}")
+
+    def _on_results(self, seq, result):
+        if seq != self._search_seq:
+            return
+        rows, self.total = result
+        elapsed_ms = (time.perf_counter() - self._search_started) * 1000
+        self.btn_search.setEnabled(True)
+        self.table.setRowCount(0)
+        for r in rows:
+            i = self.table.rowCount()
+            self.table.insertRow(i)
+            try:
+                stamp = datetime.fromisoformat(r["created_at"]).strftime("%d.%m.%Y %H:%M:%S")
+            except (TypeError, ValueError):
+                stamp = r["created_at"] or "--"
+            self.table.setItem(i, 0, QTableWidgetItem(stamp))
+            self.table.setItem(i, 1, QTableWidgetItem(r["username"]))
+            self.table.setItem(i, 2, QTableWidgetItem(NOTIFICATION_TYPES.get(r["type"], r["type"] or "-")))
+            self.table.setItem(i, 3, QTableWidgetItem(r["message"]))
+            self.table.setCellWidget(i, 4, self._screenshot_link(r["screenshot_path"]))
+        self._update_pager(len(rows), elapsed_ms)
+
+    def _screenshot_link(self, path):
+        lbl = QLabel()
+        lbl.setAlignment(Qt.AlignCenter)
+        if not path:
+            return lbl
+        if not os.path.exists(path):
+            # Снимок удалён при очистке хранилища (ссылки в архивах не обнуляются)
+            lbl.setText("удалён")
+            lbl.setEnabled(False)
+            return lbl
+        url = QUrl.fromLocalFile(os.path.abspath(path)).toString()
+        lbl.setText(f'<a href="{url}">открыть</a>')
+        lbl.setOpenExternalLinks(True)
+        thumb = thumbnail_path_for(path)
+        lbl.setToolTip(f'<img src="{thumb}"><br>{path}' if os.path.exists(thumb) else path)
+        return lbl
+
+    def _update_pager(self, shown, elapsed_ms=None):
+        first = self.page * DEBRIEF_PAGE_SIZE
+        if self.total > EVENTS_SEARCH_COUNT_LIMIT:
+            found = f"более {EVENTS_SEARCH_COUNT_LIMIT}"
+            has_next = shown == DEBRIEF_PAGE_SIZE
+        else:
+            found = str(self.total)
+            has_next = first + shown < self.total
+        text = f"{first + 1}–{first + shown} из {found}" if shown else "Ничего не найдено"
+        if elapsed_ms is not None:
+            text += f"  ({elapsed_ms:.0f} мс)"
+        self.lbl_page.setText(text if elapsed_ms is not None or shown else "-")
+        self.btn_prev.setEnabled(self.page > 0)
+        self.btn_next.setEnabled(has_next)
+
 
 class SettingsView(QWidget):
     def __init__(self, db: DB, main_window):
@@ -396,7 +813,7 @@ class SettingsView(QWidget):
         # Preferences
         pref_box = QGroupBox("Настройки приложения")
         p_layout = QFormLayout()
-        s = self.db.get_settings()
+        s = self.main.settings.get_settings()
         self.chk_traj = QCheckBox()
         self.chk_traj.setChecked(bool(s["show_trajectory"]))
         self.chk_heading = QCheckBox()
@@ -419,9 +836,19 @@ class SettingsView(QWidget):
         h_layout.addWidget(self.btn_set_home)
         home_box.setLayout(h_layout)
 
+        # Backup
+        backup_box = QGroupBox("Резервное копирование")
+        b_layout = QHBoxLayout()
+        self.btn_backup = QPushButton("Создать копию сейчас")
+        self.backup_status = QLabel()
+        b_layout.addWidget(self.btn_backup)
+        b_layout.addWidget(self.backup_status, 1)
+        backup_box.setLayout(b_layout)
+
         root.addWidget(self.user_box)
         root.addWidget(pref_box)
         root.addWidget(home_box)
+        root.addWidget(backup_box)
         root.addStretch()
         self.setLayout(root)
 
@@ -431,16 +858,40 @@ class SettingsView(QWidget):
         self.btn_reset_password.clicked.connect(self.on_reset_password)
         self.btn_save_pref.clicked.connect(self.on_save_prefs)
         self.btn_set_home.clicked.connect(self.on_set_home)
+        backups = self.main.backup_manager
+        self.btn_backup.clicked.connect(self.on_backup)
+        backups.progress.connect(self._on_backup_progress)
+        backups.finished.connect(self._show_last_backup)
+        backups.failed.connect(lambda error: self.backup_status.setText(f"Ошибка: {error}"))
 
         self.refresh_users()
+        self._show_last_backup(backups.latest())
 
     def set_user(self, user):
         self.user = user
         self.user_box.setVisible(user["role"] == "admin")
 
+    def on_backup(self):
+        if not self.main.backup_manager.backup_now():
+            self.backup_status.setText("Копирование уже идёт")
+
+    def _on_backup_progress(self, done, total):
+        if total:
+            self.backup_status.setText(f"Копирование: {100 * done // total}%")
+
+    def _show_last_backup(self, path):
+        if not path:
+            self.backup_status.setText("Копий ещё нет")
+            return
+        stamp = datetime.fromtimestamp(os.path.getmtime(path)).strftime("%d.%m.%Y %H:%M")
+        self.backup_status.setText(f"Последняя копия: {os.path.basename(path)} ({stamp})")
+
     def refresh_users(self):
+        self.db.call_async("list_users", on_done=self._fill_users)
+
+    def _fill_users(self, users):
         self.users_table.setRowCount(0)
-        for u in self.db.list_users():
+        for u in users:
             i = self.users_table.rowCount()
             self.users_table.insertRow(i)
             self.users_table.setItem(i, 0, QTableWidgetItem(str(u["id"])))
@@ -471,10 +922,13 @@ class SettingsView(QWidget):
         v.addWidget(btns)
         dlg.setLayout(v)
         if dlg.exec_() == QDialog.Accepted:
-            ok = self.db.create_user(login.text().strip(), pwd.text().strip(), role.currentText())
-            if not ok:
-                QMessageBox.warning(self, "Ошибка", "Логин занят")
-            self.refresh_users()
+            self.db.call_async("create_user", login.text().strip(), pwd.text().strip(), role.currentText(),
+                               on_done=self._on_user_created)
+
+    def _on_user_created(self, ok):
+        if not ok:
+            QMessageBox.warning(self, "Ошибка", "Логин занят")
+        self.refresh_users()
 
     def on_change_role(self):
         if self.user["role"] != "admin":
@@ -503,8 +957,8 @@ class SettingsView(QWidget):
         v.addWidget(btns)
         dlg.setLayout(v)
         if dlg.exec_() == QDialog.Accepted:
-            self.db.set_user_role(uid, role.currentText())
-            self.refresh_users()
+            self.db.call_async("set_user_role", uid, role.currentText(),
+                               on_done=lambda _: self.refresh_users())
 
     def on_reset_password(self):
         if self.user["role"] != "admin":
@@ -538,15 +992,15 @@ class SettingsView(QWidget):
             if pwd1.text().strip() == "" or pwd1.text() != pwd2.text():
                 QMessageBox.warning(self, "Пароль", "Пароли пустые или не совпадают")
                 return
-            self.db.change_password(uid, pwd1.text().strip())
-            QMessageBox.information(self, "Пароль", "Пароль обновлён")
+            self.db.call_async("change_password", uid, pwd1.text().strip(),
+                               on_done=lambda _: QMessageBox.information(self, "Пароль", "Пароль обновлён"))
 
     def on_save_prefs(self):
-        self.db.save_settings(show_trajectory=int(self.chk_traj.isChecked()),
-                              show_heading=int(self.chk_heading.isChecked()),
-                              sound_volume=float(self.spin_volume.value()))
+        # Сцена подписана на изменения флагов и обновится сама
+        self.main.settings.update(show_trajectory=int(self.chk_traj.isChecked()),
+                                  show_heading=int(self.chk_heading.isChecked()),
+                                  sound_volume=float(self.spin_volume.value()))
         try:
-            self.main.training_view.scene.set_show_flags(self.chk_traj.isChecked(), self.chk_heading.isChecked())
             self.main.add_notification("Настройки сохранены")
         except Exception:
             pass
@@ -556,5 +1010,5 @@ class SettingsView(QWidget):
         center_scene = mv.mapToScene(mv.viewport().rect().center())
         t: QTransform = mv.transform()
         scale_x = math.hypot(t.m11(), t.m12())
-        self.db.save_settings(home_x=center_scene.x(), home_y=center_scene.y(), home_scale=scale_x)
+        self.main.settings.update(home_x=center_scene.x(), home_y=center_scene.y(), home_scale=scale_x)
         self.main.add_notification("Домашняя позиция сохранена")
@@ -1,16 +1,243 @@
-from PyQt5.QtWidgets import QDockWidget, QListWidget
-from PyQt5.QtCore import Qt
+import os
+import time
+from collections import deque
 from datetime import datetime
 
+from PyQt5.QtWidgets import (
+    QDockWidget, QListView, QWidget, QVBoxLayout, QHBoxLayout, QComboBox, QPushButton,
+    QFormLayout, QLabel
+)
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QSortFilterProxyModel
+from PyQt5.QtGui import QColor, QBrush
+
+from storage import thumbnail_path_for
+from kinematics import STATS_FIELDS
+
+# Максимум строк в центре уведомлений (кольцевой буфер)
+NOTIFICATIONS_CAPACITY = 500
+# Окно склейки одинаковых уведомлений, сек
+NOTIFY_COALESCE_SEC = 1.0
+# Сколько событий подгружать из БД за один запрос
+NOTIFY_HISTORY_PAGE = 100
+
+NOTIFICATION_TYPES = {
+    "info": "Информация",
+    "alarm": "Тревога",
+}
+
+
+class _Entry:
+    __slots__ = ("stamp", "type_", "text", "group", "count", "event_id", "screenshot", "created")
+
+    def __init__(self, stamp, type_, text, group, event_id=None, screenshot=None, created=0.0):
+        self.stamp = stamp
+        self.type_ = type_
+        self.text = text
+        self.group = group
+        self.count = 1
+        self.event_id = event_id
+        self.screenshot = screenshot
+        self.created = created
+
+
+class NotificationsModel(QAbstractListModel):
+    """
+    Модель уведомлений на кольцевом буфере: при переполнении вытесняются
+    самые старые строки. Одинаковые уведомления (тип + группа), пришедшие
+    в пределах NOTIFY_COALESCE_SEC, склеиваются в одну строку со счётчиком.
+    """
+    TypeRole = Qt.UserRole + 1
+    EventIdRole = Qt.UserRole + 2
+    ScreenshotRole = Qt.UserRole + 3
+
+    def __init__(self, capacity=NOTIFICATIONS_CAPACITY, parent=None):
+        super().__init__(parent)
+        self.capacity = max(1, int(capacity))
+        self._items = deque()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._items)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._items):
+            return None
+        e = self._items[index.row()]
+        if role == Qt.DisplayRole:
+            suffix = f" (×{e.count})" if e.count > 1 else ""
+            return f"[{e.stamp}] {e.text}{suffix}"
+        if role == Qt.ForegroundRole and e.type_ == "alarm":
+            return QBrush(QColor(200, 30, 30))
+        if role == Qt.ToolTipRole and e.screenshot:
+            thumb = thumbnail_path_for(e.screenshot)
+            if os.path.exists(thumb):
+                return f'<img src="{thumb}"><br>{e.screenshot}'
+            return e.screenshot
+        if role == self.TypeRole:
+            return e.type_
+        if role == self.EventIdRole:
+            return e.event_id
+        if role == self.ScreenshotRole:
+            return e.screenshot
+        return None
+
+    def append(self, message: str, type_: str = "info", group: str = None,
+               event_id=None, screenshot=None):
+        now = time.monotonic()
+        group = group or message
+        if self._items:
+            last = self._items[-1]
+            if last.type_ == type_ and last.group == group and now - last.created <= NOTIFY_COALESCE_SEC:
+                last.count += 1
+                last.text = group if last.text != message else message
+                last.created = now
+                last.screenshot = last.screenshot or screenshot
+                idx = self.index(len(self._items) - 1)
+                self.dataChanged.emit(idx, idx)
+                return last
+        if len(self._items) >= self.capacity:
+            self.beginRemoveRows(QModelIndex(), 0, 0)
+            self._items.popleft()
+            self.endRemoveRows()
+        n = len(self._items)
+        self.beginInsertRows(QModelIndex(), n, n)
+        entry = _Entry(datetime.now().strftime("%H:%M:%S"), type_, message, group,
+                       event_id, screenshot, now)
+        self._items.append(entry)
+        self.endInsertRows()
+        return entry
+
+    def set_event_id(self, entry, event_id):
+        """id строки events приходит из потока БД после вставки."""
+        if entry is not None and entry.event_id is None:
+            entry.event_id = event_id
+
+    def prepend_history(self, rows) -> int:
+        """
+        Добавляет в начало строки из таблицы events (от новых к старым).
+        Вставляется не больше свободного места в буфере. Возвращает число строк.
+        """
+        rows = list(rows)[:max(0, self.capacity - len(self._items))]
+        if not rows:
+            return 0
+        self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+        for r in rows:
+            try:
+                stamp = datetime.fromisoformat(r["created_at"]).strftime("%d.%m %H:%M:%S")
+            except (TypeError, ValueError):
+                stamp = r["created_at"] or "--"
+            self._items.appendleft(_Entry(stamp, r["type"], r["message"], r["message"],
+                                          r["id"], r["screenshot_path"]))
+        self.endInsertRows()
+        return len(rows)
+
+    def oldest_event_id(self):
+        ids = [e.event_id for e in self._items if e.event_id is not None]
+        return min(ids) if ids else None
+
+    def is_full(self) -> bool:
+        return len(self._items) >= self.capacity
+
 
 class NotificationsDock(QDockWidget):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, db=None, capacity=NOTIFICATIONS_CAPACITY):
         super().__init__("Центр уведомлений", parent)
-        self.list = QListWidget()
-        self.setWidget(self.list)
+        self.db = db
+        self.user = None
+
+        self.model = NotificationsModel(capacity, self)
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.proxy.setFilterRole(NotificationsModel.TypeRole)
+
+        self.list = QListView()
+        self.list.setModel(self.proxy)
+        self.list.setUniformItemSizes(True)
+        self.list.setWordWrap(False)
+
+        self.cmb_type = QComboBox()
+        self.cmb_type.addItem("Все", "")
+        for type_, title in NOTIFICATION_TYPES.items():
+            self.cmb_type.addItem(title, type_)
+        self.cmb_type.currentIndexChanged.connect(self._on_filter_changed)
+
+        self.btn_older = QPushButton("Ранее…")
+        self.btn_older.setToolTip("Загрузить более старые события из журнала")
+        self.btn_older.clicked.connect(self.load_older)
+        self.btn_older.setEnabled(False)
+
+        top = QHBoxLayout()
+        top.setContentsMargins(0, 0, 0, 0)
+        top.addWidget(self.cmb_type, 1)
+        top.addWidget(self.btn_older)
+        box = QVBoxLayout()
+        box.setContentsMargins(2, 2, 2, 2)
+        box.addLayout(top)
+        box.addWidget(self.list)
+        w = QWidget()
+        w.setLayout(box)
+        self.setWidget(w)
         self.setAllowedAreas(Qt.LeftDockWidgetArea | Qt.RightDockWidgetArea)
 
-    def add(self, message: str):
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.list.addItem(f"[{timestamp}] {message}")
-        self.list.scrollToBottom()
+    def set_user(self, user):
+        self.user = user
+        self.btn_older.setEnabled(self.db is not None and user is not None)
+
+    def add(self, message: str, type_: str = "info", group: str = None,
+            event_id=None, screenshot=None):
+        sb = self.list.verticalScrollBar()
+        at_bottom = sb.value() >= sb.maximum()
+        entry = self.model.append(message, type_, group, event_id, screenshot)
+        # Не сбиваем прокрутку, если пользователь листает историю
+        if at_bottom:
+            self.list.scrollToBottom()
+        return entry
+
+    def load_older(self):
+        if self.db is None or self.user is None:
+            return
+        if self.model.is_full():
+            self.btn_older.setToolTip("Достигнут предел списка уведомлений")
+            return
+        self.btn_older.setEnabled(False)
+        self.db.call_async("get_events", self.user["id"], before_id=self.model.oldest_event_id(),
+                           limit=NOTIFY_HISTORY_PAGE, include_archive=True, on_done=self._on_older_loaded,
+                           on_error=lambda e: self.btn_older.setEnabled(True))
+
+    def _on_older_loaded(self, rows):
+        self.btn_older.setEnabled(self.model.prepend_history(rows) > 0)
+
+    def _on_filter_changed(self, index: int):
+        type_ = self.cmb_type.itemData(index) or ""
+        self.proxy.setFilterRegExp(f"^{type_}$" if type_ else "")
+
+
+class ObjectInfoPanel(QWidget):
+    """
+    Панель статистики выбранного объекта: по метке на поле, перерисовываются
+    только поля, текст которых изменился.
+    """
+
+    def __init__(self, fields=STATS_FIELDS, parent=None):
+        super().__init__(parent)
+        self._labels = {}
+        self._shown = {}
+        form = QFormLayout()
+        form.setContentsMargins(8, 8, 8, 8)
+        for key, title in fields:
+            lbl = QLabel("-")
+            lbl.setWordWrap(True)
+            self._labels[key] = lbl
+            form.addRow(f"{title}:", lbl)
+        self.setLayout(form)
+
+    def update_fields(self, values: dict):
+        for key, text in values.items():
+            lbl = self._labels.get(key)
+            if lbl is not None and self._shown.get(key) != text:
+                lbl.setText(text)
+                self._shown[key] = text
+
+    def clear(self):
+        for lbl in self._labels.values():
+            lbl.setText("-")
+        self._shown.clear()
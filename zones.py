@@ -0,0 +1,131 @@
+"""
+Геометрия зон обнаружения/игнора с предрасчётом для быстрых проверок.
+
+При создании или правке зоны один раз считаются: ограничивающий
+прямоугольник, массив рёбер (x1, y1, x2, y2, dx/dy) и, для не слишком
+сложных контуров, триангуляция (отсечение ушей). Всё это хранится в БД
+(таблица zones) вместе с вершинами и при загрузке не пересчитывается.
+
+Проверка принадлежности — пакетная: точки вне прямоугольника отбрасываются
+сразу, для остальных чётность пересечений считается по массиву рёбер.
+"""
+import numpy as np
+from PyQt5.QtGui import QPolygonF
+
+from pointcloud import polygon_from_xy
+
+# Триангуляция строится только для контуров не сложнее (отсечение ушей — O(n^2))
+ZONE_TRIANGULATE_MAX_VERTICES = 200
+
+
+def _signed_area(xy) -> float:
+    x, y = xy[:, 0], xy[:, 1]
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+
+def _point_in_triangle(p, a, b, c) -> bool:
+    d1 = (p[0] - b[0]) * (a[1] - b[1]) - (a[0] - b[0]) * (p[1] - b[1])
+    d2 = (p[0] - c[0]) * (b[1] - c[1]) - (b[0] - c[0]) * (p[1] - c[1])
+    d3 = (p[0] - a[0]) * (c[1] - a[1]) - (c[0] - a[0]) * (p[1] - a[1])
+    neg = d1 < 0 or d2 < 0 or d3 < 0
+    pos = d1 > 0 or d2 > 0 or d3 > 0
+    return not (neg and pos)
+
+
+def triangulate(xy):
+    """Треугольники простого многоугольника (индексы T x 3) или None."""
+    n = len(xy)
+    if n < 3:
+        return None
+    order = list(range(n)) if _signed_area(xy) > 0 else list(range(n - 1, -1, -1))
+    tris = []
+    guard = 0
+    while len(order) > 3 and guard < n * n:
+        guard += 1
+        m = len(order)
+        for k in range(m):
+            i, j, l = order[k - 1], order[k], order[(k + 1) % m]
+            a, b, c = xy[i], xy[j], xy[l]
+            # Выпуклая вершина (обход против часовой) без других вершин внутри
+            if (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0]) <= 0:
+                continue
+            if any(_point_in_triangle(xy[o], a, b, c) for o in order if o not in (i, j, l)):
+                continue
+            tris.append((i, j, l))
+            del order[k]
+            break
+        else:
+            # Самопересекающийся контур — без триангуляции
+            return None
+    if len(order) == 3:
+        tris.append(tuple(order))
+    return np.array(tris, dtype=np.int32)
+
+
+class ZoneGeometry:
+    def __init__(self, points, bbox, edges, triangles=None):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.bbox = tuple(float(v) for v in bbox)   # min_x, min_y, max_x, max_y
+        self.edges = np.asarray(edges, dtype=np.float64).reshape(-1, 5)
+        self.triangles = None if triangles is None else np.asarray(triangles, dtype=np.int32).reshape(-1, 3)
+
+    @classmethod
+    def from_points(cls, points, triangulate_max=ZONE_TRIANGULATE_MAX_VERTICES):
+        """Предрасчёт по вершинам — только при создании или правке зоны."""
+        xy = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        x1, y1 = xy[:, 0], xy[:, 1]
+        x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+        dy = y2 - y1
+        slope = np.divide(x2 - x1, dy, out=np.zeros_like(dy), where=dy != 0)
+        bbox = (x1.min(), y1.min(), x1.max(), y1.max())
+        tris = triangulate(xy) if len(xy) <= triangulate_max else None
+        return cls(xy, bbox, np.c_[x1, y1, x2, y2, slope], tris)
+
+    @classmethod
+    def from_polygon(cls, polygon: QPolygonF):
+        return cls.from_points([(p.x(), p.y()) for p in polygon])
+
+    def polygon(self) -> QPolygonF:
+        return polygon_from_xy(self.points)
+
+    def area(self) -> float:
+        """Площадь, м^2 (по треугольникам, если они есть)."""
+        if self.triangles is not None and len(self.triangles):
+            a, b, c = (self.points[self.triangles[:, k]] for k in range(3))
+            return float(np.abs(np.cross(b - a, c - a)).sum() / 2.0)
+        return abs(_signed_area(self.points))
+
+    def contains_many(self, xy):
+        """Принадлежность точек N x 2 (маска N)."""
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        x0, y0, x1, y1 = self.bbox
+        out = (xy[:, 0] >= x0) & (xy[:, 0] <= x1) & (xy[:, 1] >= y0) & (xy[:, 1] <= y1)
+        idx = np.flatnonzero(out)
+        if len(idx) == 0:
+            return out
+        px, py = xy[idx, 0:1], xy[idx, 1:2]
+        e = self.edges
+        crosses = ((e[:, 1] > py) != (e[:, 3] > py)) & (px < e[:, 0] + (py - e[:, 1]) * e[:, 4])
+        out[idx] = (crosses.sum(axis=1) % 2) == 1
+        return out
+
+    def contains(self, x, y) -> bool:
+        return bool(self.contains_many(np.array([[x, y]]))[0])
+
+    def to_row(self) -> dict:
+        """Поля строки таблицы zones."""
+        return {
+            "min_x": self.bbox[0], "min_y": self.bbox[1], "max_x": self.bbox[2], "max_y": self.bbox[3],
+            "points": self.points.tobytes(),
+            "edges": self.edges.tobytes(),
+            "triangles": self.triangles.tobytes() if self.triangles is not None else None,
+        }
+
+    @classmethod
+    def from_row(cls, row):
+        """Из строки БД — без пересчёта."""
+        tris = row["triangles"]
+        return cls(np.frombuffer(row["points"], dtype=np.float64),
+                   (row["min_x"], row["min_y"], row["max_x"], row["max_y"]),
+                   np.frombuffer(row["edges"], dtype=np.float64),
+                   np.frombuffer(tris, dtype=np.int32) if tris is not None else None)